@@ -0,0 +1,48 @@
+"""
+k-way merge of datasets on their periods.
+
+merge_data_df used to concatenate each converted dataset onto a growing df (pd.concat(axis = 1)),
+copying the result once per dataset, then sort it and rebuild its PeriodIndex. align_merge() takes
+all datasets at once instead:
+
+    df = align_merge([df_1, df_2, ...], 'D')
+
+    1. the union of their periods is built once, from the sorted int64 ordinals;
+    2. one 2-D float array (periods x columns of all datasets) is allocated, filled with NaN;
+    3. the values of each dataset are scattered into its columns at the positions of its periods
+       (np.searchsorted on the union).
+
+The result has the same rows and columns as the old outer join: Time (periods) first, then the
+columns of each dataset in order.
+"""
+
+import numpy as np
+import pandas as pd
+
+from MyTools.period_index import get_period_time
+
+
+
+def align_merge(dfs:list, freq:str) -> pd.DataFrame:
+    """
+    dfs:    dfs with a Time column (periods, or strings of periods of freq) and value columns.
+    freq:   frequency of the periods, e.g., "D".
+    Return the outer join of dfs on Time, sorted by Time.
+    """
+    ordinals = [get_period_time(df['Time'], freq).asi8 for df in dfs]
+    columns = [df.columns.drop('Time').to_list() for df in dfs]
+
+    union = np.unique(np.concatenate(ordinals)) if dfs else np.array([], dtype = 'int64')
+    values = np.full((len(union), sum(len(i) for i in columns)), np.nan)
+
+    start = 0
+    for df, df_ordinals, df_columns in zip(dfs, ordinals, columns):
+        rows = np.searchsorted(union, df_ordinals)
+        values[rows, start:start + len(df_columns)] = df[df_columns].to_numpy(dtype = float)
+        start += len(df_columns)
+
+    time = pd.PeriodIndex.from_ordinals(union, freq = freq).rename('Time')
+    df = pd.DataFrame(values, columns = [i for df_columns in columns for i in df_columns])
+    df.insert(0, 'Time', time)
+
+    return df
@@ -0,0 +1,174 @@
+"""
+Read-only, memory-mapped copy of ./data/parse_data, shared by every Streamlit process of a host.
+
+The update pipeline (main_data_update.py) converts each parsed csv into two .npy files:
+    <data_name>.time.npy        int64 ordinals of the periods (Time), e.g., days since 1970-01-01
+    <data_name>.values.npy      one row per column of the csv (so each column is contiguous)
+and records them in index.json:
+    {
+        "NGDP-BEA-Q": {
+            "freq": "Q",
+            "columns": ["Gross domestic product", ...],
+            "n_rows": 313,
+            "dtype": "float64",
+            "generation": 12,       # generation of the csv it was built from (see MyTools/store.py)
+            "csv_signature": [1769680800000000000, 25431]   # its (st_mtime_ns, st_size)
+        },
+        ...
+    }
+
+read_series() maps both files with np.load(mmap_mode = 'r') and wraps them in a df without copying,
+so the pages of a dataset are held once in the OS page cache whatever the number of processes.
+Time is returned as periods (period[freq]), the int64 ordinals being the mapped array.
+A dataset is only read from the store while is_current(): its csv has the generation and the stat
+signature it was built from, so a csv changed outside the pipeline (e.g., git pull) is read instead.
+
+Build or refresh the store by hand with:
+    python -m MyTools.array_store
+"""
+
+import os, json
+import numpy as np
+import pandas as pd
+
+from MyTools import store
+from MyTools.frequency_conversion import get_frequency
+from MyTools.frequency_conversion import get_period_freq
+from MyTools.period_index import get_period_time
+
+
+INDEX_FILE = 'index.json'
+
+
+
+def path_time(store_dir, data_name):
+    return os.path.join(store_dir, f'{data_name}.time.npy')
+
+
+def path_values(store_dir, data_name):
+    return os.path.join(store_dir, f'{data_name}.values.npy')
+
+
+def read_index(store_dir) -> dict:
+    try:
+        with open(os.path.join(store_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def is_current(entry:dict, parse_data_dir:str, data_name:str, files:dict = None) -> bool:
+    """
+    Whether entry (the record of data_name in index.json, or None) was built from the current csv
+    of parse_data_dir. files: the generation record of parse_data_dir, if already read.
+    """
+    files = store.get_generation(parse_data_dir)['files'] if files is None else files
+    signature = store.file_signature(os.path.join(parse_data_dir, f'{data_name}.csv'))
+    return (
+            entry is not None and signature is not None
+            and entry['generation'] == files.get(data_name, 0)
+            and tuple(entry.get('csv_signature', ())) == signature
+            )
+
+
+def write_array(array, path):
+    with store.atomic_write(path, 'wb') as f:
+        np.save(f, array)
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Write (update pipeline)
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def build_store(parse_data_dir:str, store_dir:str, data_names:list = None) -> list:
+    """
+    Convert the csv files of parse_data_dir into the store. Files are replaced atomically, so the
+    processes that map the previous version keep reading it until they reload.
+    data_names: only convert these datasets, all csv files of parse_data_dir if None.
+    Return the data names written.
+    """
+    os.makedirs(store_dir, exist_ok = True)
+    if data_names is None:
+        data_names = sorted(i[:-4] for i in os.listdir(parse_data_dir) if i.endswith('.csv'))
+    generations = store.get_generation(parse_data_dir)['files']
+
+    index = read_index(store_dir)
+    written = []
+    for data_name in data_names:
+        path_csv = os.path.join(parse_data_dir, f'{data_name}.csv')
+        if not os.path.exists(path_csv):
+            continue
+        # Stat before reading: if the csv changes meanwhile, the entry is not current.
+        signature = store.file_signature(path_csv)
+        df = pd.read_csv(path_csv)
+        freq = get_frequency(data_name)
+        columns = df.columns.to_list()[1:]
+        values = np.ascontiguousarray(df[columns].to_numpy().T)
+
+        write_array(get_period_time(df['Time'], get_period_freq(freq)).asi8, path_time(store_dir, data_name))
+        write_array(values, path_values(store_dir, data_name))
+        index[data_name] = {
+                "freq":freq,
+                "columns":columns,
+                "n_rows":len(df),
+                "dtype":str(values.dtype),
+                "generation":generations.get(data_name, 0),
+                "csv_signature":list(signature)
+                }
+        written.append(data_name)
+
+    # The index is written last: a reader never finds an entry whose files are not written yet.
+    store.write_json(index, os.path.join(store_dir, INDEX_FILE))
+
+    return written
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Read (dashboard)
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def read_series(store_dir:str, data_name:str, entry:dict) -> pd.DataFrame:
+    """
+    Return the dataset data_name (entry is its record in index.json) backed by the mapped files.
+    The df shares memory with the files and is read-only: copy it before modifying it.
+    """
+    ordinals = np.load(path_time(store_dir, data_name), mmap_mode = 'r')
+    values = np.load(path_values(store_dir, data_name), mmap_mode = 'r')
+    if len(ordinals) != entry['n_rows'] or values.shape != (len(entry['columns']), entry['n_rows']):
+        raise ValueError(f"Array store: {data_name} does not match {INDEX_FILE}")
+
+    return wrap_series(ordinals, values, entry['freq'], entry['columns'])
+
+
+def wrap_series(ordinals, values, freq:str, columns:list) -> pd.DataFrame:
+    """
+    Return a df (Time as periods, then columns) backed by ordinals and values (one row per column)
+    without copying them.
+    """
+    time = pd.arrays.PeriodArray(ordinals, dtype = pd.PeriodDtype(get_period_freq(freq)))
+    df_time = pd.DataFrame({"Time":pd.Series(time, copy = False)}, copy = False)
+    df_values = pd.DataFrame(values.T, columns = columns, copy = False)
+
+    return pd.concat([df_time, df_values], axis = 1, copy = False)
+
+
+def read_csv_series(path_csv:str, freq:str) -> pd.DataFrame:
+    """
+    read_series() for a csv that is not in the store: a df with the same layout, made read-only.
+    """
+    df = pd.read_csv(path_csv)
+    columns = df.columns.to_list()[1:]
+    ordinals = get_period_time(df['Time'], get_period_freq(freq)).asi8
+    values = np.ascontiguousarray(df[columns].to_numpy().T)
+    for i in (ordinals, values):
+        i.flags.writeable = False
+
+    return wrap_series(ordinals, values, freq, columns)
+
+
+
+if __name__ == '__main__':
+    written = build_store(os.path.join('data', 'parse_data'), os.path.join('data', 'array_store'))
+    print(f"Array store: wrote {len(written)} datasets to {os.path.join('data', 'array_store')}")
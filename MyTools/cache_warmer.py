@@ -0,0 +1,94 @@
+"""
+Preload every figure of the Time Series Data page into the process-wide cache, so the first visitor
+after a deploy does not pay the load -> convert -> merge cost.
+
+app.py calls start_background_warmup() on every rerun; only the first call starts a thread.
+Run it as a script to warm a fresh process in the foreground and print the timings:
+    python -m MyTools.cache_warmer
+"""
+
+import threading, time, traceback, warnings
+
+from MyTools.figures import fig_list
+from MyTools.load_data import load_figure_df
+from MyTools.load_data import get_recession_indicator
+
+
+# Progress of the warm-up, readable from any session.
+warmup_status = {
+        "state":"idle",     # idle, running, done
+        "n_done":0,
+        "n_total":0,
+        "current":None,
+        "seconds":None,     # total time, set when state is done
+        "timings":{},       # {fig_name: seconds}
+        "errors":{},        # {fig_name: traceback}
+        }
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+
+
+def warm_figure(fig_name):
+    """
+    Load the df behind fig_name at its default frequency, and the recession indicator at that frequency.
+    """
+    df, freq = load_figure_df(fig_name)
+    if freq is not None:
+        get_recession_indicator(freq)
+
+
+def warm_cache(fig_names:list = None, report = print):
+    """
+    Warm the cache figure by figure and update warmup_status.
+    report: a function that receives one progress message, e.g., print or logging.info.
+    """
+    fig_names = fig_list if fig_names is None else fig_names
+    warmup_status.update({"state":"running", "n_done":0, "n_total":len(fig_names), "timings":{}, "errors":{}})
+
+    start = time.perf_counter()
+    for i, fig_name in enumerate(fig_names):
+        warmup_status['current'] = fig_name
+        fig_start = time.perf_counter()
+        try:
+            warm_figure(fig_name)
+        except Exception:
+            warmup_status['errors'][fig_name] = traceback.format_exc()
+
+        seconds = time.perf_counter() - fig_start
+        warmup_status['timings'][fig_name] = seconds
+        warmup_status['n_done'] = i + 1
+        status = 'failed' if fig_name in warmup_status['errors'] else f'{seconds:.2f}s'
+        report(f"[cache warm-up {i + 1}/{len(fig_names)}] {fig_name}: {status}")
+
+    warmup_status['seconds'] = time.perf_counter() - start
+    warmup_status['current'] = None
+    warmup_status['state'] = 'done'
+    report(f"[cache warm-up] {len(fig_names)} figures in {warmup_status['seconds']:.2f}s ({len(warmup_status['errors'])} errors)")
+
+    return warmup_status
+
+
+def start_background_warmup(fig_names:list = None, report = print):
+    """
+    Start warm_cache in a daemon thread once per process. Return the thread.
+    """
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(
+                    target = warm_cache, args = (fig_names, report),
+                    name = 'CacheWarmer', daemon = True
+                    )
+            _warmup_thread.start()
+    return _warmup_thread
+
+
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings('ignore')
+    status = warm_cache()
+    for fig_name, error in status['errors'].items():
+        print(f"{'='*20} {fig_name} {'='*20}\n{error}")
@@ -2,7 +2,7 @@ import streamlit as st
 import altair as alt
 import numpy as np
 import pandas as pd
-import json, os, warnings
+import json, os, copy, warnings, threading
 
 from MyTools.frequency_conversion import get_available_freq_list
 from MyTools.frequency_conversion import frequency_dict
@@ -13,6 +13,13 @@ from MyTools.frequency_conversion import frequency_mapping
 from MyTools.frequency_conversion import get_YoY_window
 
 from MyTools.load_data import get_percentage_share_GDP
+from MyTools.load_data import get_recession_indicator
+from MyTools.instrumentation import timed
+from MyTools.instrumentation import count
+from MyTools.data_cache import get_cache
+from MyTools.period_index import SortedPeriodIndex
+from MyTools.period_index import get_period_time
+from MyTools.config_registry import get_config
 
 from MyTools.message import get_hint_message
 from MyTools.message import Message
@@ -119,10 +126,417 @@ def get_a_color():
 # Data format
 # ~~~~~~~~~~~~~~~~~~~~~
 
-def format_time_column_to_str(df):
+def get_epoch_ms(time, freq:str):
+    """
+    Convert periods (e.g., pd.Period, '2020Q1' or '2020-01') to the start of each period in
+    milliseconds since epoch (UTC). Charts use these numbers as temporal values, which are far
+    shorter in the spec than date strings.
+    """
+    periods = get_period_time(time, freq)
+    return periods.to_timestamp().values.astype('datetime64[ms]').astype('int64')
+
+
+def get_time_format(freq:str):
+    """
+    d3 time format of each frequency, so axis labels and tooltips look like the periods in the table.
+    """
+    return {
+            "D":"%Y-%m-%d",
+            "W":"%Y-%m-%d",
+            "M":"%Y-%m",
+            "Q":"%YQ%q",
+            "A":"%Y",
+            }[freq]
+
+
+def get_period_ms(freq:str):
+    """
+    Average length of a period in milliseconds.
+    """
+    day_ms = 24 * 3600 * 1000
+    return {
+            "D":day_ms,
+            "W":7 * day_ms,
+            "M":365.25 / 12 * day_ms,
+            "Q":365.25 / 4 * day_ms,
+            "A":365.25 * day_ms,
+            }[freq]
+
+
+def get_long_chart_df(df, freq:str, df_min = None, df_max = None):
+    """
+    Melt a plot df (Time as index, one column per series) into the single dataset shared by every
+    layer of the line chart:
+                Time  key  value
+        1577836800000    0    3.6
+        1577836800000    1    6.9
+    Time:   start of the period in epoch ms.
+    key:    position of the series in df.columns. Series names can be very long and would be
+            repeated on every row, so the chart maps the positions back to names.
+    Runs of missing values are dropped, except their first value, which is kept so lines still
+    break at gaps. A period where every series is missing keeps the (missing) value of the first
+    series, so the selection bar, which counts rows by Time, still covers every period.
+
+    df_min, df_max: dfs shaped as df, e.g., the range of each bucket of LOD tiles (see
+                    MyTools/lod_tiles.py). If passed, they are added as columns min and max.
+    """
+    # values, is_valid and keep are (period, series).
+    values = df.to_numpy(dtype = float)
+    is_valid = ~np.isnan(values)
+    keep = is_valid.copy()
+    keep[1:] |= is_valid[:-1]
+    if keep.shape[1]:
+        keep[:, 0] |= ~keep.any(axis = 1)
+
+    series, periods = np.nonzero(keep.T) # series by series, in time order
+    df_long = pd.DataFrame({
+        "Time":get_epoch_ms(df.index, freq)[periods],
+        "key":series,
+        "value":values[periods, series],
+        })
+    if df_min is not None:
+        df_long['min'] = df_min.to_numpy(dtype = float)[periods, series]
+        df_long['max'] = df_max.to_numpy(dtype = float)[periods, series]
+
+    return df_long
+
+
+def get_legend_label_expr(labels:list):
+    """
+    Vega expression that shows labels[i] for the legend entry of key i (see get_long_chart_df).
+    """
+    return f"{json.dumps(labels)}[datum.value]"
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Line chart template
+# ~~~~~~~~~~~~~~~~~~~~~
+
+# Compiled vega-lite specs of the line chart, one per layout, see get_chart_template().
+_chart_templates = {}
+_chart_templates_lock = threading.Lock()
+
+
+def build_chart_template(n_series:int, freq:str, content_height:int, n_legend_cols:int, zero_line:bool, show_recession:bool, zoom:bool = False, band:bool = False) -> dict:
+    """
+    Build the vega-lite spec of the line chart for one layout, without data. The main data is the
+    named dataset 'chart_data' (see get_long_chart_df) and the recession periods are 'recession_data'.
+    Series names, line colors, widths and dashes and the recession style are placeholders, which
+    fill_chart_template() replaces.
+
+    zoom:   Zoom mode (see line_frame.display_zoom_chart). The x axis of the main chart can be zoomed
+            (mouse wheel) and panned (drag) in the browser. When the visible period is shorter than
+            the param detail_ms, a link under the chart offers to load finer data; clicking it
+            selects 'detail_click' (fields t0 and t1, in epoch ms), the only selection sent back
+            to the server.
+    band:   Shade the range (fields min and max of the data) of each series around its line, e.g.,
+            the min and max of each bucket of LOD tiles.
+    """
+    keys = list(range(n_series))
+    time_format = get_time_format(freq)
+    # Time is in epoch ms (UTC). Use UTC scales and time units, otherwise labels would be shifted
+    # to the local time zone of the browser (e.g., 2020-01-01 shown as 2019-12).
+    time_scale = alt.Scale(type = 'utc')
+    time_tooltip = alt.Tooltip('utcyearmonthdate(Time):T', title = 'Time', format = time_format)
+    # Layers share the x axis, so they must all define it the same way.
+    time_x = alt.X(
+            'Time:T',
+            title = None,
+            scale = time_scale,
+            axis = alt.Axis(
+                format = time_format,
+                labelAngle = 0,
+                labelAlign = 'center', # center the tick label.
+                labelOverlap = 'parity'
+                )
+            )
+
+
+    ###------Define height for elements------###
+    #bar_height = 0.07 * content_height
+    bar_height = 0.04 * content_height
+    legend_height = 0.25 * content_height
+    chart_height = content_height - bar_height - legend_height
+
+
+    ###------Define selector------###
+    # Name selections, so the names in the spec are the same on every rerun.
+    selector = alt.selection_point(
+            name = 'hover',
+            nearest = True,
+            on = 'pointerover',
+            clear = 'pointerout',
+            empty = False
+            )
+
+    bar_selector = alt.selection_interval(name = 'time_brush', encodings = ['x'])
+
+    legend_selector = alt.selection_point(
+            name = 'legend_click',
+            fields = ['key'],
+            bind = 'legend',
+            on = 'click',
+            clear = 'dblclick',
+            )
+
+    ###------Define spike line------###
+    rule_tooltip = [time_tooltip] + [alt.Tooltip(f"{i}:Q", title = '', format = ',.2f') for i in keys]
+    # Pivot back to one row per period (one field per key) for the tooltip listing every series.
+    rule = alt.Chart().transform_pivot(
+            'key', value = 'value', groupby = ['Time']
+            ).mark_rule(color = 'grey').encode(
+            x = time_x,
+            #y = alt.value(0),
+            y2 = alt.value('height'),
+            opacity = alt.condition(selector, alt.value(1), alt.value(0)),
+            tooltip = rule_tooltip,
+            ).add_params(selector).transform_filter(bar_selector).properties(name = 'chart_rule')
+
+
+    ###------Define lines------###
+    lines = alt.Chart().mark_line().encode(
+            x = time_x,
+            y = alt.Y('value:Q', title = None).scale(zero = False),
+            color = alt.Color(
+                'key:N',
+                scale = alt.Scale(domain = keys, range = keys),
+                legend = alt.Legend(
+                    title = None,
+                    titleLimit = 1500,
+                    orient = 'bottom',
+                    direction = 'horizontal',
+                    columns = n_legend_cols,
+                    labelLimit = 500,
+                    symbolSize = 400,
+                    symbolStrokeWidth = 4,
+                    offset = 0, # Distance between legend and chart. Smaller -> Closer.
+                    labelExpr = '',
+                    ),
+                sort = keys
+                ),
+
+            size = alt.Size(
+                'key:N',
+                scale = alt.Scale(domain = keys, range = keys),
+                # If I set legend = None, if will overlap with the color legend, and the symbol
+                # will not present properly (clipped). I have not yet figure out how to solve
+                # this problem, so I simply put the Size legend on the left of chart and 
+                # set the strokewidth to 0 to hide it.
+                legend = alt.Legend(
+                    orient = 'left', values = [''], title = None, symbolStrokeWidth = 0
+                    )
+                ),
+
+            strokeDash = alt.StrokeDash(
+                'key:N',
+                scale = alt.Scale(domain = keys, range = keys),
+                legend = None
+                ),
+
+            opacity = alt.condition(
+                legend_selector,
+                alt.value(1),
+                alt.value(0.2)
+                ),
+            ).add_params(legend_selector).transform_filter(bar_selector).properties(height = chart_height, name = 'chart_lines')
+
+    if zoom:
+        lines = lines.add_params(alt.selection_interval(name = 'zoom', bind = 'scales', encodings = ['x']))
+
+    ###------Range of each series (LOD tiles)------###
+    # Color shares the scale of the lines, filled by fill_chart_template().
+    band_area = alt.Chart().mark_area().encode(
+            x = time_x,
+            y = alt.Y('min:Q'),
+            y2 = 'max:Q',
+            color = alt.Color('key:N', legend = None),
+            opacity = alt.condition(legend_selector, alt.value(0.2), alt.value(0.05)),
+            ).transform_filter(bar_selector).properties(name = 'chart_band')
+
+    ###------If zero_line = True, show zero line (y = 0)------###
+    zero_mark = alt.Chart().mark_line(color = 'grey', size = 3).encode(
+            x = time_x,
+            y = alt.datum(0),
+            ).transform_aggregate(n = 'count()', groupby = ['Time']).transform_filter(bar_selector)
+
+    ###------Add selection bar below the chart------###
+    bar = alt.Chart().mark_bar(color = 'grey').encode(
+            x = alt.X('Time:T', title = None, axis = None, scale = time_scale),
+            y = alt.value(1),
+            #opacity = alt.condition(bar_selector, alt.value(.4), alt.value(0.2)),
+            opacity = alt.value(0),
+            tooltip = alt.Tooltip('utcyearmonthdate(Time):T', title = ' ', format = time_format),
+            ).transform_aggregate(n = 'count()', groupby = ['Time']).add_params(
+                    bar_selector
+            ).properties(name = 'chart_bar')
+
+    hints = [
+            " ".join([
+                "Drag the bar above to adjust selected time periods.",
+                "Click on unselected area to restore the default period."
+                ]),
+            " ".join([
+                "Click on one of the items below to highligh a single line.",
+                "Hold Shift button and click to select multiple items.",
+                "Double click in the main chart to restore default setup."
+                ]),
+            "Shaded areas indicate U.S. recessions."
+            ]
 
-    time_col = df['Time'].astype('string')
-    return time_col
+    ###------Zoom mode: link to load finer data------###
+    if zoom:
+        hints.insert(1, "Scroll in the chart to zoom in or out, drag it to move along the time axis.")
+        # Visible period: the zoomed x domain, else the period selected in the bar.
+        visible = "(isValid(zoom.Time) ? zoom.Time[{i}] : time_brush.Time[{i}])"
+        detail_link = alt.Chart(alt.InlineData(values = [{"detail":1}])).transform_filter(
+                "isValid(zoom.Time) || isValid(time_brush.Time)"
+                ).transform_calculate(
+                t0 = f"time({visible.format(i = 0)})",
+                t1 = f"time({visible.format(i = 1)})",
+                ).transform_filter(
+                "datum.t1 - datum.t0 <= detail_ms"
+                ).mark_text(
+                align = 'right', baseline = 'middle', fontSize = 13, color = '#1c83e1', cursor = 'pointer'
+                ).encode(
+                x = alt.value('width'),
+                y = alt.value(bar_height / 2),
+                text = alt.value('Load finer data for this period'),
+                ).add_params(
+                        alt.selection_point(name = 'detail_click', fields = ['t0', 't1'], on = 'click')
+                ).properties(name = 'chart_detail')
+        bar = alt.layer(bar, detail_link)
+
+    bar = bar.properties(
+            height = bar_height,
+            title = alt.Title(
+                #"Drag in the bar chart below to select a period of time.",
+                # Use .join, so there will not be a large gap between each sentence when users download the chart.
+                text = [get_hint_message(i) for i in hints],
+                fontSize = 14,
+                fontWeight = 400, # normal text: 400, bold: larger number, e.g., 800
+                offset = 5, # The distance between title and chart, the smaller the closer.
+                orient = 'bottom'
+                )
+            )
+
+    ###------Recession periods------###
+    recession_periods = alt.Chart(alt.NamedData('recession_data')).mark_rect(stroke = None).encode(
+            x = time_x,
+            x2 = 'Time_end:T',
+            opacity = alt.value(0),
+            color = alt.value(''),
+            ).transform_filter(bar_selector).properties(name = 'chart_recession')
+
+
+    ###------Merge chart items------###
+    layers = [rule, lines]
+    if band:
+        layers.insert(1, band_area)
+    if zero_line:
+        layers.append(zero_mark)
+    if show_recession:
+        layers.append(recession_periods)
+    chart = alt.layer(*layers)
+
+    # Use configure_view to change color and size of the chart border. Hide grid line for both axis.
+    chart = alt.vconcat(chart, bar, data = alt.NamedData('chart_data'))
+    if zoom:
+        # Longest visible period (ms) for which finer data can be loaded; 0 hides the link.
+        chart = chart.add_params(alt.param(name = 'detail_ms', value = 0))
+    chart = chart.configure_view(stroke = 'grey', strokeWidth = .2).configure_axis(grid = False)
+
+    template = chart.to_dict()
+
+    # Altair binds a selection added to one layer to every view of the layer chart, which defines
+    # the same signal several times. Bind each selection to the layer that defines it only.
+    param_views = {
+            "hover":'chart_rule',
+            "legend_click":'chart_lines',
+            "zoom":'chart_lines',
+            "time_brush":'chart_bar',
+            "detail_click":'chart_detail',
+            }
+    for param in template['params']:
+        if param['name'] in param_views:
+            param['views'] = [get_template_layer(template, param_views[param['name']])['name']]
+
+    return template
+
+
+def get_template_layer(spec:dict, name:str) -> dict:
+    """
+    Return the view of a line chart spec named name (Altair may add a suffix), e.g., a layer of
+    the main chart or the bar below it.
+    """
+    for view in spec['vconcat']:
+        for layer in view.get('layer', [view]):
+            if layer.get('name', '').startswith(name):
+                return layer
+    raise KeyError(name)
+
+
+def get_chart_template(**layout) -> dict:
+    """
+    Return the compiled template of a layout (the arguments of build_chart_template()), building it
+    on the first call. Templates are shared by every session; do not modify the returned dict.
+    """
+    key = tuple(sorted(layout.items()))
+    with _chart_templates_lock:
+        template = _chart_templates.get(key)
+    if template is not None:
+        count('cache.chart_template.hit')
+        return template
+
+    count('cache.chart_template.miss')
+    template = build_chart_template(**layout)
+    with _chart_templates_lock:
+        return _chart_templates.setdefault(key, template)
+
+
+def fill_chart_template(template:dict, df_long, col_selected:list, format_info:dict, df_recession = None, recession_opacity = 0, recession_color = None, detail_ms = 0) -> dict:
+    """
+    Return a copy of a template (see build_chart_template()) with the data and format of a chart.
+
+    df_long:        chart data, see get_long_chart_df().
+    col_selected:   names of the series, in the order of their key.
+    format_info:    line format of each series (see init_line_format()). Its order is the order of
+                    the legend.
+    detail_ms:      zoom mode only, see build_chart_template().
+    """
+    spec = copy.deepcopy(template)
+    spec.setdefault('datasets', {})['chart_data'] = df_long
+
+    ###------Series names------###
+    rule = get_template_layer(spec, 'chart_rule')
+    for tooltip, col in zip(rule['encoding']['tooltip'][1:], col_selected):
+        tooltip['title'] = col
+
+    ###------Line format------###
+    encoding = get_template_layer(spec, 'chart_lines')['encoding']
+    encoding['color']['scale']['range'] = [format_info[i]['line_color'] for i in col_selected]
+    encoding['color']['legend']['labelExpr'] = get_legend_label_expr(col_selected)
+    # Legend is arranged in the same order as in self.df
+    encoding['color']['sort'] = [col_selected.index(i) for i in format_info if i in col_selected]
+    encoding['size']['scale']['range'] = (
+            [format_info[i]['line_width'] for i in col_selected] if len(col_selected) > 1
+            else [format_info[col_selected[0]]['line_width'], format_info[col_selected[0]]['line_width'] - 0.01]
+            )
+    encoding['strokeDash']['scale']['range'] = [format_info[i]['line_style'] for i in col_selected]
+
+    ###------Recession periods------###
+    if df_recession is not None:
+        spec['datasets']['recession_data'] = df_recession
+        encoding = get_template_layer(spec, 'chart_recession')['encoding']
+        encoding['opacity']['value'] = recession_opacity
+        encoding['color']['value'] = recession_color
+
+    ###------Zoom mode------###
+    for param in spec['params']:
+        if param['name'] == 'detail_ms':
+            param['value'] = detail_ms
+
+    return spec
 
 
 
@@ -157,6 +571,15 @@ def get_table_widget_info(table_name:str) -> dict:
                 "label":"Download Data",
                 "key":f"{table_name}_download_button"
                 },
+            "zoom_toggle":{
+                "label":"Zoom",
+                "key":f"{table_name}_zoom_toggle",
+                "help":"Zoom, pan and select periods in the chart without reloading the page. The chart shows the full history."
+                },
+            "full_history_button":{
+                "label":"Full History",
+                "key":f"{table_name}_full_history_button"
+                },
             }
     return widget_info
 
@@ -232,9 +655,7 @@ def get_unit_info(current_dir):
     Get unit info from ./config/unit_info.json
     """
 
-    with open(os.path.join(current_dir, 'config', 'unit_info.json')) as f:
-        unit_info = json.load(f)
-    return unit_info
+    return get_config('unit_info', current_dir)
 
     
 
@@ -347,20 +768,16 @@ def get_table_df(df):
         1    1947Q2                 245.968  ...       5.319           13.714
 
 
-    df.transpose() is the following:
-                                                   0        1    ...        312        313
-        Time                                    1947Q1   1947Q2  ...     2025Q1     2025Q2
-        Gross domestic product                 243.164  245.968  ...  30042.113  30485.729
-        Personal consumption expenditures      156.161  160.031  ...  20554.984  20789.926
-
-    Returned df:
+    Returned df (columns are a PeriodIndex, see get_period_time):
                                                 1947Q1   1947Q2  ...     2025Q1     2025Q2
         Gross domestic product                 243.164  245.968  ...  30042.113  30485.729
         Personal consumption expenditures      156.161  160.031  ...  20554.984  20789.926
+
+    Time is dropped before transposing, so the values keep their numeric dtype.
     """
-    df = df.transpose()
-    df.columns = df.loc['Time', :].values
-    df = df.drop('Time')
+    time = pd.PeriodIndex(df['Time'].array)
+    df = df.drop('Time', axis = 1).transpose()
+    df.columns = time
 
 
     return df
@@ -385,7 +802,7 @@ def get_plot_df(selected_index, state_name_df):
         Personal consumption expenditures     156.16 160.03  ... 20,554.98 20,789.93
             Goods                              95.59  98.25  ...  6,432.30  6,471.11
 
-    Returned plot_df:
+    Returned plot_df (Time as a PeriodIndex):
                Gross domestic product Personal consumption expenditures    Goods Durable goods
         1947Q1                 243.16                            156.16    95.59         20.72
         1947Q2                 245.97                            160.03    98.25         21.35
@@ -416,6 +833,7 @@ class line_frame():
             source:str = '',
             df_bg_line = [],
             show_zero = False,
+            aggregation:dict = {},
             ):
         self.data_name = data_name
         self.df = df
@@ -428,56 +846,90 @@ class line_frame():
         self.data_source = source
         self.df_bg_line = df_bg_line # it will be True if you call `add_baselines` to  add lines at the background.
         self.zero_line = show_zero
+        # {column: aggregation} used to convert the columns to a lower frequency, mean for the others.
+        # Tables and charts strip (and standardize) column names, so every form of a name is a key.
+        self.aggregation = {}
+        for col, method in aggregation.items():
+            for i in [col, col.strip(), standardize_col_name([col.strip()])[0]]:
+                self.aggregation[i] = method
         self.current_dir = os.getcwd()
         self.unit_info = get_unit_info(self.current_dir)
         # Maximum num of periods to plot in the chart. The website may run slowly if this number is too large.
         self.max_periods_to_show = 8165 # 8165
         #self.max_periods_to_show = 10 # For testing purposes.
+        # Charts of these frequencies are answered from LOD tiles (see MyTools/lod_tiles.py) instead
+        # of converting the data to a lower frequency, with about one bucket per pixel of chart_width.
+        self.lod_tiles_freq = ['D', 'W']
+        self.chart_width = 1000
         self.initialize_session_state()
         self.freq = get_frequency(self.data_name)
 
 
 
-    def get_recession_indicator_try(self, df_plot):
-        # Rename column name to Time and Recession.
-        recession_name = 'RECESSION-FRED-D'
-        df = pd.read_csv(
-                os.path.join('data', 'parse_data', f'{recession_name}.csv'),
-                header = 0, # Ignore the first row (original column name).
-                names = ['Time', 'Recession']
-                )
+    @timed('line_frame.get_recession_indicator_try')
+    def get_recession_indicator_try(self, df_plot, freq = None, bucket = 1):
+        """
+        Return the recession periods within the periods of df_plot (see get_long_chart_df) as
+        Time (start) and Time_end (start of the next period), both in epoch ms.
+        freq:   frequency of df_plot. Default: the frequency in session state.
+        bucket: periods per point of df_plot, if it comes from LOD tiles. Buckets with any
+                recession period are shaded.
+        """
+        freq = freq or st.session_state[self.state_name_freq]
+        if bucket > 1:
+            return self.get_recession_buckets(df_plot, freq, bucket)
 
-
-        ###------Convert frequency of recession indicator to match the main dataset------###
-        freq = st.session_state[self.state_name_freq]
-        # set method = max, so mark that period (e.g., quarter) as recession if there is any period (e.g., day) is identified as recession.
-        df = convert_frequency(df, freq, method = 'max') 
+        df = get_recession_indicator(freq)
+        df = df[df['Recession'] == 1]
 
         ###------Match time periods between the recession dataset and main dataset------###
+        df = pd.DataFrame({
+            "Time":get_epoch_ms(df['Time'], freq),
+            "Time_end":get_epoch_ms(df['Time'] + 1, freq),
+            })
         start_period, end_period = df_plot['Time'].min(), df_plot['Time'].max()
-        df = df.query(
-                "Recession == 1 and Time >= @start_period & Time <= @end_period"
-                ).reset_index(drop = True)
-        df['Time'] = format_time_column_to_str(df)
+        time = df['Time'].values
+        df = df.iloc[time.searchsorted(start_period, side = 'left'):time.searchsorted(end_period, side = 'right')].reset_index(drop = True)
 
 
         return df
 
 
 
+    def get_recession_buckets(self, df_plot, freq, bucket):
+        """
+        get_recession_indicator_try() for a df_plot of LOD tiles with bucket periods per point.
+        """
+        df = get_recession_indicator(freq)
+        def build():
+            return df.set_index('Time')[['Recession']]
+        tiles = get_cache().get_lod_tiles(('recession', freq), df, build)
+
+        first_period, last_period = [pd.Timestamp(i, unit = 'ms').to_period(freq) for i in (df_plot['Time'].min(), df_plot['Time'].max())]
+        time = tiles.query(first_period, last_period, int(bucket).bit_length() - 1)['max'].query('Recession == 1').index
+
+        return pd.DataFrame({
+            "Time":get_epoch_ms(time, freq),
+            "Time_end":get_epoch_ms(time + bucket, freq),
+            })
+
+
+
     def init_default_df_to_show(self):
-        ###------Format Time column and get first, last period------###
-        # Convert values in Time column to string.
-        self.df['Time'] = format_time_column_to_str(self.df)
+        ###------Type Time column and get first, last period------###
+        # Keep Time as periods; they are formatted as strings only when displayed.
+        # The sorted index of the periods is shared by all sessions through the dataset cache.
+        self.period_index = get_cache().get_period_index(self.data_name, self.df['Time'], get_frequency(self.data_name))
+        self.df['Time'] = self.period_index.periods
 
         # Get start and end period
-        first_period, last_period = get_default_period(list(self.df['Time']), self.obs)
+        first_period, last_period = get_default_period(self.period_index.periods, self.obs)
 
 
         ###------Form dataset------###
         # df to show by default. By default, it shows the last four obs.
         # Do not format the indent of df until it is being persented in the box.
-        df_show = self.df.query("Time >= @first_period and Time <= @last_period")
+        df_show = self.df.iloc[self.period_index.slice(first_period, last_period)]
         df_show = get_table_df(df_show)
         return df_show, first_period, last_period
 
@@ -535,6 +987,10 @@ class line_frame():
         self.state_name_previous_freq = self.key('previous_freq')
         # warning message
         self.state_name_freq_warning_message = self.key('freq_warning_message')
+        # Chart in zoom mode (see display_zoom_chart)
+        self.state_name_zoom_mode = self.key('zoom_mode')
+        # Period loaded in finer detail in zoom mode, (start, end) in epoch ms, None: full history.
+        self.state_name_zoom_range = self.key('zoom_range')
 
 
 
@@ -561,6 +1017,8 @@ class line_frame():
         ss[self.state_name_previous_freq] = get_frequency(self.data_name)
 
         ss[self.state_name_freq_warning_message] = []
+        ss[self.state_name_zoom_mode] = False
+        ss[self.state_name_zoom_range] = None
 
         for i in ss.keys():
             init_session_state(i, ss[i])
@@ -638,11 +1096,29 @@ class line_frame():
                                     {"Gross domestic product":0,
 	    			"Personal consumption expenditures":0,
 	    			"Goods":1}
+
+        aggregation: {column: aggregation} used when users convert the data to a lower frequency,
+                     e.g., {"Federal Funds Target Range Upper Limit":"last"} (see get_aggregation_by_column()).
+                     Columns that are not in it are averaged.
+
+        The description, buttons and table/chart box run as a fragment (see show_frame()), so
+        clicking in them reruns the frame only, not the whole page.
         """
 
         # Allow altair to deal with a dataset with more than 5000 obs.
         alt.data_transformers.disable_max_rows()
 
+        st.fragment(self.show_frame, key = self.key('Frame'))(n_legend_cols)
+
+
+
+    def show_frame(self, n_legend_cols:int = 4):
+        """
+        Body of show(). It runs as a fragment: row selection, the Table/Chart/Zoom buttons and chart
+        selections rerun this function only. Its dialogs (Modify, Format) are fragments as well, and
+        close with a full rerun once submitted.
+        """
+
         ###------Container for description and buttons------###
         container = st.container(
                 border = False,
@@ -657,6 +1133,8 @@ class line_frame():
         button_chart = button_config['chart_button']
         button_format = button_config['format_button']
         button_download = button_config['download_button']
+        toggle_zoom = button_config['zoom_toggle']
+        button_full_history = button_config['full_history_button']
 
 
         with container:
@@ -702,6 +1180,22 @@ class line_frame():
                     file_name = self.download_file_name(self.data_name, '.csv')
                     )
 
+            ###------Zoom toggle------###
+            st.session_state[self.state_name_zoom_mode] = st.toggle(
+                    toggle_zoom['label'],
+                    key = toggle_zoom['key'],
+                    value = st.session_state[self.state_name_zoom_mode],
+                    disabled = st.session_state[self.state_name_show_table],
+                    help = toggle_zoom['help']
+                    )
+            if not st.session_state[self.state_name_zoom_mode]:
+                st.session_state[self.state_name_zoom_range] = None
+
+            ###------Full history button (zoom mode, after loading finer data)------###
+            if st.session_state[self.state_name_zoom_range] is not None:
+                if st.button(button_full_history['label'], button_full_history['key']):
+                    st.session_state[self.state_name_zoom_range] = None
+
 
 
         ###------Container of data table------###
@@ -710,7 +1204,9 @@ class line_frame():
         with box:
             # If pass indent config file, then format table index.
             if self.indent_config and st.session_state[self.state_name_adj_indent]:
-                st.session_state['indent_config'] = self.indent_config
+                # A plain copy: the registry's config is a shared, frozen MappingProxyType, which
+                # cannot be pickled with the session state.
+                st.session_state['indent_config'] = dict(self.indent_config)
                 update_table_indent(self.state_name_df, self.state_name_adj_indent)
 
 
@@ -732,23 +1228,26 @@ class line_frame():
     def modify_BEA_table(self):
         st.session_state[self.state_name_show_modify_window] = True
     
-        qrts_list = list(self.df['Time'].values)
+        # Select boxes show the periods as strings (cached labels); map the choice back to a period.
+        period_index = self.period_index
         with st.form(f'{self.data_name}_modify'):
             # Selectbox: First period.
             first_period = st.selectbox(
                     'First Period:',
-                    options = qrts_list,
+                    options = period_index.labels,
                     key = self.key('st'),
-                    index = qrts_list.index(st.session_state[self.state_name_first_period])
+                    index = period_index.position(st.session_state[self.state_name_first_period])
                     )
+            first_period = period_index[period_index.position(first_period)]
 
             # Selectbox: Last period.
             last_period = st.selectbox(
                     'Last Period:',
-                    options = qrts_list,
+                    options = period_index.labels,
                     key = self.key('et'),
-                    index = qrts_list.index(st.session_state[self.state_name_last_period])
+                    index = period_index.position(st.session_state[self.state_name_last_period])
                     )
+            last_period = period_index[period_index.position(last_period)]
             
 
             frequency_name_to_short = {v:k for k,v in frequency_dict().items()}
@@ -776,7 +1275,7 @@ class line_frame():
                     )
 
             if st.session_state[self.state_name_all_periods]:
-                first_period, last_period = qrts_list[0], qrts_list[-1]
+                first_period, last_period = period_index[0], period_index[-1]
 
 
 
@@ -798,9 +1297,10 @@ class line_frame():
             ###------Submit button------###
             submit = st.form_submit_button('Refresh Table', key = self.key('ModifySubmit'))
             if submit:
+                # Charts of LOD tile frequencies have no limit on the number of periods.
                 valid_modify_info, error_message = check_modify_info(
-                        first_period, last_period, qrts_list, self.max_periods_to_show,
-                        st.session_state[self.state_name_show_table],
+                        first_period, last_period, period_index.periods, self.max_periods_to_show,
+                        st.session_state[self.state_name_show_table] or freq in self.lod_tiles_freq,
                         st.session_state[self.state_name_selected_cols],
                         freq, original_freq,
                         st.session_state[self.state_name_all_periods]
@@ -821,6 +1321,7 @@ class line_frame():
 
 
 
+    @timed('line_frame.update_modify_info')
     def update_modify_info(self, first_period, last_period, data_unit, freq, original_freq):
         """
         Update modified information.
@@ -828,9 +1329,10 @@ class line_frame():
         df = self.df
 
         if freq != original_freq:
-            df = convert_frequency(df, freq, original_freq=st.session_state[self.state_name_previous_freq])
-        target_first_period = str(pd.Period(first_period).start_time.to_period(freq))
-        target_last_period = str(pd.Period(last_period).end_time.to_period(freq))
+            df = convert_frequency(df, freq, self.aggregation, original_freq=st.session_state[self.state_name_previous_freq])
+        target_first_period = pd.Period(first_period).start_time.to_period(freq)
+        target_last_period = pd.Period(last_period).end_time.to_period(freq)
+        period_slice = get_cache().get_period_index(self.data_name, df['Time'], freq).slice(target_first_period, target_last_period)
 
 
 
@@ -849,11 +1351,11 @@ class line_frame():
                     df,
                     self.data_name,
                     self.description
-                    ).query('Time >= @target_first_period and Time <= @target_last_period')
+                    ).iloc[period_slice]
         else:
             df_show = self.unit_transformation(
                     data_unit,
-                    df.query('Time >= @target_first_period and Time <= @target_last_period'),
+                    df.iloc[period_slice],
                     self.data_name,
                     self.description
                     )
@@ -869,6 +1371,8 @@ class line_frame():
             st.session_state[self.state_name_adj_indent] = False
             
         st.session_state[self.state_name_modify_content] = True
+        # Finer data of the previous table no longer apply.
+        st.session_state[self.state_name_zoom_range] = None
 
         st.rerun()
 
@@ -970,13 +1474,14 @@ class line_frame():
         
     
     def show_table(self):
-        df = st.session_state[self.state_name_df]
-        df.columns = df.columns.astype('string')
+        # Format periods as strings for display only; the df in session state keeps its PeriodIndex.
+        df = st.session_state[self.state_name_df].copy(deep = False)
+        df.columns = df.columns.astype(str)
     
         st.dataframe(
                 df,
                 height = self.box_height - self.height_offset,
-                column_config = NumCol_accounting_format(st.session_state[self.state_name_df].columns),
+                column_config = NumCol_accounting_format(df.columns),
                 key = self.key('DataTableContent')
                 )
     
@@ -1015,7 +1520,13 @@ class line_frame():
             plot_df = self.append_bg_line(plot_df)
 
         # Show chart only if users select one or more items.
-        if selected_items:
+        if selected_items and st.session_state[self.state_name_zoom_mode]:
+            self.display_zoom_chart(plot_df.columns.to_list(), content_height, n_legend_cols)
+
+        elif selected_items and st.session_state[self.state_name_freq] in self.lod_tiles_freq:
+            self.display_lod_chart(plot_df, content_height, n_legend_cols)
+
+        elif selected_items:
 
             plot_df = self.get_freq_adj_df(
                     plot_df,
@@ -1055,9 +1566,8 @@ class line_frame():
         if set_original_freq == None: # If use does not pass a value, use previous_freq.
             set_original_freq = st.session_state[self.state_name_previous_freq]
 
-        df['Time'] = df.index.astype(str)
-        df = convert_frequency(df, target_frequency=freq, original_freq=set_original_freq)
-        df['Time'] = df['Time'].astype('string')
+        df['Time'] = df.index
+        df = convert_frequency(df, target_frequency=freq, method=self.aggregation, original_freq=set_original_freq)
         df = df.set_index('Time')
 
         return df
@@ -1103,211 +1613,253 @@ class line_frame():
 
 
     def display_chart(self, plot_df, content_height, n_legend_cols):
-        # Hide grid line for both axis.
-        chart = self.get_chart_lines(plot_df, content_height, n_legend_cols = n_legend_cols).configure_axis(grid = False)
-        st.altair_chart(chart, key = self.key('ChartRightBoxChart'), width = 'stretch')
+        spec = self.get_chart_lines(plot_df, content_height, n_legend_cols = n_legend_cols)
+        st.vega_lite_chart(spec, key = self.key('ChartRightBoxChart'), width = 'stretch')
 
 
 
+    def display_lod_chart(self, plot_df, content_height, n_legend_cols):
+        """
+        Chart of the periods of plot_df from LOD tiles: about one point per pixel, with the min and max
+        of each bucket shaded around the line, whatever the number of periods.
+        """
+        window, level = self.get_lod_window(plot_df.columns.to_list(), plot_df.index[0], plot_df.index[-1])
+        spec = self.get_chart_lines(
+                window['value'], content_height, n_legend_cols = n_legend_cols,
+                df_min = window['min'] if level else None,
+                df_max = window['max'] if level else None,
+                bucket = window['bucket']
+                )
+        st.vega_lite_chart(spec, key = self.key('ChartRightBoxChart'), width = 'stretch')
 
 
 
-    def get_chart_lines(self, df, content_height:int, n_legend_cols = 4):
+    def get_lod_tiles(self):
         """
-        Return a line chart.
-    
-        bg_lines:   An alt.Chart() item, e.g., a plot of growth rate of gdp.
-                    If you pass a `bg_lines`, this function will add `bg_lines` (an alt chart item) to the main chart.
-        zero_line:  If True, draw y = 0 in chart. Usually used in growth rate chart.
-    
+        LOD tiles of every series at the frequency and in the unit of the table, shared by all sessions.
+        Index is window dependent (100 at the first period shown), so it uses the tiles of Level,
+        rescaled in get_lod_window().
         """
+        freq = st.session_state[self.state_name_freq]
+        unit = st.session_state[self.state_name_var_unit]
+        unit = 'Level' if unit == 'Index' else unit
+        cols = [i.strip() for i in self.df.columns if i != 'Time']
 
+        def build():
+            df = self.get_history_df(cols, unit = unit)
+            if len(self.df_bg_line):
+                df = self.append_bg_line(df)
+            return df
 
-        ###------Standardize column name for df------###
-        df.columns = standardize_col_name(df.columns.to_list())
-        col_selected = df.columns.to_list()
-        df['Time'] = df.index.values.astype(str)    # convert time column to string
-        df = df[['Time'] + col_selected].reset_index(drop = True)
+        methods = {i:self.aggregation[i] for i in cols if i in self.aggregation}
+        key = (self.data_name, unit, freq, tuple(sorted(methods.items())))
+        return get_cache().get_lod_tiles(key, self.df, build, methods)
 
 
-        ###------Get df for bar chart------###
-        # Replace all empty values in df with 0, so the bar chart can cover all time periods in df.
-        df_bar = df[['Time'] + [df.columns[1]]].fillna(0)
 
-    
-        ###------Define height for elements------###
-        #bar_height = 0.07 * content_height
-        bar_height = 0.04 * content_height
-        legend_height = 0.25 * content_height
-        chart_height = content_height - bar_height - legend_height
-    
-    
-        ###------Define selector------###
-        selector = alt.selection_point(
-                nearest = True,
-                on = 'pointerover',
-                clear = 'pointerout',
-                empty = False
+    def get_lod_window(self, cols, first_period, last_period):
+        """
+        Return the buckets of the series cols from first_period to last_period (see LODTiles.query())
+        at the level closest to one bucket per pixel, and that level.
+        """
+        tiles = self.get_lod_tiles()
+        level = tiles.get_level(first_period, last_period, self.chart_width)
+        window = tiles.query(first_period, last_period, level)
+        for i in ['min', 'max', 'value']:
+            window[i] = window[i][cols]
+
+        if st.session_state[self.state_name_var_unit] == 'Index':
+            base = tiles.query(first_period, first_period, 0)['value'][cols].iloc[0].to_numpy()
+            for i in ['min', 'max', 'value']:
+                window[i] = window[i] / base * 100
+
+        return window, level
+
+
+
+    def display_zoom_chart(self, cols, content_height, n_legend_cols):
+        """
+        Chart in zoom mode. Unlike display_chart(), it plots every period of the series cols, not only
+        the periods in the table, and zooming, panning and selecting periods happen in the browser,
+        without any rerun.
+
+        To keep at most max_periods_to_show points, the data are converted to a lower frequency
+        (level of detail) when needed. Once the user zooms in on a period short enough to be plotted
+        at the frequency of the table, the chart offers to load it (see load_chart_detail()), and
+        that period only is plotted at the frequency of the table.
+        """
+        freq = st.session_state[self.state_name_freq]
+        zoom_range = st.session_state[self.state_name_zoom_range]
+        if zoom_range is not None:
+            zoom_range = [pd.Timestamp(i, unit = 'ms').to_period(freq) for i in zoom_range]
+
+        if freq in self.lod_tiles_freq:
+            self.display_zoom_lod_chart(cols, zoom_range, content_height, n_legend_cols)
+            return
+
+        df = self.get_history_df(cols)
+
+        if len(self.df_bg_line):
+            df = self.append_bg_line(df)
+
+        ###------Period loaded in finer detail------###
+        if zoom_range is not None:
+            df = df.iloc[SortedPeriodIndex(df.index).slice(*zoom_range)]
+
+        ###------Level of detail------###
+        df, plot_freq = self.get_level_of_detail_df(df, freq)
+        if df.empty:
+            show_warning_message([Message.not_enough_obs(), Message.change_sample_period()])
+            return
+
+        # Longest period that can be plotted at the frequency of the table, 0: already plotted at that frequency.
+        detail_ms = 0 if plot_freq == freq else (self.max_periods_to_show // df.shape[1]) * get_period_ms(freq)
+
+        spec = self.get_chart_lines(df, content_height, n_legend_cols = n_legend_cols, freq = plot_freq, zoom = True, detail_ms = detail_ms)
+        st.vega_lite_chart(
+                spec,
+                key = self.key('ChartRightBoxZoomChart'),
+                width = 'stretch',
+                on_select = self.load_chart_detail,
+                selection_mode = ['detail_click']
                 )
-    
-        bar_selector = alt.selection_interval(encodings = ['x'])
 
-        legend_selector = alt.selection_point(
-                fields = ['key'],
-                bind = 'legend',
-                on = 'click',
-                clear = 'dblclick',
+
+
+    def display_zoom_lod_chart(self, cols, zoom_range, content_height, n_legend_cols):
+        """
+        display_zoom_chart() from LOD tiles: the level of detail is the level of the tiles, and a
+        period is loaded in finer detail once it fits the chart at one period per pixel.
+        """
+        freq = st.session_state[self.state_name_freq]
+        tiles = self.get_lod_tiles()
+        first_period, last_period = zoom_range or (tiles.first_period, tiles.last_period)
+        window, level = self.get_lod_window(cols, first_period, last_period)
+        if window['value'].empty:
+            show_warning_message([Message.not_enough_obs(), Message.change_sample_period()])
+            return
+
+        detail_ms = self.chart_width * get_period_ms(freq) if level else 0
+        spec = self.get_chart_lines(
+                window['value'], content_height, n_legend_cols = n_legend_cols, zoom = True, detail_ms = detail_ms,
+                df_min = window['min'] if level else None,
+                df_max = window['max'] if level else None,
+                bucket = window['bucket']
+                )
+        st.vega_lite_chart(
+                spec,
+                key = self.key('ChartRightBoxZoomChart'),
+                width = 'stretch',
+                on_select = self.load_chart_detail,
+                selection_mode = ['detail_click']
                 )
-    
-        ###------Define spike line------###
-        rule_tooltip = format_tooltip(col_selected)
-        rule = alt.Chart(df).mark_rule(color = 'grey').encode(
-                x = 'Time:N',
-                #y = alt.value(0),
-                y2 = alt.value('height'),
-                opacity = alt.condition(selector, alt.value(1), alt.value(0)),
-                tooltip = rule_tooltip,
-                ).add_params(selector).transform_filter(bar_selector)
-    
-    
-        ###------Define lines------###
-        lines = alt.Chart(df).transform_fold(col_selected).mark_line().encode(
-                x = alt.X(
-                    'Time:N',
-                    title = None,
-                    axis = alt.Axis(
-                        labelAngle = 0,
-                        labelAlign = 'center', # center the tick label.
-                        labelOverlap = 'parity'
-                        )
-                    ).scale(zero = False),
-                y = alt.Y('value:Q', title = None).scale(zero = False),
-                color = alt.Color(
-                    'key:N',
-                    scale = alt.Scale(
-                        domain = col_selected,
-                        range = [st.session_state[self.state_name_line_format_info][i]['line_color'] for i in col_selected]
-                        ),
-                    legend = alt.Legend(
-                        title = None,
-                        titleLimit = 1500,
-                        orient = 'bottom',
-                        direction = 'horizontal',
-                        columns = n_legend_cols,
-                        labelLimit = 500,
-                        symbolSize = 400,
-                        symbolStrokeWidth = 4,
-                        offset = 0, # Distance between legend and chart. Smaller -> Closer.
-                        ),
-                    # Legend is arranged in the same order as in self.df
-                    sort = list(st.session_state[self.state_name_line_format_info].keys())
-                    ),
 
-                size = alt.Size(
-                    'key:N',
-                    scale = alt.Scale(
-                        domain = col_selected,
-                        range = [st.session_state[self.state_name_line_format_info][i]['line_width'] for i in col_selected] if len(col_selected) > 1 else [st.session_state[self.state_name_line_format_info][col_selected[0]]['line_width'], st.session_state[self.state_name_line_format_info][col_selected[0]]['line_width'] - 0.01]
-                        ),
-                    # If I set legend = None, if will overlap with the color legend, and the symbol
-                    # will not present properly (clipped). I have not yet figure out how to solve
-                    # this problem, so I simply put the Size legend on the left of chart and 
-                    # set the strokewidth to 0 to hide it.
-                    legend = alt.Legend(
-                        orient = 'left', values = [''], title = None, symbolStrokeWidth = 0
-                        )
-                    ),
 
-                strokeDash = alt.StrokeDash(
-                    'key:N',
-                    scale = alt.Scale(
-                        domain = col_selected,
-                        range = [st.session_state[self.state_name_line_format_info][i]['line_style'] for i in col_selected]
-                        ),
 
-                    legend = None
-                    ),
+    def get_history_df(self, cols, unit = None):
+        """
+        Return every period of the series cols (Time as index), at the frequency and in the unit
+        (default: the unit of the table) of the table.
+        """
+        freq = st.session_state[self.state_name_freq]
+        original_freq = get_frequency(self.data_name)
+        df = self.df
+        if freq != original_freq:
+            df = convert_frequency(df, freq, self.aggregation, original_freq = original_freq)
 
-                opacity = alt.condition(
-                    legend_selector,
-                    alt.value(1),
-                    alt.value(0.2)
-                    ),
-                ).add_params(legend_selector).transform_filter(bar_selector).properties(height = chart_height)
-    
-        ###------If zero_line = True, show zero line (y = 0)------###
-        #zero_mark_opacity = alt.value(0)
-        #if st.session_state[self.state_name_zero_line]:
-        #    zero_mark_opacity = alt.value(1)
-    
-        zero_mark = alt.Chart(df).mark_line(color = 'grey', size = 3).encode(
-                x = 'Time:N',
-                y = alt.datum(0),
-                #opacity = zero_mark_opacity,
-                ).transform_filter(bar_selector)
-
-        ###------Add selection bar below the chart------###
-        bar = alt.Chart(df_bar).mark_bar(color = 'grey').encode(
-                x = alt.X('Time:N', title = None, axis = None),
-                y = alt.value(1),
-                #opacity = alt.condition(bar_selector, alt.value(.4), alt.value(0.2)),
-                opacity = alt.value(0),
-                tooltip = alt.Tooltip('Time:N', title = ' '),
-                ).add_params(
-                        bar_selector
-                ).properties(
-                        height = bar_height,
-                        title = alt.Title(
-                            #"Drag in the bar chart below to select a period of time.",
-                            text = [
-                                get_hint_message(
-                                # Use .join, so there will not be a large gap between each sentence when users download the chart.
-                                " ".join([
-                                    "Drag the bar above to adjust selected time periods.",
-                                    "Click on unselected area to restore the default period."
-                                    ])
-                                ),
-                                get_hint_message(
-                                " ".join([
-                                    "Click on one of the items below to highligh a single line.",
-                                    "Hold Shift button and click to select multiple items.",
-                                    "Double click in the main chart to restore default setup."
-                                    ])
-                                ),
-                                get_hint_message("Shaded areas indicate U.S. recessions.")
-                                ],
-                            fontSize = 14,
-                            fontWeight = 400, # normal text: 400, bold: larger number, e.g., 800
-                            offset = 5, # The distance between title and chart, the smaller the closer.
-                            orient = 'bottom'
-                            )
-                )
+        df = self.unit_transformation(unit or st.session_state[self.state_name_var_unit], df, self.data_name, self.description)
+        df = df.set_index('Time')
+        df.columns = [i.strip() for i in df.columns]
 
-        ###------Recession periods------###
-        df_recession = self.get_recession_indicator_try(df)
-        recession_periods = alt.Chart(df_recession).mark_rect(stroke = None).encode(
-                x = 'Time:N',
-                opacity = alt.value(st.session_state[self.state_name_recession_opacity]),
-                color = alt.value(st.session_state[self.state_name_recession_color])
-                ).transform_filter(bar_selector)
+        return df[cols]
 
 
-    
-        ###------Merge chart items------###
-        chart = alt.layer(rule, lines)
-
-        # If zero_line = True, show zero line (y = 0)
-        if st.session_state[self.state_name_zero_line]:
-            chart = alt.layer(chart, zero_mark)
-        # Show recession periods if triggered.
-        if st.session_state[self.state_name_show_recession]:
-            chart = alt.layer(chart, recession_periods)
-    
 
-        # Use configure_view to change color and size of the chart border.
-        chart = (chart & bar).configure_view(stroke = 'grey', strokeWidth = .2)
+    def get_level_of_detail_df(self, df, freq):
+        """
+        Convert df (at frequency freq) to lower frequencies until it has at most max_periods_to_show
+        points. Unlike adjust_data_frequency(), the frequency of the table is not changed.
+        Return the df and its frequency.
+        """
+        while df.size > self.max_periods_to_show and freq != get_frequency_level(freq_index = -1):
+            next_freq = get_frequency_level(freq_index = get_frequency_level(freq) + 1)
+            df = self.get_freq_adj_df(df, next_freq, set_original_freq = freq)
+            freq = next_freq
+
+        return df, freq
+
+
+
+    def load_chart_detail(self):
+        """
+        Callback of the zoom chart: the user clicked the link to load finer data of the visible period.
+        """
+        event = st.session_state[self.key('ChartRightBoxZoomChart')]
+        points = event['selection'].get('detail_click')
+        if points:
+            st.session_state[self.state_name_zoom_range] = (points[0]['t0'], points[0]['t1'])
+
+
+
+
+
+
+    @timed('line_frame.get_chart_lines')
+    def get_chart_lines(self, df, content_height:int, n_legend_cols = 4, freq = None, zoom = False, detail_ms = 0, df_min = None, df_max = None, bucket = 1):
+        """
+        Return the vega-lite spec (a dict) of the line chart of df (Time as index, one column per series).
+
+        The layers, selections, legends and hint titles only depend on the layout of the chart, so
+        they are compiled once per layout (see get_chart_template()). Here we only substitute the data,
+        the series names and the line format into a copy of that template.
+
+        freq:               frequency of df. Default: the frequency in session state.
+        zoom, detail_ms:    zoom mode, see display_zoom_chart().
+        df_min, df_max:     range of each point of df, shaded around the lines (see display_lod_chart()).
+        bucket:             periods per point of df, see get_recession_indicator_try().
+        """
+
+
+        ###------Standardize column name for df------###
+        df.columns = standardize_col_name(df.columns.to_list())
+        col_selected = df.columns.to_list()
+
+
+        ###------Shared dataset------###
+        # Melt the data once here instead of folding it in the browser. Every layer except the
+        # recession periods reads this single top-level dataset, so the data is sent only once.
+        freq = freq or st.session_state[self.state_name_freq]
+        df = get_long_chart_df(df, freq, df_min = df_min, df_max = df_max)
+
+
+        ###------Template of this layout------###
+        show_recession = st.session_state[self.state_name_show_recession]
+        template = get_chart_template(
+                n_series = len(col_selected),
+                freq = freq,
+                content_height = content_height,
+                n_legend_cols = n_legend_cols,
+                zero_line = st.session_state[self.state_name_zero_line],
+                show_recession = show_recession,
+                zoom = zoom,
+                band = df_min is not None,
+                )
+
+
+        ###------Substitute data and format------###
+        df_recession = self.get_recession_indicator_try(df, freq, bucket = bucket) if show_recession else None
+        spec = fill_chart_template(
+                template,
+                df,
+                col_selected,
+                st.session_state[self.state_name_line_format_info],
+                df_recession = df_recession,
+                recession_opacity = st.session_state[self.state_name_recession_opacity],
+                recession_color = st.session_state[self.state_name_recession_color],
+                detail_ms = detail_ms,
+                )
 
-        return chart
+        return spec
     
 
 
@@ -1572,10 +2124,9 @@ class line_frame():
 
         first_period, last_period = df.index.min(), df.index.max()
         df_bg = self.df_bg_line
-        df_bg['Time'] = format_time_column_to_str(df_bg)
-        df_bg.index = df_bg['Time'].values
+        df_bg.index = get_period_time(df_bg['Time'], df.index.freqstr)
         df_bg = (df_bg
-                .query("Time >= @first_period and Time <= @last_period")
+                .iloc[SortedPeriodIndex(df_bg.index).slice(first_period, last_period)]
                 .drop('Time', axis = 1)
                 )
         df = pd.concat([df, df_bg], axis = 1)
@@ -0,0 +1,145 @@
+"""
+Registry of the json config files (./config and ./config_data_request).
+
+Every config is read from disk once, validated against its schema and cached with the mtime of the
+file, so a rerun costs one os.stat() per config instead of one read and parse per caller. Editing
+a file reloads it on the next call.
+
+Usage:
+    unit_info = get_config('unit_info')             # ./config/unit_info.json
+    info_FRED = get_config('FRED')                  # ./config_data_request/FRED.json
+    params = dict(info_FRED['FFER-FRED-D']['params'])
+
+Configs are shared by every session of the server process, so they are returned as immutable
+views (dicts as MappingProxyType, lists as tuples). Copy a part with dict() / list() to modify it.
+Reads and hits are counted as config.miss / config.hit (see MyTools/instrumentation.py).
+"""
+
+import os, json, threading
+from types import MappingProxyType
+
+from MyTools.instrumentation import count
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Schemas
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# A schema is a type (the value must be an instance of it), a list [schema] (every item of a list
+# must match schema) or a dict {key: schema}. In a dict, "*" applies to every key, and a key ending
+# with "?" is optional. Keys that are not in the schema are allowed.
+schemas = {
+        "chart_config":{
+            "chart":{"WHratio":str, "chart_width":int},
+            "table":dict
+            },
+        "indent_config":{"*":{"*":int}},
+        "page_info":{"*":{"title":str, "url_path":str, "hidden?":bool}},
+        "source_info":{"*":str},
+        "unit_info":{"*":{"difference term":bool, "percentage value":bool}},
+        "BEA":{"*":{"params":{"*":str}, "drop_cols":[str], "MnToBn":bool, "name":str, "unit":str, "aggregation?":str}},
+        "FRED":{"*":{"params":{"*":str}, "name":str, "unit":str, "aggregation?":str}},
+        }
+
+# Folder of each config.
+config_dirs = {
+        "chart_config":"config",
+        "indent_config":"config",
+        "page_info":"config",
+        "source_info":"config",
+        "unit_info":"config",
+        "BEA":"config_data_request",
+        "FRED":"config_data_request",
+        }
+
+
+
+def validate(value, schema, where:str = ''):
+    """
+    Raise ValueError if value does not match schema. where is the position of value in the file,
+    e.g., "['Level']['difference term']".
+    """
+    if isinstance(schema, type):
+        # bool is a subclass of int, but a flag is never a valid count.
+        if not isinstance(value, schema) or (schema is int and isinstance(value, bool)):
+            raise ValueError(f"{where or 'value'} must be {schema.__name__}, got {value!r}")
+
+    elif isinstance(schema, list):
+        if not isinstance(value, list):
+            raise ValueError(f"{where or 'value'} must be list, got {value!r}")
+        for i, item in enumerate(value):
+            validate(item, schema[0], f'{where}[{i}]')
+
+    else:
+        if not isinstance(value, dict):
+            raise ValueError(f"{where or 'value'} must be dict, got {value!r}")
+        for key, sub_schema in schema.items():
+            if key == '*':
+                for k, v in value.items():
+                    validate(v, sub_schema, f'{where}[{k!r}]')
+            elif key.endswith('?'):
+                if key[:-1] in value:
+                    validate(value[key[:-1]], sub_schema, f'{where}[{key[:-1]!r}]')
+            elif key not in value:
+                raise ValueError(f"{where or 'value'} has no key {key!r}")
+            else:
+                validate(value[key], sub_schema, f'{where}[{key!r}]')
+
+
+def freeze(value):
+    """
+    Return an immutable view of a parsed json value.
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({k:freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(i) for i in value)
+    return value
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Registry
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# {path: (mtime_ns, size, view)}
+_configs = {}
+_configs_lock = threading.Lock()
+
+
+def get_config_path(name:str, root_dir = None) -> str:
+    if name not in config_dirs:
+        raise KeyError(f"Unknown config {name!r}, expected one of {list(config_dirs)}")
+    return os.path.join(root_dir or os.getcwd(), config_dirs[name], f'{name}.json')
+
+
+def get_config(name:str, root_dir = None) -> MappingProxyType:
+    """
+    Return the config name (e.g., 'unit_info', 'FRED') as an immutable view.
+    root_dir:   folder of ./config and ./config_data_request, the working directory by default.
+    Raise ValueError if the file does not match the schema of the config.
+    """
+    path = get_config_path(name, root_dir)
+    stat = os.stat(path)
+    with _configs_lock:
+        cached = _configs.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        count('config.hit')
+        return cached[2]
+
+    count('config.miss')
+    with open(path) as f:
+        config = json.load(f)
+    try:
+        validate(config, schemas[name])
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+    view = freeze(config)
+    with _configs_lock:
+        _configs[path] = (stat.st_mtime_ns, stat.st_size, view)
+
+    return view
+
+
+def clear():
+    with _configs_lock:
+        _configs.clear()
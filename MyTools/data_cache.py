@@ -0,0 +1,391 @@
+"""
+Process-wide cache of parsed datasets and of the panels (merged / derived dfs) built from them.
+
+Streamlit imports this module once per process, so all sessions share one cache. A watcher thread
+polls the generation counter of ./data/parse_data (see MyTools/store.py) and the stat signature of
+the cached csv files and, when the pipeline (or a deploy, git pull, an edit by hand) rewrites some
+csv files, evicts only those series and the panels that depend on them.
+
+Usage:
+    cache = get_cache()
+    df = cache.get_series('UNRATE-FRED-M')
+    df = cache.get_panel(('my panel', 'M'), deps = ['UNRATE-FRED-M', 'U6-FRED-M'], builder = build_fn)
+
+get_series returns the cached df without copying its data: its arrays are shared by all sessions
+and read-only, so callers replace columns (df[col] = ...) instead of writing into them. get_panel
+returns a copy, so callers may modify it freely. Time is returned as periods (period[freq]). Series are mapped from the array store (see MyTools/array_store.py) when it is up
+to date with the csv, so the processes of a host share one copy of the data; otherwise the csv is read.
+
+Concurrent sessions asking for the same series or panel wait on a single load (single-flight), so
+a data update does not make every open session rebuild the same merge at once. An evicted panel is
+kept as stale: the next request gets the stale copy at once while one background thread rebuilds
+it (stale-while-revalidate), and the requests after the rebuild get the new panel.
+
+    index = cache.get_period_index('Labor Market Rate-FRED-M', df['Time'], 'M')
+
+returns the sorted period index of a dataset (see MyTools/period_index.py), shared by all sessions.
+
+    tiles = cache.get_lod_tiles(('Monetary Policy-FRED-D', 'Level', 'D'), df, builder = build_fn)
+
+returns the level-of-detail tiles of a dataset (see MyTools/lod_tiles.py), also shared.
+
+    vintages = cache.get_vintages('NGDP-BEA-Q')
+    df = vintages.as_of('2025-06-30')
+
+returns the releases of a dataset (see MyTools/vintage_store.py), reloaded when a new one is recorded.
+"""
+
+import os, threading, time
+import pandas as pd
+
+from MyTools import store
+from MyTools import array_store
+from MyTools import vintage_store
+from MyTools.instrumentation import count
+from MyTools.lod_tiles import LODTiles
+from MyTools.lod_tiles import get_data_signature
+from MyTools.period_index import SortedPeriodIndex
+from MyTools.period_index import get_period_time
+from MyTools.frequency_conversion import get_frequency
+from MyTools.period_index import get_time_signature
+
+
+class Flight:
+    """
+    A load in progress, shared by every thread asking for the same key.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+
+class DatasetCache:
+    def __init__(self, root_dir = os.path.join('data', 'parse_data'), poll_interval:float = 2.0, stale_while_revalidate:bool = True,
+                 store_dir = os.path.join('data', 'array_store'), vintage_dir = os.path.join('data', 'vintage_store')):
+        """
+        stale_while_revalidate: serve evicted panels while they are rebuilt in the background.
+        store_dir:              array store built by the update pipeline, None to always read the csv files.
+        vintage_dir:            vintage store recorded by the update pipeline.
+        """
+        self.root_dir = root_dir
+        self.store_dir = store_dir
+        self.vintage_dir = vintage_dir
+        self.poll_interval = poll_interval
+        self.stale_while_revalidate = stale_while_revalidate
+        self.lock = threading.RLock()
+        # {data_name: (version of the csv when loaded, df)}, see file_version()
+        self.series = {}
+        # {key: ({data_name: version of the csv when built}, df)}
+        self.panels = {}
+        # {(name, freq): (signature of the Time column, SortedPeriodIndex)}
+        self.period_indexes = {}
+        # {key: (signature of the Time column, LODTiles)}
+        self.lod_tiles = {}
+        # {data_name: (generation of the vintage file when loaded, Vintages)}
+        self.vintages = {}
+        # {key: df} panels evicted by a data update, served until they are rebuilt.
+        self.stale_panels = {}
+        # {(kind, key): Flight} loads in progress.
+        self.flights = {}
+        self.watcher = None
+
+
+    def path_series(self, data_name):
+        return os.path.join(self.root_dir, f'{data_name}.csv')
+
+
+    def file_version(self, data_name, files:dict = None) -> tuple:
+        """
+        (generation, signature) of the csv of data_name: its generation in the store (files, if
+        already read) and its stat signature, so a csv changed outside the store is seen too.
+        """
+        files = store.get_generation(self.root_dir)['files'] if files is None else files
+        return (files.get(data_name, 0), store.file_signature(self.path_series(data_name)))
+
+
+    def single_flight(self, key, load):
+        """
+        Return load(). If another thread is already running the load of key, wait for it and return
+        its result (or raise its error) instead of loading again.
+        load must save its result in the cache before it returns, so the threads arriving after
+        the flight ends find it there.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self.flights[key] = Flight()
+
+        if not is_leader:
+            count('cache.single_flight.waits')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = load()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+        return flight.result
+
+
+    def get_series(self, data_name:str) -> pd.DataFrame:
+        """
+        Return ./data/parse_data/<data_name>.csv, with Time as periods. The df is a shallow copy:
+        columns can be added, replaced or renamed, but its values are read-only.
+        """
+        with self.lock:
+            cached = self.series.get(data_name)
+        count('cache.series.hit' if cached is not None else 'cache.series.miss')
+        if cached is None:
+            cached = self.single_flight(('series', data_name), lambda: self.load_series(data_name))
+
+        return cached[1].copy(deep = False)
+
+
+    def load_series(self, data_name:str) -> tuple:
+        # Read the version first: if the csv changes while it is loaded, the watcher reloads it.
+        version = self.file_version(data_name)
+        entry = array_store.read_index(self.store_dir).get(data_name) if self.store_dir else None
+        if entry is not None and entry['generation'] == version[0] and tuple(entry.get('csv_signature', ())) == version[1]:
+            count('cache.series.mapped')
+            df = array_store.read_series(self.store_dir, data_name, entry)
+        else:
+            df = array_store.read_csv_series(self.path_series(data_name), get_frequency(data_name))
+        with self.lock:
+            self.series[data_name] = (version, df)
+        return (version, df)
+
+
+    def get_panel(self, key, deps:list, builder) -> pd.DataFrame:
+        """
+        Return a copy of the panel saved under key, building it with builder() if needed.
+        key:        any hashable that identifies the panel, e.g., ('merge', (data names...), 'M').
+        deps:       data names of the series used by builder. The panel is evicted when any of them changes.
+        builder:    a function without arguments that returns a df.
+        If the panel was evicted by a data update, return the stale panel and rebuild it in the background.
+        """
+        with self.lock:
+            cached = self.panels.get(key)
+            stale = self.stale_panels.get(key) if cached is None else None
+        kind = key[0] if isinstance(key, tuple) else 'panel'
+
+        if cached is None and stale is not None:
+            count(f'cache.{kind}.stale')
+            self.refresh_panel(key, deps, builder)
+            return stale.copy()
+
+        count(f'cache.{kind}.hit' if cached is not None else f'cache.{kind}.miss')
+        if cached is None:
+            cached = self.single_flight(('panel', key), lambda: self.build_panel(key, deps, builder))
+
+        return cached[1].copy()
+
+
+    def build_panel(self, key, deps:list, builder) -> tuple:
+        versions = {i:self.file_version(i) for i in deps}
+        df = builder()
+        with self.lock:
+            self.panels[key] = (versions, df)
+            self.stale_panels.pop(key, None)
+        return (versions, df)
+
+
+    def refresh_panel(self, key, deps:list, builder):
+        """
+        Rebuild the panel saved under key in a background thread, unless it is already being built.
+        On error the stale panel is kept, and the next request retries.
+        """
+        with self.lock:
+            if ('panel', key) in self.flights:
+                return
+
+        def refresh():
+            try:
+                self.single_flight(('panel', key), lambda: self.build_panel(key, deps, builder))
+            except Exception as e:
+                count('cache.refresh.errors')
+                print(f"DatasetCache refresh of {key}: {e!r}")
+
+        threading.Thread(target = refresh, name = 'DatasetCacheRefresh', daemon = True).start()
+
+
+    def get_period_index(self, name, time, freq:str) -> SortedPeriodIndex:
+        """
+        Return the sorted period index of the Time column of dataset name at frequency freq.
+        name:   any name of the dataset, e.g., the data_name of a line_frame.
+        time:   its Time column (periods, strings or years). The index is rebuilt when the length,
+                the first or the last period of time changes, e.g., after new data are released.
+        The index is not copied; it is immutable.
+        """
+        key = (name, freq)
+        signature = get_time_signature(time)
+        with self.lock:
+            cached = self.period_indexes.get(key)
+        if cached is not None and cached[0] == signature:
+            count('cache.period_index.hit')
+            return cached[1]
+
+        count('cache.period_index.miss')
+        index = SortedPeriodIndex(get_period_time(time, freq))
+        with self.lock:
+            self.period_indexes[key] = (signature, index)
+
+        return index
+
+
+    def get_lod_tiles(self, key, df, builder, methods:dict = {}) -> LODTiles:
+        """
+        Return the LOD tiles saved under key, building them from builder() if needed.
+        key:        any hashable that identifies the data, e.g., (data_name, unit, freq).
+        df:         the dataset the tiles are built from (with a Time column). The tiles are rebuilt
+                    when its periods or values change, e.g., after a revision.
+        builder:    a function without arguments that returns a df (periods as index, one column per series).
+        methods:    {column: aggregation} of the value of the buckets (see LODTiles). Include them in key.
+        Tiles are not copied; they are immutable.
+        """
+        signature = get_data_signature(df)
+        with self.lock:
+            cached = self.lod_tiles.get(key)
+        if cached is not None and cached[0] == signature:
+            count('cache.lod_tiles.hit')
+            return cached[1]
+
+        count('cache.lod_tiles.miss')
+
+        def build():
+            tiles = LODTiles(builder(), methods)
+            with self.lock:
+                self.lod_tiles[key] = (signature, tiles)
+            return tiles
+
+        return self.single_flight(('lod_tiles', key, signature), build)
+
+
+    def get_vintages(self, data_name:str) -> vintage_store.Vintages:
+        """
+        Return the releases of data_name recorded in the vintage store (see MyTools/vintage_store.py),
+        reloaded when a new release is recorded. Raise FileNotFoundError if it has none.
+        Vintages are not copied; they are immutable.
+        """
+        generation = store.get_generation(self.vintage_dir)['files'].get(data_name, 0)
+        with self.lock:
+            cached = self.vintages.get(data_name)
+        if cached is not None and cached[0] == generation:
+            count('cache.vintages.hit')
+            return cached[1]
+
+        count('cache.vintages.miss')
+
+        def load():
+            vintages = vintage_store.Vintages.read(self.vintage_dir, data_name)
+            with self.lock:
+                self.vintages[data_name] = (generation, vintages)
+            return vintages
+
+        return self.single_flight(('vintages', data_name, generation), load)
+
+
+    def invalidate(self, changed):
+        """
+        Evict the series in changed and every panel derived from them. Evicted panels are kept as
+        stale panels if stale_while_revalidate is set.
+        Return the number of evicted items.
+        """
+        changed = set(changed)
+        with self.lock:
+            series = [i for i in self.series if i in changed]
+            panels = [k for k, (deps, _) in self.panels.items() if changed.intersection(deps)]
+            for i in series:
+                del self.series[i]
+            for k in panels:
+                _, df = self.panels.pop(k)
+                if self.stale_while_revalidate:
+                    self.stale_panels[k] = df
+        count('cache.evictions', len(series) + len(panels))
+
+        return len(series) + len(panels)
+
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+            self.panels.clear()
+            self.period_indexes.clear()
+            self.lod_tiles.clear()
+            self.vintages.clear()
+            self.stale_panels.clear()
+
+
+    def changed_series(self):
+        """
+        Return the data names whose csv has been rewritten since a cached series or panel was built
+        from it, by the store or by anything else (e.g., git pull).
+        """
+        files = store.get_generation(self.root_dir)['files']
+        with self.lock:
+            cached = {i:version for i, (version, _) in self.series.items()}
+            cached_deps = [deps for deps, _ in self.panels.values()]
+        # stat() outside the lock: it may be slow on a network file system.
+        versions = {}
+        def is_changed(data_name, version):
+            if data_name not in versions:
+                versions[data_name] = self.file_version(data_name, files)
+            return versions[data_name] != version
+
+        changed = {i for i, version in cached.items() if is_changed(i, version)}
+        for deps in cached_deps:
+            changed.update(i for i, version in deps.items() if is_changed(i, version))
+        return sorted(changed)
+
+
+    def check_generation(self):
+        changed = self.changed_series()
+        if changed:
+            self.invalidate(changed)
+        return changed
+
+
+    def watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.check_generation()
+            except Exception as e:
+                # Never let the watcher die, the next poll will retry.
+                print(f"DatasetCache watcher: {e!r}")
+
+
+    def start_watcher(self):
+        """
+        Start the watcher thread once per cache.
+        """
+        with self.lock:
+            if self.watcher is None:
+                self.watcher = threading.Thread(target = self.watch, name = 'DatasetCacheWatcher', daemon = True)
+                self.watcher.start()
+
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> DatasetCache:
+    """
+    Return the process-wide cache and start its watcher on first use.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DatasetCache()
+            _cache.start_watcher()
+    return _cache
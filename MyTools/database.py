@@ -1,8 +1,10 @@
 import pandas as pd
-import os, glob, json
+import os, glob
 from pathlib import Path
 
 from MyTools.frequency_conversion import get_frequency
+from MyTools import store
+from MyTools.config_registry import get_config
 
 def get_indent_config(data_name:str):
     """
@@ -10,12 +12,7 @@ def get_indent_config(data_name:str):
                 If an dataset comes with indent config (data_name is a key in config_info),
                 return indent_info, otherwise, return None.
     """
-    with open(os.path.join(os.getcwd(), 'config', 'indent_config.json')) as f:
-        config_info = json.load(f)
-    try:
-        return config_info[data_name]
-    except:
-        return None
+    return get_config('indent_config').get(data_name)
 
 
 def load_csv(path_csv):
@@ -104,7 +101,7 @@ class DataCollection:
 
 
         self.data_info['Data Series'] = self.data_info.index.values
-        self.data_info.to_csv(save_to, index = False)
+        store.write_csv(self.data_info, save_to, index = False)
         print(self.data_info)
 
 
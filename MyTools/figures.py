@@ -0,0 +1,99 @@
+"""
+Figures shown on the Time Series Data page and the datasets each of them is built from.
+
+Both pages/time_series_data.py and the cache warmer (MyTools/cache_warmer.py) read this file, so a
+new figure only needs to be declared here once.
+
+figure_data:
+    BEA tables:         {"data_name": <data_name>, "percent_share_GDP": bool, "isRGDP": bool}
+    Merged datasets:    {"data_list": [<data_name>, ...], "target_freq": <freq passed to merge_data_df>}
+    External charts:    None
+"""
+
+
+monetary_policy_rates = [
+        'FFER-FRED-D',
+        'FFRTUPPER-FRED-D',
+        'FFRTLOWER-FRED-D',
+        'FFRT-FRED-D',
+        'DISCOUNTPRIMARY-FRED-D',
+        'SREPOMR-FRED-D',
+        'IORR-FRED-D',
+        'IORB-FRED-D',
+        'ONRRP-FRED-D',
+        ]
+
+
+figure_data = {
+    ###------National Income------###
+    # nominal gdp
+    "Gross domestic product (quarterly)":{"data_name":"NGDP-BEA-Q"},
+    "Gross domestic product (annual)":{"data_name":"NGDP-BEA-A"},
+    # % share of ngdp
+    "Percentage share of GDP (quarterly)":{"data_name":"NGDP-BEA-Q", "percent_share_GDP":True},
+    "Percentage share of GDP (annual)":{"data_name":"NGDP-BEA-A", "percent_share_GDP":True},
+    # real gdp
+    "Real gross domestic product (quarterly)":{"data_name":"NGDP-BEA-Q", "isRGDP":True},
+    "Real gross domestic product (annual)":{"data_name":"NGDP-BEA-A", "isRGDP":True},
+    # nominal vs. rgdp
+    'Nominal vs. real GDP':None,
+    # Gross domestic income (GDI)
+    "Gross domestic income (quarterly)":{"data_name":"GDI-BEA-Q"},
+    "Gross domestic income (annual)":{"data_name":"GDI-BEA-A"},
+
+    ###------Unemployment------###
+    "Labor Market Level":{
+        "data_list":[
+            "CNP-FRED-M",
+            "CLF-FRED-M",
+            "NIL-FRED-M",
+            "EMP-FRED-M",
+            "UNEMP-FRED-M"
+            ],
+        "target_freq":"M"
+        },
+    "Labor Market Rate":{
+        "data_list":[
+            "LFPR-FRED-M",
+            "UNRATE-FRED-M",
+            "U1-FRED-M",
+            "U2-FRED-M",
+            "U4-FRED-M",
+            "U5-FRED-M",
+            "U6-FRED-M",
+            ],
+        "target_freq":"M"
+        },
+
+    ###------Price Index------###
+    "Measures of Price Level":{
+        "data_list":[
+            "CPIU-FRED-M",
+            "CoreCPIU-FRED-M",
+            "Chained_CPIU-FRED-M",
+            "Chained_CoreCPIU-FRED-M",
+            "PCE-FRED-M"
+            ],
+        "target_freq":"M"
+        },
+
+    ###------AD/AS------###
+    "Business cycle and AD/AS model":{
+        "data_list":[
+            "RGDP-FRED-Q",      # rgdp
+            "FRGDP-FRED-Q",     # r potential gdp
+            "GDPDeflator-BEA-Q",# GDP deflator
+            "UNRATE-FRED-M",    # unemployment rate
+            "NRUNEM-FRED-M",    # natural rate
+            ],
+        "target_freq":"D"
+        },
+
+    ###------Monetary Policy------###
+    "Monetary Policy and Interest Rate (monthly)":{"data_list":monetary_policy_rates, "target_freq":"M"},
+    "Monetary Policy and Interest Rate (daily)":{"data_list":monetary_policy_rates, "target_freq":"D"},
+    }
+
+
+# Order of figures in the drop-down list.
+fig_list = list(figure_data.keys())
@@ -1,11 +1,14 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import streamlit as st
 
+from MyTools.instrumentation import timed
+
 def frequency_dict():
     return {
             "D":"Daily",
-            #"W": "Weekly",
+            "W": "Weekly",
             "M": "Monthly",
             "Q": "Quarterly",
             "A": "Annual"
@@ -70,95 +73,261 @@ def get_frequency(data_name:str):
     return data_name.split('-')[-1]
 
 
-def convert_frequency(raw_data, target_frequency:str, method = 'mean', original_freq = None):
+def get_period_freq(freq:str) -> str:
     """
-    This function can do the following conversion:
-        1. from monthly to quarterly or anual data
-        2. from quarterly to anual data.
-    Then it return the new df in which Time is the first column.
+    Frequency of the periods of a dataset frequency, e.g., "A" -> "Y" (alias deprecated by pandas).
+    "W" is a week from Monday to Sunday (period[W-SUN]).
+    """
+    return 'Y' if freq == 'A' else freq
 
-    target_frequency:  Frequency you would like to convert the data to.
-                        "M", "Q", 'A'
 
-                        Not supported:
-                        "MS", month start;
-                        "ME", month end;
-                        "QS",
-                        "QE",
-                        "AS",
-                        "AE",...
 
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Resampling kernel
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Works on the sorted int64 ordinals of the periods: every source period falls in one target
+# period (its bucket), and the rows of a bucket are contiguous. All columns are aggregated at once
+# with ufunc.reduceat over the first row of each bucket.
 
+def get_buckets(bucket_ordinals):
+    """
+    bucket_ordinals: sorted ordinals of the target period of each row.
+    Return the distinct target periods and the position of their first row.
     """
+    buckets = np.unique(bucket_ordinals)
+    return buckets, np.searchsorted(bucket_ordinals, buckets, side = 'left')
 
-    raw_data['Time'] = pd.to_datetime(raw_data['Time'])
-    # resample to target frequency
-    df = raw_data.resample(target_frequency, on = 'Time')
-    if method == 'mean':
-        df = df.mean()
 
-        if target_frequency != original_freq:
-            # check if first and last period contains all obs in that period.
-            first_period_is_full, last_period_is_full = check_full_period(raw_data, target_frequency, original_freq)
-            if not first_period_is_full:
-                df = df.drop(df.index[0])
-            if not last_period_is_full:
-                df = df.drop(df.index[-1])
+# Every aggregation ignores NaN, and returns NaN for a bucket without valid value (count: 0).
+# values: 2-D (rows x columns); first_rows: position of the first row of each bucket.
 
+def aggregate_count(values, first_rows):
+    return np.add.reduceat(~np.isnan(values), first_rows, axis = 0).astype(float)
 
-    elif method == 'max':
-        df = df.max()
 
+def aggregate_sum(values, first_rows):
+    is_valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(is_valid, values, 0), first_rows, axis = 0)
+    return np.where(np.add.reduceat(is_valid, first_rows, axis = 0) > 0, sums, np.nan)
 
 
-    # If target_frequency = "QS", then freq = 'Q', etc.
-    df_t = pd.PeriodIndex(df.index, freq = target_frequency[0]).to_frame().reset_index(drop = True)
-    df = df.reset_index(drop = True)
-    df = pd.concat([df_t, df], axis = 1).round(2)
+def aggregate_mean(values, first_rows):
+    is_valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(is_valid, values, 0), first_rows, axis = 0)
+    counts = np.add.reduceat(is_valid, first_rows, axis = 0)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return sums / counts
 
 
+def aggregate_max(values, first_rows):
+    # fmax/fmin ignore NaN unless a bucket has no valid value.
+    return np.fmax.reduceat(values, first_rows, axis = 0)
 
-    return df
 
-def check_full_period(df, freq, original_freq):
+def aggregate_min(values, first_rows):
+    return np.fmin.reduceat(values, first_rows, axis = 0)
+
+
+def take_rows(values, rows, is_found):
     """
-    Check if sample period is not full, drop it. 
-    For example, given monthly data (df), user would like to convert it to quarterly (freq) data.
-    If the first three obs. come from Feb. Mar. and Apr., then, the function will drop data from
-    Feb. and Mar. since data from Jan. are missing, and it is unable to compute data in Q1.
+    values[rows[i, j], j], or NaN where is_found[i, j] is False.
     """
+    taken = np.take_along_axis(values, np.where(is_found, rows, 0), axis = 0)
+    return np.where(is_found, taken, np.nan)
+
+
+def aggregate_first(values, first_rows):
+    # First valid row of each bucket: the smallest valid row number (n_rows if none).
+    n_rows = len(values)
+    row_numbers = np.where(np.isnan(values), n_rows, np.arange(n_rows)[:, None])
+    rows = np.minimum.reduceat(row_numbers, first_rows, axis = 0)
+    return take_rows(values, rows, rows < n_rows)
 
-    df['test'] = pd.PeriodIndex(df['Time'], freq = freq)
 
-    ###------Get first and last target period------###
-    first_period = df['test'].unique()[0]
-    last_period = df['test'].unique()[-1]
+def aggregate_last(values, first_rows):
+    row_numbers = np.where(np.isnan(values), -1, np.arange(len(values))[:, None])
+    rows = np.maximum.reduceat(row_numbers, first_rows, axis = 0)
+    return take_rows(values, rows, rows >= 0)
 
-    ###------Generate full period------###
-    first_period_start, first_period_end = get_start_end_period(first_period, original_freq)
-    last_period_start, last_period_end = get_start_end_period(last_period, original_freq)
 
-    # number of periods that the original dataset supposed to have.
-    first_period_range = len(pd.period_range(first_period_start, first_period_end, freq = original_freq))
-    last_period_range = len(pd.period_range(last_period_start, last_period_end, freq = original_freq))
+def aggregate_median(values, first_rows):
+    # Sort the values of each bucket (NaN last), then average the middle valid value(s).
+    bucket = np.repeat(np.arange(len(first_rows)), np.diff(np.r_[first_rows, len(values)]))
+    counts = np.add.reduceat(~np.isnan(values), first_rows, axis = 0)
+    result = np.full((len(first_rows), values.shape[1]), np.nan)
+    for j in range(values.shape[1]):
+        sorted_values = values[np.lexsort((values[:, j], bucket)), j]
+        has_values = counts[:, j] > 0
+        low = first_rows + np.maximum(counts[:, j] - 1, 0) // 2
+        high = first_rows + counts[:, j] // 2
+        result[has_values, j] = (sorted_values[low[has_values]] + sorted_values[high[has_values]]) / 2
+    return result
 
-    ###------Compare length------###
-    actual_first_period_range = len(df[df['test'] == first_period])
-    actual_last_period_range = len(df[df['test'] == last_period])
 
-    first_period_is_full = (actual_first_period_range == first_period_range)
-    last_period_is_full = (actual_last_period_range == last_period_range)
+aggregations = {
+        "mean":aggregate_mean,
+        "sum":aggregate_sum,
+        "first":aggregate_first,
+        "last":aggregate_last,
+        "min":aggregate_min,
+        "max":aggregate_max,
+        "median":aggregate_median,
+        "count":aggregate_count,
+        }
 
+# Aggregations that are only meaningful over a full period, so convert_frequency sets a partial
+# first/last period to NaN (e.g., the mean of the current month is not a monthly mean yet).
+full_period_aggregations = ['mean', 'sum', 'median', 'count']
 
-    return first_period_is_full, last_period_is_full
 
+def check_aggregation(method:str) -> str:
+    if method not in aggregations:
+        raise ValueError(f"Unknown aggregation {method!r}, expected one of {list(aggregations)}")
+    return method
+
+
+def aggregate(values, first_rows, methods:list):
+    """
+    Aggregate each column of values with its method (one per column), columns sharing a method at once.
+    """
+    if len(set(methods)) == 1:
+        return aggregations[check_aggregation(methods[0])](values, first_rows)
+    aggregated = np.empty((len(first_rows), values.shape[1]))
+    for i in set(methods):
+        cols = [j for j, m in enumerate(methods) if m == i]
+        aggregated[:, cols] = aggregations[check_aggregation(i)](values[:, cols], first_rows)
+    return aggregated
 
 
-def get_start_end_period(one_time: pd.Period, freq):
-    one_time = pd.Period(one_time)
-    start = one_time.start_time.to_period(freq)
-    end = one_time.end_time.to_period(freq)
-    return start, end
+# Weeks are not nested in months, quarters or years: a week belongs to the period of its Thursday
+# (ISO 8601), i.e., the period of most of its days, e.g., Mon. 2025-03-31 to Sun. 2025-04-06 is in April.
+WEEK_MIDDLE_DAY = 3
+
+
+def is_weekly(freq) -> bool:
+    return pd.PeriodDtype(freq).freq.name.startswith('W')
+
+
+def get_bucket_ordinals(periods:pd.PeriodIndex, target_freq:str):
+    """
+    Ordinal of the target period of each period.
+    """
+    if is_weekly(periods.freq) and not is_weekly(target_freq):
+        periods = periods.asfreq('D', how = 'start') + WEEK_MIDDLE_DAY
+    return periods.asfreq(target_freq, how = 'start').asi8
+
+
+def count_source_periods(buckets, target_freq:str, source_freq:str):
+    """
+    Number of source periods in each target period, e.g., 90 days in 2025Q1, or 5 weeks (Thursdays)
+    in 2025-01.
+    """
+    targets = pd.PeriodIndex.from_ordinals(buckets, freq = target_freq)
+    if is_weekly(source_freq) and not is_weekly(target_freq):
+        first = (targets.asfreq('D', how = 'start') + WEEK_MIDDLE_DAY).asfreq(source_freq)
+        last = (targets.asfreq('D', how = 'end') - WEEK_MIDDLE_DAY).asfreq(source_freq)
+    else:
+        first = targets.asfreq(source_freq, how = 'start')
+        last = targets.asfreq(source_freq, how = 'end')
+    return last.asi8 - first.asi8 + 1
+
+
+def resample_periods(periods:pd.PeriodIndex, values, target_freq:str, method = 'mean', drop_partial = False):
+    """
+    Aggregate the rows of values (one row per period, sorted) by target period.
+    method:         an aggregation of the registry (e.g., "mean", "last"), or a list with one per
+                    column of values.
+    drop_partial:   set the first/last target period to NaN if it does not have a row for each of
+                    its source periods. For example, given monthly data from Feb. to Dec., Q1 is
+                    NaN since data from Jan. are missing. A bool, or a list with one per column of
+                    values; the period is dropped if it is NaN in every column.
+    Return the target periods (every period from the first to the last bucket, like
+    DataFrame.resample) and their aggregated values.
+    """
+    target_freq = get_period_freq(target_freq)
+    if len(periods) == 0:
+        return pd.PeriodIndex([], freq = target_freq), values[:0].astype(float)
+    bucket_ordinals = get_bucket_ordinals(periods, target_freq)
+    buckets, first_rows = get_buckets(bucket_ordinals)
+    aggregated = aggregate(values, first_rows, [method] * values.shape[1] if isinstance(method, str) else list(method))
+
+    # Scatter into the full range of target periods; periods without rows are NaN.
+    ordinals = np.arange(buckets[0], buckets[-1] + 1)
+    if len(ordinals) == len(buckets):
+        result = aggregated
+    else:
+        result = np.full((len(ordinals), values.shape[1]), np.nan)
+        result[buckets - buckets[0]] = aggregated
+
+    is_partial = np.broadcast_to(np.asarray(drop_partial, dtype = bool), (values.shape[1],))
+    if is_partial.any():
+        n_rows = np.diff(np.r_[first_rows, len(bucket_ordinals)])
+        is_full = n_rows == count_source_periods(buckets, target_freq, periods.freqstr)
+        result = result.astype(float)
+        for i, row in [(0, 0), (-1, len(ordinals) - 1)]:
+            if not is_full[i]:
+                result[row, is_partial] = np.nan
+        first = int(not is_full[0] and np.isnan(result[0]).all())
+        last = len(ordinals) - int(not is_full[-1] and np.isnan(result[-1]).all())
+        ordinals, result = ordinals[first:max(first, last)], result[first:max(first, last)]
+
+    return pd.PeriodIndex.from_ordinals(ordinals, freq = target_freq), result
+
+
+@timed('convert_frequency')
+def convert_frequency(raw_data, target_frequency:str, method = 'mean', original_freq = None):
+    """
+    This function can do the following conversion:
+        1. from daily to weekly, monthly, quarterly or anual data
+        2. from weekly or monthly to quarterly or anual data (and weekly to monthly)
+        3. from quarterly to anual data.
+    Then it return the new df in which Time is the first column.
+
+    target_frequency:  Frequency you would like to convert the data to.
+                        "W", "M", "Q", 'A'
+
+                        Not supported:
+                        "MS", month start;
+                        "ME", month end;
+                        "QS",
+                        "QE",
+                        "AS",
+                        "AE",...
+
+    method:     an aggregation of the registry (mean, sum, first, last, min, max, median, count),
+                or a dict {column: aggregation} (mean for the columns that are not in it), e.g., the
+                "aggregation" of each series in ./config_data_request/*.json.
+
+    The aggregation runs on the period ordinals (see resample_periods); raw_data is not modified.
+    """
+
+    if isinstance(raw_data['Time'].dtype, pd.PeriodDtype):
+        # Typed periods (see line_frame and MyTools/data_cache.py).
+        periods = pd.PeriodIndex(raw_data['Time'])
+    else:
+        periods = pd.PeriodIndex(pd.to_datetime(raw_data['Time']), freq = get_period_freq(original_freq or 'D'))
+    columns = raw_data.columns.drop('Time')
+    values = raw_data[columns].to_numpy()
+    if not periods.is_monotonic_increasing:
+        order = np.argsort(periods.asi8, kind = 'stable')
+        periods, values = periods[order], values[order]
+
+    methods = [method.get(i, 'mean') for i in columns] if isinstance(method, dict) else [method] * len(columns)
+    if set(methods) - {'max', 'min'}:
+        values = values.astype(float)
+
+    # If target_frequency = "QS", then freq = 'Q', etc.
+    # A partial first/last period is NaN in the columns of full-period aggregations (see
+    # full_period_aggregations), e.g., the mean of the current month, but not its last value.
+    time, values = resample_periods(
+            periods, values, target_frequency[0], methods,
+            drop_partial = [target_frequency != original_freq and i in full_period_aggregations for i in methods]
+            )
+
+    df = pd.DataFrame(values.round(2), columns = columns)
+    df.insert(0, 'Time', time.rename('Time'))
+
+    return df
 
 
 
@@ -175,9 +344,9 @@ def get_YoY_window(freq:str):
     """
     This function compute the window for YoY change or percentage change.
     Example: given monthly data, window should be 12; given quarterly data, window should be 4.
-    freq: M, Q, A, ...
+    freq: W, M, Q, A, ...
     """
-    return 12 if freq == 'M' else (4 if freq == 'Q' else 1)
+    return {"W":52, "M":12, "Q":4}.get(freq, 1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,258 @@
+"""
+Lightweight timing of the hot paths, shared by every session of the server process.
+
+Usage:
+    @timed('merge_data_df')                 # time every call and count the bytes of the returned df
+    def merge_data_df(...): ...
+
+    with timer('chart.to_json') as t:       # time a block
+        spec = chart.to_json()
+        t.add_bytes(len(spec))
+
+    count('cache.series.hit')               # plain counter
+
+Each metric keeps the number of calls, the total time, a latency histogram (fixed buckets, in ms),
+the bytes processed and the last <max_samples> latencies for percentiles. The cost is a
+perf_counter() pair and a lock per call. snapshot() returns everything as a df; the hidden
+Diagnostics page (pages/diagnostics.py) shows it.
+"""
+
+import os, time, threading, functools, contextlib
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# Upper bounds of the histogram buckets, in milliseconds.
+bucket_bounds_ms = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+max_samples = 1024
+
+
+
+class Metric:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.nbytes = 0
+        self.histogram = [0] * len(bucket_bounds_ms)
+        self.samples = deque(maxlen = max_samples)
+
+
+    def record(self, seconds:float, nbytes:int = 0, error:bool = False):
+        self.calls += 1
+        self.errors += int(error)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.nbytes += nbytes
+        self.samples.append(seconds)
+        ms = seconds * 1000
+        for i, bound in enumerate(bucket_bounds_ms):
+            if ms <= bound:
+                self.histogram[i] += 1
+                break
+
+
+    def summary(self) -> dict:
+        samples = np.array(self.samples) * 1000
+        p50, p90, p99 = np.percentile(samples, [50, 90, 99]) if len(samples) else (np.nan,) * 3
+        return {
+                "calls":self.calls,
+                "errors":self.errors,
+                "mean_ms":self.total_seconds / self.calls * 1000 if self.calls else np.nan,
+                "p50_ms":p50,
+                "p90_ms":p90,
+                "p99_ms":p99,
+                "max_ms":self.max_seconds * 1000,
+                "total_s":self.total_seconds,
+                "MB":self.nbytes / 1024**2,
+                }
+
+
+
+_metrics = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+def get_metric(name) -> Metric:
+    with _lock:
+        if name not in _metrics:
+            _metrics[name] = Metric(name)
+        return _metrics[name]
+
+
+def record(name, seconds:float, nbytes:int = 0, error:bool = False):
+    metric = get_metric(name)
+    with _lock:
+        metric.record(seconds, nbytes, error)
+
+
+def count(name, n:int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def get_nbytes(obj) -> int:
+    """
+    Bytes of a result: dfs, arrays, strings, or the first df of a tuple such as (df, freq).
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage().sum())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (str, bytes)):
+        return len(obj)
+    if isinstance(obj, tuple) and obj:
+        return get_nbytes(obj[0])
+    return 0
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Decorator and context manager
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+class Timer:
+    def __init__(self):
+        self.nbytes = 0
+
+    def add_bytes(self, nbytes:int):
+        self.nbytes += nbytes
+
+
+@contextlib.contextmanager
+def timer(name):
+    t = Timer()
+    start = time.perf_counter()
+    error = False
+    try:
+        yield t
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - start, t.nbytes, error)
+
+
+def timed(name = None, nbytes = get_nbytes):
+    """
+    Decorator. Record each call of the function under name (default: the function's qualified name).
+    nbytes: function that maps the returned value to the bytes processed, or None.
+    """
+    def decorator(func):
+        metric_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(metric_name) as t:
+                result = func(*args, **kwargs)
+                if nbytes is not None:
+                    t.add_bytes(nbytes(result))
+            return result
+        return wrapper
+    return decorator
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Reports
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def snapshot() -> pd.DataFrame:
+    """
+    One row per metric, sorted by total time.
+    """
+    with _lock:
+        rows = {name:metric.summary() for name, metric in _metrics.items()}
+    df = pd.DataFrame.from_dict(rows, orient = 'index')
+    if df.empty:
+        return df
+    return df.sort_values('total_s', ascending = False)
+
+
+def get_histograms() -> pd.DataFrame:
+    """
+    Calls per latency bucket, one row per metric. Columns are the bucket upper bounds (e.g., '<=5ms').
+    """
+    columns = [f'<={i:g}ms' if i != float('inf') else f'>{bucket_bounds_ms[-2]:g}ms' for i in bucket_bounds_ms]
+    with _lock:
+        rows = {name:list(metric.histogram) for name, metric in _metrics.items()}
+    return pd.DataFrame.from_dict(rows, orient = 'index', columns = columns)
+
+
+def get_counters() -> dict:
+    with _lock:
+        return dict(_counters)
+
+
+def get_hit_rates() -> pd.DataFrame:
+    """
+    Hit rate of each cache counted as <prefix>.hit / <prefix>.miss.
+    """
+    counters = get_counters()
+    rows = {}
+    for key in counters:
+        if key.endswith('.hit') or key.endswith('.miss'):
+            prefix = key.rsplit('.', 1)[0]
+            hits, misses = counters.get(f'{prefix}.hit', 0), counters.get(f'{prefix}.miss', 0)
+            rows[prefix] = {"hits":hits, "misses":misses, "hit_rate":hits / (hits + misses) if hits + misses else np.nan}
+    return pd.DataFrame.from_dict(rows, orient = 'index')
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+        _counters.clear()
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Memory
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_rss_mb():
+    """
+    Resident set size of the server process, or None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_state_mb(values) -> float:
+    """
+    Memory of the dfs among values (e.g., the values of a session state).
+    """
+    total = 0
+    for value in values:
+        if isinstance(value, pd.DataFrame):
+            total += value.memory_usage(deep = True).sum()
+    return total / 1024**2
+
+
+def get_session_memory() -> pd.DataFrame:
+    """
+    Memory of the dfs held in the session state of every session of this server.
+    Relies on Streamlit's runtime internals, so it returns an empty df if they change.
+    """
+    try:
+        from streamlit.runtime import Runtime
+        sessions = Runtime.instance()._session_mgr.list_sessions()
+        rows = {}
+        for info in sessions:
+            state = info.session.session_state
+            rows[info.session.id[:8]] = {
+                    "active":info.is_active,
+                    "reruns":info.script_run_count,
+                    "keys":len(state.filtered_state),
+                    "df_MB":get_state_mb(state.filtered_state.values()),
+                    }
+        return pd.DataFrame.from_dict(rows, orient = 'index')
+    except Exception:
+        return pd.DataFrame()
@@ -2,12 +2,178 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 
+from MyTools.frequency_conversion import convert_frequency
+from MyTools.frequency_conversion import get_frequency
+from MyTools.frequency_conversion import get_frequency_level
+from MyTools.frequency_conversion import check_aggregation
+from MyTools.config_registry import get_config
+from MyTools.data_cache import get_cache
+from MyTools.alignment import align_merge
+from MyTools.figures import figure_data
+from MyTools.instrumentation import timed
+
 def load_dataset(path_data):
     df = pd.read_csv(path_data)
 
     return df
 
 
+@timed('load_series')
+def load_series(data_name):
+    """
+    Return ./data/parse_data/<data_name>.csv from the process-wide cache. Its values are read-only
+    (see DatasetCache.get_series): copy it before modifying them in place.
+    """
+    return get_cache().get_series(data_name)
+
+
+
+def get_aggregation(data_name:str) -> str:
+    """
+    Aggregation used to convert data_name to a lower frequency: its "aggregation" in
+    ./config_data_request/<platform>.json, mean by default.
+    For example, policy rate targets (stocks) use "last", the recession indicator uses "max".
+    """
+    info = get_config(data_name.split('-')[1]).get(data_name, {})
+    return check_aggregation(info.get('aggregation', 'mean'))
+
+
+def get_aggregation_by_column(df, data_name_list:list) -> dict:
+    """
+    {column: aggregation} of a df merged from single-series datasets (e.g., FRED series), in the
+    order of data_name_list. Pass it to line_frame, so it converts each column with its aggregation.
+    """
+    return dict(zip(df.columns.drop('Time'), [get_aggregation(i) for i in data_name_list]))
+
+
+
+def get_merge_data_name(fig_name, platform, frequency):
+    """
+    Use this function to form data_name when a dataset is a merged from multiple datasets that come 
+    with different data frequency.
+    """
+    return f"{fig_name}-{platform}-{frequency}"
+
+
+def get_heightest_frequency_level(data_name_list:list):
+    """
+    Get the highest frequency level.
+
+    Frequency level from highest to lowest:
+        "A" > "Q" > "M" > "W" > "D"
+    """
+    ###------Get the highest frequency level------###
+
+    target_freq = get_frequency_level(
+            freq_index = max(
+                [get_frequency_level(freq = get_frequency(i)) for i in data_name_list]
+                )
+            )
+
+    return target_freq
+
+
+@timed('merge_data_df')
+def merge_data_df(data_name_list:list, target_freq = 'D', return_freq = False):
+    """
+    For each data_name in data_name_list:
+        1. Load corresponding df named <data_name.csv> in directory parse_data.
+        2. Merge all dfs in one pass (see MyTools/alignment.py).
+            -- You must make sure that data in all dfs are measured in the same frequency, such as daily, monthly, quarterly...
+
+    The merged df is cached until one of the csv files changes (see MyTools/data_cache.py).
+    """
+    highest_data_freq = get_heightest_frequency_level(data_name_list)
+    data_freq = target_freq if get_frequency_level(freq = target_freq) > get_frequency_level(freq = highest_data_freq) else highest_data_freq
+
+    methods = tuple(get_aggregation(i) for i in data_name_list)
+
+    def build():
+        ###------Convert frequency------###
+        dfs = [convert_frequency(load_series(i), data_freq, method, original_freq = get_frequency(i)) for i, method in zip(data_name_list, methods)]
+        ###------Merge datasets------###
+        return align_merge(dfs, data_freq)
+
+    # The aggregations are part of the key: changing one in the config builds a new panel.
+    result = get_cache().get_panel(('merge', tuple(data_name_list), data_freq, methods), data_name_list, build)
+
+
+    if return_freq:
+        return result, highest_data_freq
+    else:
+        return result
+
+
+
+@timed('load_BEA_table')
+def load_BEA_table(data_name, percent_share_GDP = False, isRGDP = False):
+    """
+    Return the df of a BEA table and its data_name. Derived dfs (percentage share, RGDP) are cached
+    as panels of the datasets they come from.
+    """
+    # If to display percentage share of NGDP
+    if percent_share_GDP:
+        source_name = data_name
+        data_name = f"{data_name}_share-{get_frequency(data_name)}"
+        df = get_cache().get_panel(
+                ('share', source_name), [source_name],
+                lambda: get_percentage_share_GDP(load_series(source_name), 'Gross domestic product')
+                )
+
+    elif isRGDP:
+        source_name = data_name
+        deflator_name = f'GDPDeflator-BEA-{get_frequency(data_name)}'
+        data_name = f'RGDP-{get_frequency(data_name)}'
+        df = get_cache().get_panel(
+                ('rgdp', source_name), [source_name, deflator_name],
+                lambda: get_rgdp(load_series(source_name), load_series(deflator_name))
+                )
+
+    else:
+        df = load_series(data_name)
+
+    return df, data_name
+
+
+@timed('get_recession_indicator')
+def get_recession_indicator(freq):
+    """
+    Return the NBER recession indicator (columns: Time, Recession) converted to freq.
+    """
+    recession_name = 'RECESSION-FRED-D'
+    # max (see ./config_data_request/FRED.json): mark that period (e.g., quarter) as recession if any
+    # period (e.g., day) in it is identified as recession.
+    method = get_aggregation(recession_name)
+
+    def build():
+        # Rename column name to Time and Recession.
+        df = load_series(recession_name)
+        df.columns = ['Time', 'Recession']
+        return convert_frequency(df, freq, method = method)
+
+    return get_cache().get_panel(('recession', freq, method), [recession_name], build)
+
+
+@timed('load_figure_df')
+def load_figure_df(fig_name):
+    """
+    Load the df behind a figure declared in MyTools/figures.py, and return it with its frequency.
+    Return (None, None) for figures that are not built from our datasets.
+    """
+    info = figure_data[fig_name]
+    if info is None:
+        return None, None
+
+    if 'data_list' in info:
+        df, highest_data_freq = merge_data_df(info['data_list'], target_freq = info['target_freq'], return_freq = True)
+        freq = max([info['target_freq'], highest_data_freq], key = lambda i: get_frequency_level(freq = i))
+    else:
+        df, data_name = load_BEA_table(info['data_name'], info.get('percent_share_GDP', False), info.get('isRGDP', False))
+        freq = get_frequency(info['data_name'])
+
+    return df, freq
+
+
 
 
 def get_percentage_share_GDP(df, denominator:str):
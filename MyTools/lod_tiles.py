@@ -0,0 +1,121 @@
+"""
+Level-of-detail (LOD) tiles of long series, e.g., the daily monetary policy rates and recession
+indicator.
+
+Level k groups the periods in buckets of 2**k periods (aligned on the first period) and stores the
+min, max and value of each series in every bucket, the value being aggregated with the method of
+the series (mean by default, e.g., last for policy rate targets, see MyTools/frequency_conversion.py).
+All levels are computed once, so a chart of any window and width is answered by slicing the level
+closest to one bucket per pixel, at a cost that does not depend on the length of the window:
+
+    tiles = get_cache().get_lod_tiles(('FFER', 'Level', 'D'), df, builder)
+    level = tiles.get_level('2000-01-01', '2020-12-31', 1000)   # ~1000 buckets
+    window = tiles.query('2000-01-01', '2020-12-31', level)
+    window['value']     # Time (start of each bucket, periods) as index, one column per series
+    window['min'], window['max']
+
+Tiles are immutable, so the dataset cache (MyTools/data_cache.py) shares them between all sessions.
+"""
+
+import numpy as np
+import pandas as pd
+
+from MyTools.period_index import get_time_signature
+from MyTools.frequency_conversion import aggregate
+
+
+
+def get_data_signature(df) -> tuple:
+    """
+    Signature of a dataset (Time and value columns): tiles built from a dataset with the same
+    signature are the same tiles.
+    """
+    return (
+            get_time_signature(df['Time']),
+            int(pd.util.hash_pandas_object(df.drop('Time', axis = 1), index = False).sum())
+            )
+
+
+
+class LODTiles:
+    def __init__(self, df, methods:dict = {}):
+        """
+        df:         Time (periods of a single frequency, sorted) as index, one column per series.
+        methods:    {column: aggregation} of the value of each bucket, mean for the columns not in it.
+        """
+        periods = pd.PeriodIndex(df.index)
+        self.freq = periods.freq
+        self.columns = df.columns.to_list()
+        self.methods = [methods.get(i, 'mean') for i in self.columns]
+        ordinals = periods.asi8
+        values = df.to_numpy(dtype = float)
+
+        # Level 0 is the series itself.
+        self.levels = [self.get_level_arrays(ordinals, values, values, values)]
+        if len(ordinals) == 0:
+            self.first_period = self.last_period = None
+            return
+        self.first_period, self.last_period = periods[0], periods[-1]
+
+        offset = ordinals - ordinals[0]
+        level = 0
+        while len(self.levels[-1]['start']) > 1:
+            level += 1
+            bucket = offset >> level
+            first_rows = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+            self.levels.append(self.get_level_arrays(
+                    ordinals[0] + (bucket[first_rows] << level),
+                    aggregate(values, first_rows, ['min'] * len(self.columns)),
+                    aggregate(values, first_rows, ['max'] * len(self.columns)),
+                    aggregate(values, first_rows, self.methods)
+                    ))
+
+
+    @staticmethod
+    def get_level_arrays(start, low, high, value) -> dict:
+        """
+        Arrays of one level: ordinal of the first period of each bucket, and aggregates (one row per
+        bucket, one column per series). They are read-only, since tiles are shared.
+        """
+        arrays = {"start":start, "min":low, "max":high, "value":value}
+        for i in arrays.values():
+            i.flags.writeable = False
+        return arrays
+
+
+    @property
+    def max_level(self) -> int:
+        return len(self.levels) - 1
+
+
+    def get_ordinal(self, period) -> int:
+        return pd.Period(period, freq = self.freq).ordinal
+
+
+    def get_level(self, first_period, last_period, width:int) -> int:
+        """
+        Level whose buckets are closest to one per pixel, for a window of width pixels.
+        """
+        n_periods = self.get_ordinal(last_period) - self.get_ordinal(first_period) + 1
+        level = int(np.round(np.log2(max(n_periods / max(width, 1), 1))))
+        return min(level, self.max_level)
+
+
+    def query(self, first_period, last_period, level:int) -> dict:
+        """
+        Return the buckets of level that overlap the periods from first_period to last_period (both
+        included), as {"min", "max", "value"} dfs (start of each bucket as index, one column per
+        series) and "bucket", the number of periods per bucket.
+        """
+        arrays = self.levels[level]
+        start = arrays['start']
+        # A bucket overlaps the window if it ends after first_period, i.e., starts after first_period - bucket.
+        rows = slice(
+                int(start.searchsorted(self.get_ordinal(first_period) - (1 << level) + 1, side = 'left')),
+                int(start.searchsorted(self.get_ordinal(last_period), side = 'right'))
+                )
+        index = pd.PeriodIndex.from_ordinals(start[rows], freq = self.freq).rename('Time')
+        window = {i:pd.DataFrame(arrays[i][rows].copy(), index = index, columns = self.columns) for i in ['min', 'max', 'value']}
+        window['bucket'] = 1 << level
+
+        return window
@@ -0,0 +1,105 @@
+"""
+Sorted period index of a dataset, for O(log n) range slicing and position lookup.
+
+line_frame keeps Time typed as periods (period[freq]) and formats it as strings only to display it.
+Instead of comparing every period (DataFrame.query) or scanning a list (list.index), it searches
+the sorted int64 ordinals of the periods:
+
+    index = get_cache().get_period_index(data_name, df['Time'], 'M')
+    df.iloc[index.slice('2020-01', '2020-12')]      # rows of 2020
+    index.position('2020-03')                       # row of 2020-03
+    index.labels                                    # ['1948-01', '1948-02', ...] for select boxes
+
+Indexes are immutable, so the dataset cache (MyTools/data_cache.py) shares one index per dataset
+and frequency between all sessions.
+"""
+
+import pandas as pd
+
+
+
+def get_period_time(time, freq:str) -> pd.PeriodIndex:
+    """
+    Return Time as periods, e.g., from '2020Q1', '2020-01', 1929 (annual BEA tables) or periods.
+    """
+    if isinstance(getattr(time, 'dtype', None), pd.PeriodDtype):
+        return pd.PeriodIndex(time)
+    if pd.api.types.is_datetime64_dtype(getattr(time, 'dtype', None)):
+        return pd.DatetimeIndex(time).to_period(freq)
+
+    time = pd.Index(time).astype(str)
+    try:
+        # ISO dates ('2020-01-01', '2020-01', '1929') are parsed at once; pd.PeriodIndex parses
+        # strings one by one.
+        return pd.DatetimeIndex(pd.to_datetime(time, format = 'ISO8601')).to_period(freq)
+    except ValueError:
+        return pd.PeriodIndex(time, freq = freq)
+
+
+def get_time_signature(time) -> tuple:
+    """
+    Length, first and last value of a Time column. Time is sorted and regular, so an index built
+    from a column with the same signature is the same index.
+    """
+    if len(time) == 0:
+        return (0, None, None)
+    return (len(time), time.iloc[0], time.iloc[-1])
+
+
+
+class SortedPeriodIndex:
+    def __init__(self, periods:pd.PeriodIndex):
+        """
+        periods: sorted periods of a single frequency, e.g., the Time column of a dataset.
+        """
+        self.periods = pd.PeriodIndex(periods).rename(None)
+        self.freq = self.periods.freq
+        self.ordinals = self.periods.asi8
+        self.ordinals.flags.writeable = False
+        self._labels = None
+
+
+    def __len__(self):
+        return len(self.ordinals)
+
+
+    @property
+    def labels(self) -> list:
+        """
+        Periods as strings, e.g., options of a select box. Built on first use.
+        """
+        if self._labels is None:
+            self._labels = self.periods.astype(str).to_list()
+        return self._labels
+
+
+    def get_ordinal(self, period) -> int:
+        """
+        Ordinal of a period, a string or a period of another frequency (e.g., '2020-02' -> 2020Q1).
+        """
+        return pd.Period(period, freq = self.freq).ordinal
+
+
+    def slice(self, first_period, last_period) -> slice:
+        """
+        Positions of the periods from first_period to last_period, both included.
+        """
+        return slice(
+                int(self.ordinals.searchsorted(self.get_ordinal(first_period), side = 'left')),
+                int(self.ordinals.searchsorted(self.get_ordinal(last_period), side = 'right'))
+                )
+
+
+    def position(self, period) -> int:
+        """
+        Position of period. Raise KeyError if it is not in the index.
+        """
+        ordinal = self.get_ordinal(period)
+        i = int(self.ordinals.searchsorted(ordinal))
+        if i == len(self.ordinals) or self.ordinals[i] != ordinal:
+            raise KeyError(period)
+        return i
+
+
+    def __getitem__(self, i):
+        return self.periods[i]
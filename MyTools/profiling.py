@@ -0,0 +1,190 @@
+"""
+Opt-in profiling of whole reruns, to capture the exact rerun a user reports as slow.
+
+Profiling is on for every rerun when the server runs with ECONDATA_PROFILE=1. With
+ECONDATA_PROFILE=query, it is on for the sessions opened with ?profile=1 in the url only; without
+it, ?profile=1 is ignored, so visitors cannot turn on the (process-wide) profiling of a production
+server. app.py then wraps pg.run() with profile_rerun(): each rerun is run under
+cProfile and tracemalloc, and two files are saved in ./profiles:
+    <id>.prof.gz    gzipped pstats dump, e.g., gunzip it and open it with snakeviz or pstats.
+    <id>.json       figure, widget action, duration, top functions and top allocations.
+The hidden Diagnostics page lists the profiles and offers them for download. Only the newest
+<max_profiles> are kept.
+
+Only one rerun is profiled at a time (tracemalloc is process-wide); reruns of other sessions that
+start meanwhile run unprofiled. Fragment reruns (e.g., clicks in the frame of a line_frame) do not
+run app.py, so they are not profiled; the timers of MyTools/instrumentation.py still record them.
+"""
+
+import os, io, json, gzip, time, marshal, pstats, cProfile, tracemalloc, threading, contextlib
+from datetime import datetime
+
+import streamlit as st
+
+from MyTools.store import atomic_write
+
+
+path_profiles = 'profiles'
+max_profiles = 50
+n_top_functions = 30
+n_top_allocations = 20
+# Depth of the stack saved by tracemalloc. Deeper stacks cost more memory and time.
+traceback_limit = 10
+
+_profile_lock = threading.Lock()
+
+
+
+def is_profiling_enabled() -> bool:
+    mode = os.environ.get('ECONDATA_PROFILE', '').lower()
+    if mode in ('1', 'true', 'yes'):
+        return True
+    return mode == 'query' and st.query_params.get('profile') == '1'
+
+
+def get_widget_values() -> dict:
+    """
+    Values of the keyed widgets and flags in the session state that can be compared between reruns.
+    """
+    return {
+            k:v for k, v in st.session_state.to_dict().items()
+            if isinstance(v, (bool, int, float, str)) and not k.startswith('_profile')
+            }
+
+
+def get_widget_action() -> list:
+    """
+    Keys whose value changed since the end of the previous rerun of this session, i.e., what the user
+    did: a clicked button (True for this rerun only), a new figure in the drop-down list, etc.
+    """
+    current = get_widget_values()
+    previous = st.session_state.get('_profile_widget_values', {})
+    action = []
+    for k, v in current.items():
+        if k not in previous:
+            changed = v is True
+        elif k.endswith('_button'):
+            # A button clicked in the previous rerun falls back to False; that is not an action.
+            changed = v is True
+        else:
+            changed = previous[k] != v
+        if changed:
+            action.append(k)
+    return sorted(action)
+
+
+def get_top_functions(profiler) -> list:
+    stats = pstats.Stats(profiler, stream = io.StringIO())
+    stats.sort_stats('cumulative')
+    rows = []
+    for func in stats.fcn_list[:n_top_functions]:
+        calls, n_calls, tottime, cumtime, _ = stats.stats[func]
+        file_name, line, name = func
+        rows.append({"function":f'{file_name}:{line}({name})', "ncalls":n_calls, "tottime":tottime, "cumtime":cumtime})
+    return rows
+
+
+def get_top_allocations(snapshot) -> list:
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+    return [
+            {"location":str(stat.traceback[0]), "KB":stat.size / 1024, "count":stat.count}
+            for stat in snapshot.statistics('lineno')[:n_top_allocations]
+            ]
+
+
+def save_profile(profile_id, profiler, meta:dict):
+    os.makedirs(path_profiles, exist_ok = True)
+    profiler.create_stats()
+    with atomic_write(os.path.join(path_profiles, f'{profile_id}.prof.gz'), 'wb') as f:
+        f.write(gzip.compress(marshal.dumps(profiler.stats)))
+    with atomic_write(os.path.join(path_profiles, f'{profile_id}.json')) as f:
+        json.dump(meta, f, indent = 1)
+    remove_old_profiles()
+
+
+def remove_old_profiles():
+    for profile in list_profiles()[max_profiles:]:
+        for ext in ['.prof.gz', '.json']:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(path_profiles, f"{profile['id']}{ext}"))
+
+
+def list_profiles() -> list:
+    """
+    Metadata of the saved profiles, newest first.
+    """
+    if not os.path.isdir(path_profiles):
+        return []
+    profiles = []
+    for file_name in sorted(os.listdir(path_profiles), reverse = True):
+        if file_name.endswith('.json'):
+            try:
+                with open(os.path.join(path_profiles, file_name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                continue
+    return profiles
+
+
+def read_profile_file(profile_id, ext) -> bytes:
+    with open(os.path.join(path_profiles, f'{profile_id}{ext}'), 'rb') as f:
+        return f.read()
+
+
+
+@contextlib.contextmanager
+def profile_rerun(page:str = None):
+    """
+    Usage (app.py):
+        with profile_rerun(pg.title):
+            pg.run()
+    Does nothing unless is_profiling_enabled().
+    """
+    if not is_profiling_enabled() or not _profile_lock.acquire(blocking = False):
+        yield
+        return
+
+    try:
+        action = get_widget_action()
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start(traceback_limit)
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if not tracing:
+                tracemalloc.stop()
+            st.session_state['_profile_widget_values'] = get_widget_values()
+
+            now = datetime.now()
+            profile_id = f"{now:%Y%m%d_%H%M%S_%f}"
+            meta = {
+                    "id":profile_id,
+                    "time":now.isoformat(timespec = 'seconds'),
+                    "page":page,
+                    "figure":st.session_state.get('figure'),
+                    "action":action,
+                    "seconds":seconds,
+                    "peak_MB":peak / 1024**2,
+                    "top_functions":get_top_functions(profiler),
+                    "top_allocations":get_top_allocations(snapshot),
+                    }
+            try:
+                save_profile(profile_id, profiler, meta)
+            except Exception as e:
+                # Profiling must never break the page.
+                print(f"profile_rerun: failed to save the profile: {e!r}")
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,212 @@
+"""
+Crash-safe writes for every file of the data store (raw json, parsed csv, catalogs).
+
+Each write goes to a temporary file in the target directory, is flushed and fsync'ed, and is then
+renamed over the target. Readers therefore see either the old or the new file, never a truncated one.
+
+Every directory of the store keeps a generation counter in <dir>/.generation.json:
+    {
+        "generation": 12,                       # bumped on every write in this directory
+        "files": {"NGDP-BEA-Q": 12, ...},       # generation at which each file last changed
+        "updated_at": "2026-01-27T10:00:00"
+    }
+Readers and caches call get_generation(dir) (a single os.stat() when nothing changed) and compare
+it with the generation they loaded to decide what to invalidate.
+"""
+
+import os, json, stat, tempfile, contextlib, threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+
+GENERATION_FILE = '.generation.json'
+
+def read_umask() -> int:
+    """
+    Umask of the process, from /proc/self/status (Linux 4.7+). os.umask() can only read it by
+    setting it, which would briefly let other threads create world-writable files. Default 0o022.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    return 0o022
+
+
+_umask = read_umask()
+
+
+def fsync_dir(dir_name):
+    """
+    Persist a rename. Not supported on Windows, where os.replace is already durable enough.
+    """
+    if os.name != 'posix':
+        return
+    fd = os.open(dir_name, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def get_file_mode(path) -> int:
+    """
+    Permissions of the file written to path: those of the file it replaces, or those of a file
+    created by open() (0o666 minus the umask) if there is none.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_umask
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode = 'w', **open_kwargs):
+    """
+    Usage:
+        with atomic_write(path) as f:
+            f.write(...)
+    The target is replaced only if the block finishes without error. The file keeps the permissions
+    of the target (mkstemp creates it readable by its owner only).
+    """
+    dir_name, base_name = os.path.split(os.path.abspath(path))
+    fd, path_temp = tempfile.mkstemp(prefix = f'.{base_name}.', suffix = '.tmp', dir = dir_name)
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            yield f
+            f.flush()
+            if hasattr(os, 'fchmod'): # not on Windows
+                os.fchmod(f.fileno(), get_file_mode(path))
+            os.fsync(f.fileno())
+        os.replace(path_temp, path)
+        fsync_dir(dir_name)
+    except BaseException:
+        if os.path.exists(path_temp):
+            os.remove(path_temp)
+        raise
+
+
+def write_csv(df, path, **kwargs):
+    """
+    Atomically write df to path and bump the generation of its directory.
+    kwargs are passed to df.to_csv().
+    """
+    with atomic_write(path, newline = '') as f:
+        df.to_csv(f, **kwargs)
+    bump_generation(os.path.dirname(os.path.abspath(path)), [file_key(path)])
+
+
+def write_json(content, path):
+    """
+    Atomically write a json file and bump the generation of its directory.
+    """
+    with atomic_write(path) as f:
+        json.dump(content, f)
+    bump_generation(os.path.dirname(os.path.abspath(path)), [file_key(path)])
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Generation counter
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def file_key(path):
+    """
+    Key of a file in the generation record: its base name without extension, e.g., NGDP-BEA-Q.
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def file_signature(path):
+    """
+    (st_mtime_ns, st_size) of a file, None if it does not exist. It changes when the file is
+    written outside the store as well (e.g., git pull, an edit by hand), which the generation
+    counter does not see.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def empty_generation():
+    return {"generation":0, "files":{}, "updated_at":None}
+
+
+def read_generation_file(path_generation):
+    try:
+        with open(path_generation) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return empty_generation()
+
+
+@contextlib.contextmanager
+def generation_lock(dir_name):
+    """
+    Serialize bumps from parallel parse workers. Without fcntl, writers are expected to be
+    serialized by the caller.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(dir_name, f'{GENERATION_FILE}.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def bump_generation(dir_name, changed:list):
+    """
+    Increase the generation counter of dir_name and record it for each file key in changed.
+    Return the new generation.
+    """
+    path_generation = os.path.join(dir_name, GENERATION_FILE)
+    with generation_lock(dir_name):
+        record = read_generation_file(path_generation)
+        record['generation'] += 1
+        for key in changed:
+            record['files'][key] = record['generation']
+        record['updated_at'] = datetime.now().isoformat(timespec = 'seconds')
+
+        with atomic_write(path_generation) as f:
+            json.dump(record, f, indent = 1)
+
+    return record['generation']
+
+
+_generation_cache = {}
+_generation_cache_lock = threading.Lock()
+
+def get_generation(dir_name) -> dict:
+    """
+    Return the generation record of dir_name (see the module docstring). The file is only re-read
+    when it is replaced, so this is cheap enough to call on every rerun.
+    Do not modify the returned dict.
+    """
+    path_generation = os.path.join(dir_name, GENERATION_FILE)
+    try:
+        stat = os.stat(path_generation)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return empty_generation()
+
+    with _generation_cache_lock:
+        cached = _generation_cache.get(path_generation)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    record = read_generation_file(path_generation)
+    with _generation_cache_lock:
+        _generation_cache[path_generation] = (signature, record)
+    return record
@@ -0,0 +1,262 @@
+"""
+Vintages of the parsed datasets: every value ever released for a period, with the date it was
+released, so revisions are kept and a dataset can be read as it was known on any date.
+
+The update pipeline (parse_data.save_and_update_data) records each release of a dataset:
+    record_vintage(vintage_dir, 'NGDP-BEA-Q', df, date(2026, 1, 29))
+
+Values are stored run-length encoded: a record (column, period, vintage, value) is only written when
+the value of a cell differs from its latest recorded value, i.e., when the period is new or revised.
+A release that changes nothing adds nothing. Each dataset is one file, <data_name>.npz, holding
+    columns     names of the value columns
+    freq        frequency of the dataset, e.g., "Q"
+    col         column of each record (position in columns)
+    period      int64 ordinal of the period, at freq
+    vintage     int64 release date (days since 1970-01-01)
+    value       float64, NaN if the period was released as missing
+with the records sorted by column, period and vintage.
+
+Reading (dashboard):
+    vintages = get_cache().get_vintages('NGDP-BEA-Q')
+    vintages.vintage_dates                  # release dates, sorted
+    df = vintages.as_of('2025-06-30')       # the dataset as released on or before 2025-06-30
+    df = vintages.latest()
+
+as_of() finds the latest record of each cell not after the date with one pass over the records
+(np.maximum.reduceat over the first record of each cell, which is indexed once per file).
+Seed the store from the current csv files with:
+    python -m MyTools.vintage_store
+"""
+
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+
+from MyTools import store
+from MyTools.frequency_conversion import get_frequency
+from MyTools.frequency_conversion import get_period_freq
+from MyTools.period_index import get_period_time
+
+
+
+def path_vintages(vintage_dir, data_name):
+    return os.path.join(vintage_dir, f'{data_name}.npz')
+
+
+def has_vintages(vintage_dir, data_name) -> bool:
+    return os.path.exists(path_vintages(vintage_dir, data_name))
+
+
+def get_day(vintage_date) -> int:
+    """
+    Days since 1970-01-01 of a date, e.g., date(2026, 1, 29), '2026-01-29' or a Timestamp.
+    """
+    return int(np.datetime64(pd.Timestamp(vintage_date).date(), 'D').astype('int64'))
+
+
+def get_column_names(columns:list) -> list:
+    """
+    Names of the columns as pd.read_csv reads them from the parsed csv: a repeated name (e.g.,
+    "Goods" in BEA tables) is numbered from its second occurrence, "Goods", "Goods.1", ...
+    """
+    names = []
+    for name in map(str, columns):
+        k, unique_name = 0, name
+        while unique_name in names:
+            k += 1
+            unique_name = f'{name}.{k}'
+        names.append(unique_name)
+    return names
+
+
+
+class Vintages:
+    def __init__(self, columns:list, freq:str, col, period, vintage, value):
+        """
+        Records of a dataset (see the module docstring), sorted by col, period and vintage.
+        """
+        self.columns = list(columns)
+        self.freq = freq
+        self.col, self.period, self.vintage, self.value = col, period, vintage, value
+        for i in (self.col, self.period, self.vintage, self.value):
+            i.flags.writeable = False
+
+        # First record of each cell (column, period).
+        is_first = np.r_[True, (col[1:] != col[:-1]) | (period[1:] != period[:-1])] if len(col) else np.array([], dtype = bool)
+        self.cell_starts = np.flatnonzero(is_first)
+        self.vintage_days = np.unique(vintage)
+
+
+    @classmethod
+    def read(cls, vintage_dir:str, data_name:str):
+        with np.load(path_vintages(vintage_dir, data_name)) as f:
+            return cls(
+                    f['columns'].tolist(), str(f['freq']),
+                    f['col'], f['period'], f['vintage'], f['value']
+                    )
+
+
+    @classmethod
+    def empty(cls, columns:list, freq:str):
+        return cls(
+                columns, freq,
+                np.array([], dtype = 'int32'), np.array([], dtype = 'int64'),
+                np.array([], dtype = 'int64'), np.array([], dtype = 'float64')
+                )
+
+
+    def __len__(self):
+        return len(self.col)
+
+
+    @property
+    def vintage_dates(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.vintage_days.astype('datetime64[D]'))
+
+
+    def get_latest_rows(self, day:int = None):
+        """
+        Position of the latest record of each cell not after day (days since 1970-01-01, all
+        records if None), -1 for the cells without record by then.
+        """
+        if len(self) == 0:
+            return np.array([], dtype = 'int64')
+        rows = np.arange(len(self))
+        if day is not None:
+            rows = np.where(self.vintage <= day, rows, -1)
+        return np.maximum.reduceat(rows, self.cell_starts)
+
+
+    def as_of(self, vintage_date = None) -> pd.DataFrame:
+        """
+        Return the dataset as released on or before vintage_date (the latest release if None):
+        Time (periods) and one column per series, NaN where a value was not released yet.
+        """
+        rows = self.get_latest_rows(None if vintage_date is None else get_day(vintage_date))
+        rows = rows[rows >= 0]
+        col, period = self.col[rows], self.period[rows]
+
+        periods = np.unique(period)
+        values = np.full((len(periods), len(self.columns)), np.nan)
+        values[np.searchsorted(periods, period), col] = self.value[rows]
+
+        df = pd.DataFrame(values, columns = self.columns)
+        df.insert(0, 'Time', pd.PeriodIndex.from_ordinals(periods, freq = get_period_freq(self.freq)))
+
+        return df
+
+
+    def latest(self) -> pd.DataFrame:
+        return self.as_of(None)
+
+
+    def add_release(self, df, vintage_date):
+        """
+        Return new Vintages with the release df (Time and value columns) of vintage_date, which must
+        not be earlier than the vintages already recorded, and the number of new or revised values.
+        Only those values are added; a value revised again on the same day replaces its record, so
+        the number of records may not grow.
+        """
+        day = get_day(vintage_date)
+        if len(self.vintage_days) and day < self.vintage_days[-1]:
+            raise ValueError(f"Vintage {vintage_date} is earlier than the last recorded vintage {self.vintage_dates[-1].date()}")
+
+        names = get_column_names(df.columns.drop('Time'))
+        columns = self.columns + [i for i in names if i not in self.columns]
+        ids = [columns.index(i) for i in names]
+        period = get_period_time(df['Time'], get_period_freq(self.freq)).asi8
+        values = df.drop('Time', axis = 1).to_numpy(dtype = float)
+
+        # Cells of the release, and their latest recorded value.
+        new_col = np.repeat(np.array(ids, dtype = 'int32')[None, :], len(period), axis = 0).ravel()
+        new_period = np.repeat(period, len(ids))
+        new_value = values.ravel()
+
+        rows = self.get_latest_rows()
+        low = min(self.period.min(initial = 0), new_period.min(initial = 0))
+        span = max(self.period.max(initial = 0), new_period.max(initial = 0)) - low + 1
+        keys = self.col[rows].astype('int64') * span + (self.period[rows] - low)
+        new_keys = new_col.astype('int64') * span + (new_period - low)
+
+        position = np.minimum(np.searchsorted(keys, new_keys), max(len(keys) - 1, 0))
+        is_found = (keys[position] == new_keys) if len(keys) else np.zeros(len(new_keys), dtype = bool)
+        latest_value = self.value[rows][position] if len(keys) else np.full(len(new_keys), np.nan)
+        is_changed = ~(is_found & ((latest_value == new_value) | (np.isnan(latest_value) & np.isnan(new_value))))
+
+        col = np.r_[self.col, new_col[is_changed]]
+        period = np.r_[self.period, new_period[is_changed]]
+        vintage = np.r_[self.vintage, np.full(is_changed.sum(), day, dtype = 'int64')]
+        value = np.r_[self.value, new_value[is_changed]]
+
+        order = np.lexsort((np.arange(len(col)), vintage, period, col))
+        col, period, vintage, value = col[order], period[order], vintage[order], value[order]
+        # A second release on the same day replaces the first one.
+        is_last = np.r_[(col[1:] != col[:-1]) | (period[1:] != period[:-1]) | (vintage[1:] != vintage[:-1]), True]
+
+        return Vintages(columns, self.freq, col[is_last], period[is_last], vintage[is_last], value[is_last]), int(is_changed.sum())
+
+
+    def write(self, vintage_dir:str, data_name:str):
+        with store.atomic_write(path_vintages(vintage_dir, data_name), 'wb') as f:
+            np.savez(
+                    f, columns = np.array(self.columns, dtype = str), freq = np.array(self.freq),
+                    col = self.col, period = self.period, vintage = self.vintage, value = self.value
+                    )
+        store.bump_generation(vintage_dir, [data_name])
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Write (update pipeline)
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def record_vintage(vintage_dir:str, data_name:str, df, vintage_date = None) -> int:
+    """
+    Record the release df (Time and value columns, as parsed) of data_name at vintage_date (today
+    by default). Return the number of new or revised values, 0 if there is none (nothing written).
+    """
+    os.makedirs(vintage_dir, exist_ok = True)
+    vintage_date = vintage_date or date.today()
+    if has_vintages(vintage_dir, data_name):
+        vintages = Vintages.read(vintage_dir, data_name)
+    else:
+        vintages = Vintages.empty([], get_frequency(data_name))
+
+    updated, n_changed = vintages.add_release(df, vintage_date)
+    if n_changed or updated.columns != vintages.columns:
+        updated.write(vintage_dir, data_name)
+
+    return n_changed
+
+
+def read_csv(path_csv) -> pd.DataFrame:
+    """
+    Read a parsed csv with the exact values that were written (the default float parser of
+    pd.read_csv may be off by one ulp), so an unchanged value is equal to its new release.
+    """
+    return pd.read_csv(path_csv, float_precision = 'round_trip')
+
+
+def seed_vintages(parse_data_dir:str, vintage_dir:str) -> list:
+    """
+    Record the csv files of parse_data_dir that have no vintage yet, dated by their last write.
+    Return the data names recorded.
+    """
+    recorded = []
+    for file_name in sorted(os.listdir(parse_data_dir)):
+        data_name = file_name[:-4]
+        if not file_name.endswith('.csv') or has_vintages(vintage_dir, data_name):
+            continue
+        path_csv = os.path.join(parse_data_dir, file_name)
+        vintage_date = date.fromtimestamp(os.path.getmtime(path_csv))
+        record_vintage(vintage_dir, data_name, read_csv(path_csv), vintage_date)
+        recorded.append(data_name)
+
+    return recorded
+
+
+
+if __name__ == '__main__':
+    recorded = seed_vintages(os.path.join('data', 'parse_data'), os.path.join('data', 'vintage_store'))
+    print(f"Vintage store: recorded {len(recorded)} datasets to {os.path.join('data', 'vintage_store')}")
@@ -1,7 +1,10 @@
-import json, os
+import os
 import altair as alt
 import streamlit as st
 
+from MyTools.cache_warmer import start_background_warmup
+from MyTools.config_registry import get_config
+from MyTools.profiling import profile_rerun
 
 
 
@@ -19,14 +22,21 @@ current_dir = os.getcwd()
 st.set_page_config(layout = 'wide')
 
 
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Warm up data cache
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Preload every figure into the shared cache in a background thread. It only starts once per
+# server process; progress and timings are printed to the server log.
+start_background_warmup()
+
+
 # ~~~~~~~~~~~~~~~~~~~~~~~
 # Initialize pages
 # ~~~~~~~~~~~~~~~~~~~~~~~
 ###------Load page info------###
 # Note, you MUST make sure that the name of python page files is consistent with the key in page_info.json.
 # For example, key for the first topic is gdp, then you much name the python page file as index_<key>_.py
-with open(os.path.join(current_dir, 'config', 'page_info.json')) as f:
-    page_data = json.load(f)
+page_data = get_config('page_info', current_dir)
 
 
 ###------Init page------###
@@ -39,7 +49,9 @@ for name, page_info in page_data.items():
             page = os.path.join(current_dir, 'pages', page_name),
             title = page_info['title'],
             url_path = page_info['url_path'],
-            default = default
+            default = default,
+            # Hidden pages (e.g., diagnostics) are not listed in the menu but can be opened by url.
+            visibility = 'hidden' if page_info.get('hidden', False) else 'visible'
             )
     topics.append(one_page)
 
@@ -49,7 +61,11 @@ pages = {
         "Menu":topics
         }
 pg = st.navigation(pages, position = 'top')
-pg.run()
+
+# Profile the rerun when ECONDATA_PROFILE=1, or when ECONDATA_PROFILE=query and the url contains
+# ?profile=1 (see MyTools/profiling.py).
+with profile_rerun(pg.title):
+    pg.run()
 
 
 
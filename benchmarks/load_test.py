@@ -0,0 +1,507 @@
+"""
+Load test of the Time Series Data page, in two modes.
+
+Interleaved (default): simulate N sessions with Streamlit's AppTest. Every session runs the real
+page script in this process, so sessions share the module-level cache exactly like the visitors of
+one server. AppTest keeps a single global Runtime and cannot rerun two scripts at the same time, so
+the sessions are interleaved: a scheduler picks a random session, which performs its next step, and
+so on. Latency is therefore the service time of one rerun, without queueing, and throughput is what
+one process sustains when reruns are serialized.
+
+Concurrent (--server): N threads connect to a running server over the websocket protocol of the
+browser, and interact at the same time. Latency includes queueing in the server (script threads,
+GIL, locks of the shared cache), as real visitors see it.
+
+Each session repeatedly:
+    1. selects a figure from fig_list,
+    2. selects two series and shows the chart,
+    3. opens Modify, changes the frequency and the unit, and applies it,
+    4. switches back to the table.
+
+Run from the project root:
+    python benchmarks/load_test.py --sessions 4 --iterations 5
+    python benchmarks/load_test.py --sessions 8 --iterations 3 --figures "Labor Market Rate"
+
+    PYTHONPATH=. streamlit run pages/time_series_data.py --server.headless true &
+    python benchmarks/load_test.py --server http://localhost:8501 --sessions 8 --server-pid $!
+
+Reported:
+    - latency percentiles (p50/p90/p99, in seconds) per interaction type,
+    - throughput (interactions per second over the whole run),
+    - memory: RSS growth of the process per session (of the server if --server-pid is given), and,
+      in interleaved mode, the size of the dfs kept in session state.
+Results are saved as json in ./benchmarks/results.
+"""
+
+import os, sys, json, time, random, argparse, traceback, warnings, resource, inspect, threading
+import importlib.metadata
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from MyTools.figures import figure_data
+
+
+path_page = str(ROOT / 'pages' / 'time_series_data.py')
+path_results = os.path.join('benchmarks', 'results')
+
+# Figures without a line_frame (external charts) have no buttons to click.
+default_figures = [k for k, v in figure_data.items() if v is not None]
+
+# Versions of Streamlit whose private AppTest._run the interleaved mode was checked against.
+supported_streamlit = ['1.66']
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Memory
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_rss_mb(pid = 'self'):
+    """
+    Current resident set size of this process (or of pid). Fall back to the peak RSS of this
+    process where /proc is missing.
+    """
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+
+def get_session_state_mb(at):
+    """
+    Memory of the dfs saved in the session state of one session.
+    """
+    total = 0
+    for value in at.session_state.values():
+        if isinstance(value, pd.DataFrame):
+            total += value.memory_usage(deep = True).sum()
+    return total / 1024**2
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Session
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+class Visitor:
+    """
+    One simulated visitor. Each interaction is a rerun of the page, timed with perf_counter.
+    Subclasses implement the steps: open_page, select_figure, show_chart, modify and show_table.
+    """
+    def __init__(self, session_id:int, figures:list, seed:int, timeout:float):
+        self.session_id = session_id
+        self.figures = figures
+        self.rng = random.Random(seed)
+        self.timeout = timeout
+        self.latencies = [] # [(interaction, seconds)]
+        self.errors = []
+
+
+    def steps(self, iterations:int):
+        """
+        Generator of the visit, paused after each step so the scheduler can switch sessions.
+        """
+        try:
+            self.open_page()
+            yield
+            for i in range(iterations):
+                for step in [self.select_figure, self.show_chart, self.modify, self.show_table]:
+                    step()
+                    yield
+        except Exception:
+            self.errors.append(('session', traceback.format_exc()))
+
+
+
+def check_run_hook():
+    """
+    Session wraps the private AppTest._run (see Session.add_row_selection). Fail loudly on a
+    version of Streamlit it was not checked against, rather than silently dropping the selection.
+    """
+    version = importlib.metadata.version('streamlit')
+    signature = inspect.signature(AppTest._run)
+    if '.'.join(version.split('.')[:2]) not in supported_streamlit or list(signature.parameters)[:3] != ['self', 'widget_state', 'timeout']:
+        raise RuntimeError(
+                f"The interleaved mode wraps AppTest._run{signature}, which is private and was only checked "
+                f"with Streamlit {supported_streamlit}, not {version}. Check it and update supported_streamlit, "
+                f"or run the concurrent mode (--server)."
+                )
+
+
+class Session(Visitor):
+    """
+    A visitor simulated with AppTest (interleaved mode).
+    """
+    def __init__(self, session_id:int, figures:list, seed:int, timeout:float):
+        super().__init__(session_id, figures, seed, timeout)
+        self.at = AppTest.from_file(path_page, default_timeout = timeout)
+        # Rows selected in the series table of the chart mode, see select_rows().
+        self.selected_rows = None
+        run_script = self.at._run
+        self.at._run = lambda widget_states = None, timeout = None: run_script(self.add_row_selection(widget_states), timeout)
+
+
+    def add_row_selection(self, widget_states):
+        """
+        AppTest has no setter for the row selection of st.dataframe(on_select = 'rerun'), so append
+        the selection to the widget states sent with every rerun, as the browser does.
+        """
+        if self.selected_rows is not None and widget_states is not None:
+            widget_states.widgets.append(self.selected_rows)
+        return widget_states
+
+
+    def select_rows(self, rows:list):
+        dataframes = self.at.dataframe
+        if not dataframes:
+            self.selected_rows = None
+            return
+        ws = WidgetState()
+        ws.id = dataframes[0].id
+        ws.string_value = json.dumps({"selection":{"rows":rows, "columns":[], "cells":[]}})
+        self.selected_rows = ws
+
+
+    def timed(self, interaction:str, action):
+        start = time.perf_counter()
+        action()
+        self.latencies.append((interaction, time.perf_counter() - start))
+        if self.at.exception:
+            self.errors.append((interaction, [e.message for e in self.at.exception]))
+
+
+    def button(self, label:str):
+        for b in self.at.button:
+            if b.label == label:
+                return b
+        return None
+
+
+    def selectbox(self, label:str):
+        for s in self.at.selectbox:
+            if s.label == label:
+                return s
+        return None
+
+
+    def open_page(self):
+        self.timed('open page', self.at.run)
+
+
+    def select_figure(self):
+        fig_name = self.rng.choice(self.figures)
+        self.selected_rows = None
+        self.timed('select figure', lambda: self.at.selectbox[0].set_value(fig_name).run())
+        return fig_name
+
+
+    def show_chart(self):
+        chart = self.button('Chart')
+        if chart is None:
+            return
+        self.timed('show chart', lambda: chart.click().run())
+        self.select_rows([0, 1])
+        self.timed('select series', self.at.run)
+
+
+    def show_table(self):
+        table = self.button('Table')
+        if table is not None:
+            self.timed('show table', lambda: table.click().run())
+
+
+    def modify(self):
+        """
+        Open the Modify dialog, pick another frequency and unit and apply them. Dialogs are not kept
+        between AppTest reruns, so the widgets are set and 'Modify' is clicked again in the rerun
+        that submits the form.
+        """
+        modify = self.button('Modify')
+        if modify is None:
+            return
+        self.timed('open modify', lambda: modify.click().run())
+
+        frequency, unit, refresh = self.selectbox('Frequency'), self.selectbox('Units'), self.button('Refresh Table')
+        if frequency is None or unit is None or refresh is None:
+            return
+        frequency.set_value(self.rng.choice(frequency.options))
+        unit.set_value(self.rng.choice(unit.options))
+        refresh.click()
+        self.button('Modify').click()
+        self.timed('apply modify', self.at.run)
+
+
+
+class ServerSession(Visitor):
+    """
+    A visitor of a running server (concurrent mode). It speaks the websocket protocol of the
+    browser: an interaction sends a rerun with the widget states (of the fragment of the widget,
+    if any) and waits until the server reports the end of the run.
+    """
+    def __init__(self, session_id:int, figures:list, seed:int, timeout:float, url:str):
+        super().__init__(session_id, figures, seed, timeout)
+        self.url = url
+        self.websocket = None
+        # Widgets of the last run: {(type, label): (proto, fragment_id)}.
+        self.widgets = {}
+        # Values set by the visitor, sent with every rerun like the browser does: {id: WidgetState}.
+        self.widget_states = {}
+        self.exceptions = []
+
+
+    def rerun(self, triggers:list = None, fragment_id:str = ''):
+        back_msg = BackMsg()
+        back_msg.rerun_script.fragment_id = fragment_id
+        back_msg.rerun_script.widget_states.widgets.extend(list(self.widget_states.values()) + (triggers or []))
+        if not fragment_id:
+            self.widgets = {}
+        self.websocket.send(back_msg.SerializeToString())
+
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(self.websocket.recv(timeout = self.timeout))
+            kind = msg.WhichOneof('type')
+            if kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                self.add_element(msg.delta.new_element, msg.delta.fragment_id)
+            elif kind == 'script_finished' and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return
+
+
+    def add_element(self, element, fragment_id:str):
+        kind = element.WhichOneof('type')
+        if kind == 'exception':
+            self.exceptions.append(element.exception.message)
+        elif kind in ['selectbox', 'button', 'dataframe']:
+            proto = getattr(element, kind)
+            if proto.id:
+                self.widgets[(kind, getattr(proto, 'label', ''))] = (proto, fragment_id)
+
+
+    def timed(self, interaction:str, action):
+        self.exceptions = []
+        start = time.perf_counter()
+        action()
+        self.latencies.append((interaction, time.perf_counter() - start))
+        if self.exceptions:
+            self.errors.append((interaction, self.exceptions))
+
+
+    def set_value(self, kind:str, label:str, **value):
+        """
+        Set the WidgetState of a widget, e.g., set_value('selectbox', 'Units', string_value = 'Level').
+        Return its fragment id, or None if the widget is not on the page.
+        """
+        if (kind, label) not in self.widgets:
+            return None
+        proto, fragment_id = self.widgets[(kind, label)]
+        ws = WidgetState(id = proto.id, **value)
+        self.widget_states[proto.id] = ws
+        return fragment_id
+
+
+    def click(self, interaction:str, label:str):
+        """
+        Click a button and time the rerun. Return False if the button is not on the page.
+        """
+        if ('button', label) not in self.widgets:
+            return False
+        proto, fragment_id = self.widgets[('button', label)]
+        self.timed(interaction, lambda: self.rerun([WidgetState(id = proto.id, trigger_value = True)], fragment_id))
+        return True
+
+
+    def open_page(self):
+        self.timed('open page', self.rerun)
+
+
+    def select_figure(self):
+        fig_name = self.rng.choice(self.figures)
+        # Widgets of the previous figure are gone.
+        self.widget_states = {}
+        if self.set_value('selectbox', 'Choose a dataset to display:', string_value = fig_name) is None:
+            raise RuntimeError('The page has no figure select box')
+        self.timed('select figure', self.rerun)
+        return fig_name
+
+
+    def show_chart(self):
+        if not self.click('show chart', 'Chart'):
+            return
+        fragment_id = self.set_value('dataframe', '', string_value = json.dumps({"selection":{"rows":[0, 1], "columns":[], "cells":[]}}))
+        if fragment_id is not None:
+            self.timed('select series', lambda: self.rerun(fragment_id = fragment_id))
+
+
+    def show_table(self):
+        self.click('show table', 'Table')
+
+
+    def modify(self):
+        """
+        Open the Modify dialog, pick another frequency and unit and submit the form.
+        """
+        if not self.click('open modify', 'Modify'):
+            return
+        frequency, unit = self.widgets.get(('selectbox', 'Frequency')), self.widgets.get(('selectbox', 'Units'))
+        if frequency is None or unit is None or ('button', 'Refresh Table') not in self.widgets:
+            return
+        self.set_value('selectbox', 'Frequency', string_value = self.rng.choice(frequency[0].options))
+        self.set_value('selectbox', 'Units', string_value = self.rng.choice(unit[0].options))
+        self.click('apply modify', 'Refresh Table')
+
+
+    def visit(self, iterations:int):
+        """
+        Run the whole visit on its own connection (one thread per session).
+        """
+        from websockets.sync.client import connect
+
+        try:
+            with connect(self.url, subprotocols = ['streamlit'], max_size = None) as self.websocket:
+                for _ in self.steps(iterations):
+                    pass
+        except Exception:
+            self.errors.append(('session', traceback.format_exc()))
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Runner
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def summarize(latencies:list) -> dict:
+    df = pd.DataFrame(latencies, columns = ['interaction', 'seconds'])
+    summary = {}
+    for interaction, seconds in df.groupby('interaction', sort = False)['seconds']:
+        summary[interaction] = {
+                "n":int(len(seconds)),
+                "p50":float(np.percentile(seconds, 50)),
+                "p90":float(np.percentile(seconds, 90)),
+                "p99":float(np.percentile(seconds, 99)),
+                "max":float(seconds.max()),
+                }
+    return summary
+
+
+def run(n_sessions:int = 4, iterations:int = 5, figures:list = None, seed:int = 0, timeout:float = 120, server:str = None, server_pid:int = None):
+    """
+    Interleaved mode if server is None, otherwise concurrent sessions against the server at that
+    url (e.g., http://localhost:8501); server_pid is the process whose memory is reported.
+    """
+    figures = figures or default_figures
+    pid = server_pid or 'self'
+    rss_before = get_rss_mb(pid)
+
+    start = time.perf_counter()
+    if server is None:
+        check_run_hook()
+        sessions = [Session(i, figures, seed + i, timeout) for i in range(n_sessions)]
+        active = {s.session_id:s.steps(iterations) for s in sessions}
+        scheduler = random.Random(seed)
+        while active:
+            session_id = scheduler.choice(list(active))
+            try:
+                next(active[session_id])
+            except StopIteration:
+                del active[session_id]
+    else:
+        url = urlparse(server)
+        url = f"{'wss' if url.scheme == 'https' else 'ws'}://{url.netloc}{url.path.rstrip('/')}/_stcore/stream"
+        sessions = [ServerSession(i, figures, seed + i, timeout, url) for i in range(n_sessions)]
+        threads = [threading.Thread(target = s.visit, args = (iterations,)) for s in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    seconds = time.perf_counter() - start
+
+    rss_after = get_rss_mb(pid)
+    latencies = [i for s in sessions for i in s.latencies]
+    errors = {s.session_id:s.errors for s in sessions if s.errors}
+
+    memory = {
+            "rss_before_mb":rss_before,
+            "rss_after_mb":rss_after,
+            "rss_per_session_mb":(rss_after - rss_before) / n_sessions,
+            }
+    if server is None:
+        memory['session_state_df_mb'] = float(np.mean([get_session_state_mb(s.at) for s in sessions]))
+
+    return {
+            "meta":{
+                "timestamp":datetime.now().isoformat(timespec = 'seconds'),
+                "mode":'interleaved' if server is None else 'concurrent',
+                "server":server,
+                "sessions":n_sessions,
+                "iterations":iterations,
+                "figures":figures,
+                "seed":seed,
+                "cpu_count":os.cpu_count(),
+                },
+            "seconds":seconds,
+            "n_interactions":len(latencies),
+            "throughput":len(latencies) / seconds,
+            "memory":memory,
+            "latency":summarize(latencies),
+            "errors":errors,
+            }
+
+
+def print_report(report):
+    print(f"\n{report['meta']['sessions']} {report['meta']['mode']} sessions x {report['meta']['iterations']} iterations: "
+          f"{report['n_interactions']} interactions in {report['seconds']:.1f}s "
+          f"({report['throughput']:.2f} interactions/s)\n")
+    print(f"{'interaction':20s}{'n':>6s}{'p50':>10s}{'p90':>10s}{'p99':>10s}{'max':>10s}")
+    for interaction, stats in report['latency'].items():
+        print(f"{interaction:20s}{stats['n']:6d}" + ''.join(f"{stats[k]:10.3f}" for k in ['p50', 'p90', 'p99', 'max']))
+
+    memory = report['memory']
+    print(f"\nRSS {memory['rss_before_mb']:.0f} -> {memory['rss_after_mb']:.0f} MB, "
+          f"{memory['rss_per_session_mb']:.1f} MB per session"
+          + (f", {memory['session_state_df_mb']:.2f} MB of dfs in each session state" if 'session_state_df_mb' in memory else ''))
+
+    for session_id, errors in report['errors'].items():
+        print(f"\n{'='*20} session {session_id}: {len(errors)} errors {'='*20}")
+        for interaction, error in errors[:3]:
+            print(f"[{interaction}] {error}")
+
+
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings('ignore')
+
+    parser = argparse.ArgumentParser(description = 'Simulate sessions of the Time Series Data page.')
+    parser.add_argument('--sessions', type = int, default = 4)
+    parser.add_argument('--iterations', type = int, default = 5, help = 'Figures visited by each session.')
+    parser.add_argument('--figures', nargs = '*', default = None, help = 'Figures to pick from. Default: every figure with a table.')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--timeout', type = float, default = 120, help = 'Timeout of one rerun, in seconds.')
+    parser.add_argument('--server', default = None, help = 'Url of a running server, e.g., http://localhost:8501: run the sessions concurrently against it.')
+    parser.add_argument('--server-pid', type = int, default = None, help = 'Process id of the server, to report its memory.')
+    parser.add_argument('--output', default = None, help = 'Path of the json output. Default: ./benchmarks/results/load_<timestamp>.json')
+    args = parser.parse_args()
+
+    report = run(args.sessions, args.iterations, args.figures, args.seed, args.timeout, args.server, args.server_pid)
+    print_report(report)
+
+    path_output = args.output or os.path.join(path_results, f"load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    Path(path_output).parent.mkdir(parents = True, exist_ok = True)
+    with open(path_output, 'w') as f:
+        json.dump(report, f, indent = 1)
+    print(f"\nSaved to {path_output}")
@@ -0,0 +1,420 @@
+"""
+Benchmarks for the ingestion, conversion and rendering hot paths.
+
+They run offline against the committed ./data/request_data and ./data/parse_data, and never write
+into ./data (parsers and catalogs write to a temporary directory).
+
+Run from the project root:
+    python benchmarks/run_benchmarks.py                     # all benchmarks
+    python benchmarks/run_benchmarks.py --filter merge      # names containing "merge"
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<old>.json
+
+Each benchmark is timed <repeat> times (min/median/mean, in seconds), then run once more under
+tracemalloc to record its peak memory. Results are saved as json in ./benchmarks/results.
+"""
+
+import os, sys, json, time, argparse, tempfile, tracemalloc, contextlib, io, warnings, platform, subprocess, shutil
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+import parse_data
+from MyTools.frequency_conversion import convert_frequency
+from MyTools.database import DataCollection
+from MyTools.load_data import merge_data_df
+from MyTools.load_data import load_series
+from MyTools.alignment import align_merge
+from MyTools.data_cache import get_cache
+from MyTools.data_cache import DatasetCache
+from MyTools import array_store
+from MyTools import vintage_store
+from MyTools.figures import figure_data
+from MyTools.chart_template import chart_frame_lines
+from MyTools.chart_template.chart_frame_lines import line_frame
+from MyTools.chart_template.chart_frame_lines import get_unit_info
+
+
+path_data_request = os.path.join('data', 'request_data')
+path_data_parse = os.path.join('data', 'parse_data')
+path_results = os.path.join('benchmarks', 'results')
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Registry
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+BENCHMARKS = []
+
+def benchmark(group):
+    """
+    Register a benchmark factory. The factory yields (name, params, fn) tuples; fn takes no argument
+    and may return a dict of extra metrics (e.g., bytes) to save with the timings.
+    """
+    def decorator(factory):
+        BENCHMARKS.append((group, factory))
+        return factory
+    return decorator
+
+
+def load_csv(data_name):
+    return pd.read_csv(os.path.join(path_data_parse, f'{data_name}.csv'))
+
+
+def get_FRED_payload(data_name):
+    """
+    Return the raw FRED json of data_name. If it is not stored in ./data/request_data (e.g.,
+    RECESSION-FRED-D), rebuild an equivalent payload from the parsed csv.
+    """
+    path_raw = os.path.join(path_data_request, f'{data_name}.json')
+    if os.path.exists(path_raw):
+        with open(path_raw) as f:
+            return json.load(f)
+
+    df = load_csv(data_name)
+    values = df.iloc[:, 1].astype(object).where(df.iloc[:, 1].notna(), '.').astype(str)
+    return {
+            "title":df.columns[1],
+            "observations":[{"date":t, "value":v} for t, v in zip(df['Time'], values)]
+            }
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Hide prints of the functions being measured.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Ingestion
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+@benchmark('parse')
+def bench_parse(tmp_dir):
+    with open(os.path.join('config_data_request', 'BEA.json')) as f:
+        config_BEA = json.load(f)
+
+    for data_name, info in config_BEA.items():
+        if not os.path.exists(os.path.join(path_data_request, f'{data_name}.json')):
+            continue
+        def fn(data_name = data_name, info = info):
+            with quiet():
+                parse_data.parse_BEA_data(path_data_request, tmp_dir, data_name, override = True, drop_cols = info['drop_cols'], MnToBn = info['MnToBn'])
+        yield f'parse_BEA_data[{data_name}]', {"data_name":data_name}, fn
+
+    raw_dir = os.path.join(tmp_dir, 'raw')
+    os.makedirs(raw_dir, exist_ok = True)
+    for data_name in ['UNRATE-FRED-M', 'FFER-FRED-D', 'RECESSION-FRED-D']:
+        payload = get_FRED_payload(data_name)
+        with open(os.path.join(raw_dir, f'{data_name}.json'), 'w') as f:
+            json.dump(payload, f)
+        def fn(data_name = data_name, n_obs = len(payload['observations'])):
+            with quiet():
+                parse_data.parse_FRED_data(raw_dir, tmp_dir, data_name, override = True)
+            return {"n_obs":n_obs}
+        yield f'parse_FRED_data[{data_name}]', {"data_name":data_name}, fn
+
+        # Conversion of the observations only (no json read, no csv write).
+        def fn(payload = payload):
+            parse_data.parse_FRED_observations(payload['observations'], payload['title'])
+            return {"n_obs":len(payload['observations'])}
+        yield f'parse_FRED_observations[{data_name}]', {"data_name":data_name}, fn
+
+
+@benchmark('store')
+def bench_store(tmp_dir):
+    store_dir = os.path.join(tmp_dir, 'array_store')
+    def fn():
+        return {"n_datasets":len(array_store.build_store(path_data_parse, store_dir))}
+    yield 'array_store.build_store', {}, fn
+
+    array_store.build_store(path_data_parse, store_dir)
+    data_names = sorted(array_store.read_index(store_dir))
+    for source, cache_store_dir in [('csv', None), ('mapped', store_dir)]:
+        def fn(cache_store_dir = cache_store_dir):
+            # Cold load of every dataset, as in a new server process.
+            cache = DatasetCache(store_dir = cache_store_dir)
+            for data_name in data_names:
+                cache.load_series(data_name)
+            return {"n_datasets":len(data_names)}
+        yield f'DatasetCache.load_series[{source}]', {"source":source}, fn
+
+
+@benchmark('vintage')
+def bench_vintage(tmp_dir):
+    def fn():
+        # A new store on every run, otherwise every dataset is already recorded.
+        return {"n_datasets":len(vintage_store.seed_vintages(path_data_parse, tempfile.mkdtemp(dir = tmp_dir)))}
+    yield 'vintage_store.seed_vintages', {}, fn
+
+    vintage_dir = os.path.join(tmp_dir, 'vintage_store')
+    vintage_store.seed_vintages(path_data_parse, vintage_dir)
+
+    for data_name in ['NGDP-BEA-Q', 'RECESSION-FRED-D']:
+        # A second release in which the last 20 periods are revised.
+        df = load_csv(data_name)
+        df.iloc[:, 1:] = df.iloc[:, 1:].astype(float)
+        df.iloc[-20:, 1:] = df.iloc[-20:, 1:] + 0.01
+        def fn(data_name = data_name, df = df):
+            vintages = vintage_store.Vintages.read(vintage_dir, data_name)
+            return {"n_changed":vintages.add_release(df, '2100-01-01')[1]}
+        yield f'Vintages.add_release[{data_name}]', {"data_name":data_name}, fn
+
+        vintages, _ = vintage_store.Vintages.read(vintage_dir, data_name).add_release(df, '2100-01-01')
+        for label, vintage_date in [('as of first vintage', vintages.vintage_dates[0]), ('latest', None)]:
+            def fn(vintages = vintages, vintage_date = vintage_date):
+                return {"n_rows":len(vintages.as_of(vintage_date))}
+            yield f'Vintages.as_of[{data_name}, {label}]', {"data_name":data_name}, fn
+
+
+@benchmark('catalog')
+def bench_catalog(tmp_dir):
+    def fn():
+        with quiet():
+            DataCollection().update_data_series(path_data_parse, save_to = os.path.join(tmp_dir, 'List_of_ALL_variables.csv'))
+    yield 'DataCollection.update_data_series', {}, fn
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Conversion
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+@benchmark('convert')
+def bench_convert(tmp_dir):
+    for data_name, method in [('FFER-FRED-D', 'mean'), ('RECESSION-FRED-D', 'max')]:
+        df = load_csv(data_name)
+        for freq in ['M', 'Q', 'A']:
+            def fn(df = df, freq = freq, method = method):
+                convert_frequency(df.copy(), freq, method = method, original_freq = 'D')
+                return {"n_rows":len(df)}
+            yield f'convert_frequency[{data_name} D->{freq} {method}]', {"data_name":data_name, "freq":freq, "method":method}, fn
+
+
+@benchmark('merge')
+def bench_merge(tmp_dir):
+    for fig_name, info in figure_data.items():
+        if not info or 'data_list' not in info:
+            continue
+        def fn(info = info):
+            # Measure the cold path: load csv, convert and merge.
+            get_cache().clear()
+            df = merge_data_df(info['data_list'], target_freq = info['target_freq'])
+            return {"shape":list(df.shape)}
+        yield f'merge_data_df[{fig_name}]', {"fig_name":fig_name, "n_series":len(info['data_list'])}, fn
+
+    # Merge step alone, on the converted series of the daily monetary policy panel.
+    fig_name = 'Monetary Policy and Interest Rate (daily)'
+    freq = figure_data[fig_name]['target_freq']
+    dfs = [convert_frequency(load_series(i), freq, original_freq = i.split('-')[-1]) for i in figure_data[fig_name]['data_list']]
+
+    def fn():
+        # Previous implementation: grow the result with one pd.concat per series.
+        result = pd.DataFrame()
+        for df in dfs:
+            result = pd.concat([result, df.set_index('Time')], axis = 1)
+        result = result.sort_index()
+        df_t = pd.PeriodIndex(result.index, freq = freq).to_frame().reset_index(drop = True)
+        df = pd.concat([df_t, result.reset_index(drop = True)], axis = 1)
+        return {"shape":list(df.shape)}
+    yield f'merge[{fig_name}, pd.concat loop]', {"fig_name":fig_name, "engine":"concat"}, fn
+
+    def fn():
+        df = align_merge(dfs, freq)
+        return {"shape":list(df.shape)}
+    yield f'merge[{fig_name}, align_merge]', {"fig_name":fig_name, "engine":"align_merge"}, fn
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Rendering
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def get_line_frame(fig_name):
+    """
+    Return a line_frame of a merged figure and its df. Streamlit runs in bare mode here, where
+    session state works as a plain dict.
+    """
+    info = figure_data[fig_name]
+    df = merge_data_df(info['data_list'], target_freq = info['target_freq'])
+    freq = info['target_freq']
+    return line_frame(f'{fig_name}-FRED-{freq}', df.copy()), df
+
+
+@benchmark('units')
+def bench_units(tmp_dir):
+    fig_name = 'Labor Market Level'
+    frame, df = get_line_frame(fig_name)
+    for unit in get_unit_info(os.getcwd()).keys():
+        def fn(unit = unit):
+            frame.unit_transformation(unit, df.copy(), frame.data_name, frame.description)
+        yield f'line_frame.unit_transformation[{unit}]', {"fig_name":fig_name, "unit":unit}, fn
+
+
+def get_plot_df(df, max_obs):
+    """
+    Mimic line_frame.get_plot_df(): Time as index (periods), one column per selected series, and
+    at most max_obs points in total.
+    """
+    plot_df = df.set_index('Time')
+    plot_df.index = pd.PeriodIndex(plot_df.index.values)
+    n_rows = max_obs // plot_df.shape[1]
+    return plot_df.iloc[-n_rows:]
+
+
+@benchmark('chart')
+def bench_chart(tmp_dir):
+    for fig_name in ['Labor Market Rate', 'Monetary Policy and Interest Rate (daily)']:
+        frame, df = get_line_frame(fig_name)
+        plot_df = get_plot_df(df, frame.max_periods_to_show)
+        # Measured once, outside the timings.
+        spec_bytes = get_spec_bytes(frame.get_chart_lines(plot_df.copy(), 640))
+        for template in ['cold', 'warm']:
+            def fn(frame = frame, plot_df = plot_df, template = template, spec_bytes = spec_bytes):
+                # cold: first chart of a layout, the template is compiled. warm: any later rerun.
+                if template == 'cold':
+                    chart_frame_lines._chart_templates.clear()
+                frame.get_chart_lines(plot_df.copy(), 640)
+                return {"spec_bytes":spec_bytes}
+            yield f'get_chart_lines[{fig_name}, {template}]', {"fig_name":fig_name, "n_obs":int(plot_df.size), "template":template}, fn
+
+
+@benchmark('lod')
+def bench_lod(tmp_dir):
+    fig_name = 'Monetary Policy and Interest Rate (daily)'
+    frame, df = get_line_frame(fig_name)
+    cols = [i.strip() for i in df.columns if i != 'Time']
+    time = frame.df['Time']
+
+    def fn():
+        # Built once per dataset and unit, then shared by all sessions.
+        get_cache().clear()
+        tiles = frame.get_lod_tiles()
+        return {"n_levels":tiles.max_level + 1}
+    yield f'line_frame.get_lod_tiles[{fig_name}, cold]', {"fig_name":fig_name}, fn
+
+    # Any window costs about the same: one slice of the level closest to one bucket per pixel.
+    for label, first_period in [('all periods', time.iloc[0]), ('3 years', time.iloc[-3 * 365])]:
+        def fn(first_period = first_period):
+            window, level = frame.get_lod_window(cols, first_period, time.iloc[-1])
+            frame.get_chart_lines(
+                    window['value'], 640,
+                    df_min = window['min'] if level else None,
+                    df_max = window['max'] if level else None,
+                    bucket = window['bucket']
+                    )
+            return {"level":level, "n_points":int(window['value'].size)}
+        yield f'lod_chart[{fig_name}, {label}]', {"fig_name":fig_name, "window":label}, fn
+
+
+def get_spec_bytes(spec):
+    """
+    Size of the spec as compact json, with the datasets as records, i.e., what Altair used to send
+    to the browser (Streamlit actually sends the datasets as Arrow).
+    """
+    spec = dict(spec, datasets = {k:v.to_dict('records') for k, v in spec['datasets'].items()})
+    return len(json.dumps(spec, separators = (',', ':')).encode())
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Runner
+# ~~~~~~~~~~~~~~~~~~~~~~~
+
+def measure(fn, repeat):
+    times, extra = [], {}
+    for i in range(repeat):
+        start = time.perf_counter()
+        extra = fn() or {}
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+            "min":min(times),
+            "median":float(np.median(times)),
+            "mean":float(np.mean(times)),
+            "repeat":repeat,
+            "peak_kb":peak / 1024,
+            **extra
+            }
+
+
+def get_meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+            "timestamp":datetime.now().isoformat(timespec = 'seconds'),
+            "commit":commit,
+            "python":platform.python_version(),
+            "pandas":pd.__version__,
+            "numpy":np.__version__,
+            "machine":platform.machine(),
+            "cpu_count":os.cpu_count(),
+            }
+
+
+def run(name_filter = None, repeat = 5):
+    results = []
+    tmp_dir = tempfile.mkdtemp(prefix = 'econdata_bench_')
+    try:
+        for group, factory in BENCHMARKS:
+            for name, params, fn in factory(tmp_dir):
+                if name_filter and name_filter not in name:
+                    continue
+                result = {"group":group, "name":name, "params":params, **measure(fn, repeat)}
+                results.append(result)
+                print(f"{name:70s} median {result['median']*1000:10.2f} ms   peak {result['peak_kb']:10.0f} KB")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors = True)
+
+    return {"meta":get_meta(), "results":results}
+
+
+def compare(report, path_old):
+    """
+    Print the ratio of median times (new/old) for benchmarks found in both runs.
+    """
+    with open(path_old) as f:
+        old = {i['name']:i for i in json.load(f)['results']}
+    print(f"\nCompared with {path_old}:")
+    for result in report['results']:
+        if result['name'] in old:
+            ratio = result['median'] / old[result['name']]['median']
+            print(f"{result['name']:70s} x{ratio:6.2f}")
+
+
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings('ignore')
+
+    parser = argparse.ArgumentParser(description = 'Run benchmarks and save timings as json.')
+    parser.add_argument('--filter', default = None, help = 'Only run benchmarks whose name contains this text.')
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--output', default = None, help = 'Path of the json output. Default: ./benchmarks/results/<timestamp>.json')
+    parser.add_argument('--compare', default = None, help = 'A previous json output to compare with.')
+    args = parser.parse_args()
+
+    report = run(args.filter, args.repeat)
+
+    path_output = args.output or os.path.join(path_results, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    Path(path_output).parent.mkdir(parents = True, exist_ok = True)
+    with open(path_output, 'w') as f:
+        json.dump(report, f, indent = 1)
+    print(f"\nSaved to {path_output}")
+
+    if args.compare:
+        compare(report, args.compare)
@@ -1,4 +1,4 @@
-import os, json, warnings, glob
+import os, warnings, glob
 from datetime import date
 import parse_data
 import request_data
@@ -7,6 +7,9 @@ import pandas as pd
 
 from MyTools.database import DataCollection
 from MyTools.frequency_conversion import get_frequency
+from MyTools import store
+from MyTools import array_store
+from MyTools.config_registry import get_config
 
 
 def define_update_schedule(current_date):
@@ -62,8 +65,7 @@ def get_data_params(file_name, add_new_data_seires, path_data_parse):
     """
     file_name: base name of json file.
     """
-    with open(Path('config_data_request')/file_name) as f:
-        dataset_list = json.load(f)
+    dataset_list = get_config(file_name.split('.json')[0])
 
     if add_new_data_seires:
         exist_series = [os.path.basename(i).replace('.csv', '') for i in glob.glob(os.path.join(path_data_parse, '*.csv'))]
@@ -99,7 +101,7 @@ def record_downloaded_data_series(dataset_list:list, data_name:str, path_df):
         df = pd.DataFrame(columns = ['variable', 'platform', 'frequncy'])
         df.loc[data_name, :] = new_record
         # save to csv, data_name is index.
-        df.to_csv(path_df)
+        store.write_csv(df, path_df)
         print_new_records(df.query('variable == @var_name'))
 
     else:
@@ -108,18 +110,25 @@ def record_downloaded_data_series(dataset_list:list, data_name:str, path_df):
         if not data_name in df.index:
             df.loc[data_name, :] = new_record
             print_new_records(df.query('variable == @var_name'))
-            df.to_csv(path_df)
+            store.write_csv(df, path_df)
 
 
 
-def update_database(path_data_request, path_data_parse, path_variables, override, add_new_data_seires, update_all = False):
+def update_database(path_data_request, path_data_parse, path_variables, override, add_new_data_seires, update_all = False, max_workers = None,
+                    path_array_store = os.path.join('data', 'array_store'), path_vintage_store = os.path.join('data', 'vintage_store')):
     """
     This is the main function that will request and parse data.
     Steps:
         1. request data and save json to ./data/request_data
         2. parse data and save csv to ./data/parse_data
+            -- Datasets are parsed in a process pool once all downloads finish (see parse_data.run_parse_stage).
+            -- Revised periods replace the old values in the csv, and every release is recorded in
+               ./data/vintage_store (see MyTools/vintage_store.py).
         3. if it is a new data series, add to ./variables_in_database.csv
+        4. convert the updated csv files to the memory-mapped array store (see MyTools/array_store.py)
     """
+    downloaded = {}
+
     #############################################
     #        Download data from BEA
     #############################################
@@ -132,15 +141,7 @@ def update_database(path_data_request, path_data_parse, path_variables, override
         if ready_to_update:
             # Request data
             request_data.get_BEA_data(path_data_request, dataset)
-            
-            # Parse data
-            drop_cols = dataset_list[dataset]['drop_cols']
-            MnToBn = dataset_list[dataset]['MnToBn']
-            
-            parse_data.parse_BEA_data(path_data_request, path_data_parse, dataset, override = override, drop_cols=drop_cols, MnToBn = MnToBn)
-            
-            record_downloaded_data_series(dataset_list, dataset, path_variables)
-            print('-'*80)
+            downloaded[dataset] = dataset_list
             
 
 
@@ -155,11 +156,37 @@ def update_database(path_data_request, path_data_parse, path_variables, override
         if ready_to_update:
             # Request data
             request_data.get_FRED_data(path_data_request, dataset)
-            # Parse data
-            parse_data.parse_FRED_data(path_data_request, path_data_parse, dataset, override)
-            
-            record_downloaded_data_series(dataset_list, dataset, path_variables)
-            print('-'*80)
+            downloaded[dataset] = dataset_list
+
+
+    #############################################
+    #        Parse data
+    #############################################
+
+    jobs = parse_data.get_parse_jobs(path_data_request, path_data_parse, override = override, data_names = list(downloaded.keys()), vintage_dir = path_vintage_store)
+    report = parse_data.run_parse_stage(jobs, max_workers = max_workers)
+
+    for dataset in report.index[report['error'].isna()]:
+        record_downloaded_data_series(downloaded[dataset], dataset, path_variables)
+        print('-'*80)
+
+
+    #############################################
+    #        Update array store
+    #############################################
+    # Convert every csv that is not in the store yet, or was rewritten since it was stored (by the
+    # pipeline or otherwise, e.g., git pull).
+    generations = store.get_generation(path_data_parse)['files']
+    index = array_store.read_index(path_array_store)
+    outdated = [
+            i[:-4] for i in os.listdir(path_data_parse)
+            if i.endswith('.csv') and not array_store.is_current(index.get(i[:-4]), path_data_parse, i[:-4], generations)
+            ]
+    if outdated:
+        written = array_store.build_store(path_data_parse, path_array_store, outdated)
+        print(f"Array store: updated {len(written)} datasets.")
+
+    return report
             
 
     
@@ -183,6 +210,8 @@ Instruction:
                 "drop_cols":    [],             # col you want to drop in data parsing.
                 "MnToBn":       bool,           # If to divide raw values by 1000 to convert Mn. of $ to Bn. of $.
                 "name":         string          # name of variable that will be save in record df.
+                "aggregation":  string          # [optional] how to convert it to a lower frequency, "mean" by default.
+                                                # One of mean, sum, first, last, min, max, median, count (see MyTools/frequency_conversion.py).
             }
 
 
@@ -226,11 +255,13 @@ path_variables = os.path.join('data', 'variables_in_database.csv')
 
 """
 Run this to request and update your database.
+Keep it under the __main__ guard: parse workers re-import this file on platforms that spawn processes.
 """
-# Step 1: Download and parse data from websites
-update_database(path_data_request, path_data_parse, path_variables, override, add_new_data_seires)
-# Step 2: Update data list
-DataCollection().update_data_series(path_data_parse)
+if __name__ == "__main__":
+    # Step 1: Download and parse data from websites
+    update_database(path_data_request, path_data_parse, path_variables, override, add_new_data_seires)
+    # Step 2: Update data list
+    DataCollection().update_data_series(path_data_parse)
 
 
 
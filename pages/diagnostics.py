@@ -0,0 +1,128 @@
+import pandas as pd
+import streamlit as st
+
+from MyTools import instrumentation
+from MyTools import profiling
+from MyTools.data_cache import get_cache
+from MyTools.cache_warmer import warmup_status
+
+
+"""
+# Diagnostics
+Timings of the hot paths since the server started (or since the last reset), shared by all sessions.
+This page is hidden from the menu; open it with the url `/diagnostics`.
+"""
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Controls
+# ~~~~~~~~~~~~~~~~~~~~~~~
+container = st.container(horizontal = True)
+with container:
+    st.button('Refresh')
+    if st.button('Reset metrics'):
+        instrumentation.reset()
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Process
+# ~~~~~~~~~~~~~~~~~~~~~~~
+cache = get_cache()
+rss = instrumentation.get_rss_mb()
+
+col_rss, col_series, col_panels, col_warmup = st.columns(4)
+col_rss.metric('Process RSS', f'{rss:.0f} MB' if rss is not None else 'n/a')
+col_series.metric('Cached series', len(cache.series))
+col_panels.metric('Cached panels', len(cache.panels))
+col_warmup.metric('Cache warm-up', f"{warmup_status['state']} ({warmup_status['n_done']}/{warmup_status['n_total']})")
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Latency
+# ~~~~~~~~~~~~~~~~~~~~~~~
+"""
+### Hot paths
+Latency percentiles are computed over the last calls of each function; MB is the size of the returned dfs.
+"""
+df_metrics = instrumentation.snapshot()
+if df_metrics.empty:
+    st.write('Nothing recorded yet. Open the Time Series Data page first.')
+else:
+    st.dataframe(df_metrics.round(2))
+
+    """
+    ### Latency histograms
+    Number of calls per latency bucket.
+    """
+    st.dataframe(instrumentation.get_histograms())
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Cache
+# ~~~~~~~~~~~~~~~~~~~~~~~
+"""
+### Cache hit rates
+"""
+df_hit_rates = instrumentation.get_hit_rates()
+if df_hit_rates.empty:
+    st.write('No cache lookups yet.')
+else:
+    st.dataframe(df_hit_rates.round(3))
+counters = instrumentation.get_counters()
+n_stale = sum(v for k, v in counters.items() if k.startswith('cache.') and k.endswith('.stale'))
+st.write(f"Evictions: {counters.get('cache.evictions', 0)}, "
+         f"stale panels served: {n_stale} ({len(cache.stale_panels)} waiting for a rebuild), "
+         f"loads coalesced: {counters.get('cache.single_flight.waits', 0)}")
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Sessions
+# ~~~~~~~~~~~~~~~~~~~~~~~
+"""
+### Memory per session
+Size of the dfs kept in each session state.
+"""
+df_sessions = instrumentation.get_session_memory()
+if df_sessions.empty:
+    st.write(f"This session: {instrumentation.get_state_mb(st.session_state.to_dict().values()):.2f} MB")
+else:
+    st.dataframe(df_sessions)
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~
+# Profiles
+# ~~~~~~~~~~~~~~~~~~~~~~~
+"""
+### Rerun profiles
+Start the server with `ECONDATA_PROFILE=1` to save a cProfile and tracemalloc profile of every
+rerun, or with `ECONDATA_PROFILE=query` to profile only the pages opened with `?profile=1` in the url. Action lists the widgets that changed in that rerun.
+"""
+profiles = profiling.list_profiles()
+if not profiles:
+    st.write('No profiles saved yet.')
+else:
+    df_profiles = pd.DataFrame(profiles)[['id', 'time', 'page', 'figure', 'action', 'seconds', 'peak_MB']]
+    df_profiles['action'] = df_profiles['action'].str.join(', ')
+    st.dataframe(df_profiles.set_index('id').round(3))
+
+    profile_id = st.selectbox('Profile:', df_profiles['id'])
+    profile = next(i for i in profiles if i['id'] == profile_id)
+
+    container = st.container(horizontal = True)
+    with container:
+        st.download_button(
+                label = 'Download cProfile (.prof.gz)',
+                data = profiling.read_profile_file(profile_id, '.prof.gz'),
+                file_name = f'{profile_id}.prof.gz'
+                )
+        st.download_button(
+                label = 'Download summary (.json)',
+                data = profiling.read_profile_file(profile_id, '.json'),
+                file_name = f'{profile_id}.json'
+                )
+
+    st.write('Top functions (cumulative time, seconds)')
+    st.dataframe(pd.DataFrame(profile['top_functions']).round(4))
+    st.write('Top allocations still alive at the end of the rerun')
+    st.dataframe(pd.DataFrame(profile['top_allocations']).round(1))
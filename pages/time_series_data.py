@@ -1,5 +1,4 @@
-import json, os, re
-import pandas as pd
+import re
 from pathlib import Path
 
 import streamlit as st
@@ -7,12 +6,13 @@ import streamlit as st
 
 from MyTools import chart_tools as chart
 from MyTools.chart_template.chart_frame_lines import line_frame
-from MyTools.load_data import load_dataset
-from MyTools.load_data import get_percentage_share_GDP
-from MyTools.load_data import get_rgdp
-from MyTools.frequency_conversion import convert_frequency
-from MyTools.frequency_conversion import get_frequency
-from MyTools.frequency_conversion import get_frequency_level
+from MyTools.config_registry import get_config
+from MyTools.load_data import load_BEA_table
+from MyTools.load_data import get_merge_data_name
+from MyTools.load_data import merge_data_df
+from MyTools.load_data import get_aggregation_by_column
+from MyTools.figures import figure_data
+from MyTools.figures import fig_list
 from MyTools.frequency_conversion import get_YoY_window
 
 
@@ -38,77 +38,6 @@ class Description_unit():
 
 
 
-def get_merge_data_name(fig_name, platform, frequency):
-    """
-    Use this function to form data_name when a dataset is a merged from multiple datasets that come 
-    with different data frequency.
-    """
-    return f"{fig_name}-{platform}-{frequency}"
-
-
-def get_indent_config_name(data_name):
-    
-    return '-'.join(data_name.split('-')[:2])
-
-
-def get_heightest_frequency_level(data_name_list:list):
-    """
-    Get the highest frequency level.
-
-    Frequency level from highest to lowest:
-        "A" > "Q" > "M" > "W" > "D"
-    """
-    ###------Get the highest frequency level------###
-
-    target_freq = get_frequency_level(
-            freq_index = max(
-                [get_frequency_level(freq = get_frequency(i)) for i in data_name_list]
-                )
-            )
-
-    return target_freq
-
-
-def merge_data_df(data_name_list:list, target_freq = 'D', return_freq = False):
-    """
-    For each data_name in data_name_list:
-        1. Load corresponding df named <data_name.csv> in directory parse_data.
-            -- Use "Time" column as index, and drop "Time" column.
-        2. Merge all dfs.
-            -- You must make sure that data in all dfs are measured in the same frequency, such as daily, monthly, quarterly...
-    """
-    highest_data_freq = get_heightest_frequency_level(data_name_list)
-    data_freq = target_freq if get_frequency_level(freq = target_freq) > get_frequency_level(freq = highest_data_freq) else highest_data_freq
-
-
-    result = pd.DataFrame()
-    for data_name in data_name_list:
-        df = pd.read_csv(os.path.join('data', 'parse_data', f'{data_name}.csv'), index_col = 'Time')
-
-        ###------Convert frequency------###
-        df['Time'] = df.index
-        df = convert_frequency(df, data_freq, original_freq=get_frequency(data_name)).set_index('Time')
-        ###------Merge dataset------###
-        result = pd.concat([result, df], axis = 1)
-
-
-
-    result = result.sort_index()
-    df_t = pd.PeriodIndex(result.index, freq = data_freq).to_frame().reset_index(drop = True)
-    result = pd.concat([df_t, result.reset_index(drop = True)], axis = 1)
-
-
-
-    if return_freq:
-        return result, highest_data_freq
-    else:
-        return result
-
-
-
-
-
-
 class show_chart():
     """
     Data Source:
@@ -119,18 +48,13 @@ class show_chart():
     """
     def __init__(self):
         self.current_dir = Path.cwd()
-        self.isRGDP = False
-        self.percent_share_GDP = False
         self.data_source()
 
     def data_source(self):
-        with open(os.path.join(self.current_dir, 'config', 'source_info.json')) as f:
-            self.data_source = json.load(f)
+        self.data_source = get_config('source_info', self.current_dir)
 
     def data_info_FRED(self):
-        with open(os.path.join(self.current_dir, 'config_data_request', 'FRED.json')) as f:
-            info_FRED = json.load(f)
-        return info_FRED
+        return get_config('FRED', self.current_dir)
 
 
     def form_data_source(self, item_names:list):
@@ -159,46 +83,36 @@ class show_chart():
         ###------National Income------###
         # NGDP
         if fig_name == "Gross domestic product (quarterly)":
-            data_name = "NGDP-BEA-Q"
             data_source = self.form_data_source(["BEA(NGDP)"])
             description = Description.bn_seasonally_adj
-            self.show_GDP(data_source, description, data_name)
+            self.show_GDP(data_source, description, fig_name)
 
         elif fig_name == "Gross domestic product (annual)":
-            data_name = "NGDP-BEA-A"
             data_source = self.form_data_source(["BEA(NGDP)"])
             description = Description.bn_seasonally_adj
-            self.show_GDP(data_source, description, data_name)
+            self.show_GDP(data_source, description, fig_name)
 
         # Percentage share of NGDP
         elif fig_name == "Percentage share of GDP (quarterly)":
-            data_name = "NGDP-BEA-Q"
-            self.percent_share_GDP = True
             data_source = self.form_data_source(["BEA(NGDP)"])
             description = Description.percent
-            self.show_GDP(data_source, description, data_name)
+            self.show_GDP(data_source, description, fig_name)
 
         elif fig_name == "Percentage share of GDP (annual)":
-            data_name = "NGDP-BEA-A"
-            self.percent_share_GDP = True
             data_source = self.form_data_source(["BEA(NGDP)"])
             description = Description.percent
-            self.show_GDP(data_source, description, data_name)
+            self.show_GDP(data_source, description, fig_name)
 
         # RGDP
         elif fig_name == "Real gross domestic product (quarterly)":
-            data_name = "NGDP-BEA-Q"
-            self.isRGDP = True
             data_source = self.form_data_source(["BEA(NGDP)", "BEA(GDP Deflator)"])
             description = Description.bn_chained_seasonally_adj
-            self.show_GDP(data_source, description, data_name)
+            self.show_GDP(data_source, description, fig_name)
 
         elif fig_name == "Real gross domestic product (annual)":
-            data_name = "NGDP-BEA-A"
-            self.isRGDP = True
             data_source = self.form_data_source(["BEA(NGDP)", "BEA(GDP Deflator)"])
             description = Description.bn_chained_seasonally_adj
-            self.show_GDP(data_source, description, data_name)
+            self.show_GDP(data_source, description, fig_name)
 
         elif fig_name == "Nominal vs. real GDP":
             src = "https://fred.stlouisfed.org/graph/graph-landing.php?g=1NOOf"
@@ -206,29 +120,21 @@ class show_chart():
 
         # GDI
         elif fig_name == "Gross domestic income (quarterly)":
-            data_name = "GDI-BEA-Q"
             data_source = self.form_data_source(["BEA(GDI)"])
             description = Description.bn_seasonally_adj
-            self.show_GDP(data_source, description, data_name)
+            self.show_GDP(data_source, description, fig_name)
 
         elif fig_name == "Gross domestic income (annual)":
-            data_name = "GDI-BEA-A"
             data_source = self.form_data_source(["BEA(GDI)"])
             description = Description.bn_seasonally_adj
-            self.show_GDP(data_source, description, data_name)
+            self.show_GDP(data_source, description, fig_name)
 
 
 
         ###------Business cycle and AD-AS model------###
         elif fig_name == "Business cycle and AD/AS model":
-            data_list = [
-                    "RGDP-FRED-Q",      # rgdp
-                    "FRGDP-FRED-Q",     # r potential gdp
-                    "GDPDeflator-BEA-Q",# GDP deflator
-                    "UNRATE-FRED-M",    # unemployment rate
-                    "NRUNEM-FRED-M",    # natural rate
-                    ]
-            df0, freq = merge_data_df(data_list, return_freq = True)
+            data_list = figure_data[fig_name]['data_list']
+            df0, freq = merge_data_df(data_list, target_freq = figure_data[fig_name]['target_freq'], return_freq = True)
             df0 = df0.dropna()
             df0.index = df0['Time']
 
@@ -255,50 +161,24 @@ class show_chart():
         ###------Monetary Policy------###
         # FFR, FFR target, IORB rate, ONRRP rate and other policy rates.
         elif fig_name == "Monetary Policy and Interest Rate (monthly)":
-            data_list = [
-                    'FFER-FRED-D',
-                    'FFRTUPPER-FRED-D',
-                    'FFRTLOWER-FRED-D',
-                    'FFRT-FRED-D',
-                    'DISCOUNTPRIMARY-FRED-D',
-                    'SREPOMR-FRED-D',
-                    'IORR-FRED-D',
-                    'IORB-FRED-D',
-                    'ONRRP-FRED-D',
-                    ]
-            df = merge_data_df(data_list, target_freq = 'M')
+            data_list = figure_data[fig_name]['data_list']
+            df = merge_data_df(data_list, target_freq = figure_data[fig_name]['target_freq'])
             data_source = self.form_data_source(["FRED(Monetary Policy Rates)"])
             description = Description.percent
             data_name = f'{fig_name}-FRED-M'
-            line_frame(data_name, df, indent_config = {}, description = description, source = data_source).show(n_legend_cols = 3)
+            line_frame(data_name, df, indent_config = {}, description = description, source = data_source, aggregation = get_aggregation_by_column(df, data_list)).show(n_legend_cols = 3)
 
         elif fig_name == "Monetary Policy and Interest Rate (daily)":
-            data_list = [
-                    'FFER-FRED-D',
-                    'FFRTUPPER-FRED-D',
-                    'FFRTLOWER-FRED-D',
-                    'FFRT-FRED-D',
-                    'DISCOUNTPRIMARY-FRED-D',
-                    'SREPOMR-FRED-D',
-                    'IORR-FRED-D',
-                    'IORB-FRED-D',
-                    'ONRRP-FRED-D',
-                    ]
-            df = merge_data_df(data_list, target_freq = 'D')
+            data_list = figure_data[fig_name]['data_list']
+            df = merge_data_df(data_list, target_freq = figure_data[fig_name]['target_freq'])
             data_source = self.form_data_source(["FRED(Monetary Policy Rates)"])
             description = Description.percent
             data_name = f'{fig_name}-FRED-D'
-            line_frame(data_name, df, indent_config = {}, description = description, source = data_source).show(n_legend_cols = 3)
+            line_frame(data_name, df, indent_config = {}, description = description, source = data_source, aggregation = get_aggregation_by_column(df, data_list)).show(n_legend_cols = 3)
 
         elif fig_name == "Labor Market Level":
-            data_list = [
-                    "CNP-FRED-M",
-                    "CLF-FRED-M",
-                    "NIL-FRED-M",
-                    "EMP-FRED-M",
-                    "UNEMP-FRED-M"
-                    ]
-            df = merge_data_df(data_list, target_freq = 'M')
+            data_list = figure_data[fig_name]['data_list']
+            df = merge_data_df(data_list, target_freq = figure_data[fig_name]['target_freq'])
 
             # Use simplified column names
             cols = ['Time'] + [dataset_info_FRED[i]['name'] for i in data_list]
@@ -313,19 +193,11 @@ class show_chart():
                 ])
             description = Description.thousands_persons_seasonally_adj
             data_name = f'{fig_name}-FRED-M'
-            line_frame(data_name, df, indent_config = {}, description = description, source = data_source).show(n_legend_cols = 5)
+            line_frame(data_name, df, indent_config = {}, description = description, source = data_source, aggregation = get_aggregation_by_column(df, data_list)).show(n_legend_cols = 5)
 
         elif fig_name == 'Labor Market Rate':
-            data_list = [
-                    "LFPR-FRED-M",
-                    "UNRATE-FRED-M",
-                    "U1-FRED-M",
-                    "U2-FRED-M",
-                    "U4-FRED-M",
-                    "U5-FRED-M",
-                    "U6-FRED-M",
-                    ]
-            df = merge_data_df(data_list, target_freq = 'M')
+            data_list = figure_data[fig_name]['data_list']
+            df = merge_data_df(data_list, target_freq = figure_data[fig_name]['target_freq'])
 
             # Use simplified column names
             cols = ['Time'] + [dataset_info_FRED[i]['name'] for i in data_list]
@@ -342,17 +214,11 @@ class show_chart():
                 ])
             description = Description.percent
             data_name = f'{fig_name}-FRED-M'
-            line_frame(data_name, df, indent_config = {}, description = description, source = data_source).show(n_legend_cols = 5)
+            line_frame(data_name, df, indent_config = {}, description = description, source = data_source, aggregation = get_aggregation_by_column(df, data_list)).show(n_legend_cols = 5)
 
         elif fig_name == "Measures of Price Level":
-            data_list = [
-                    "CPIU-FRED-M",
-                    "CoreCPIU-FRED-M",
-                    "Chained_CPIU-FRED-M",
-                    "Chained_CoreCPIU-FRED-M",
-                    "PCE-FRED-M"
-                    ]
-            df = merge_data_df(data_list, target_freq = 'M')
+            data_list = figure_data[fig_name]['data_list']
+            df = merge_data_df(data_list, target_freq = figure_data[fig_name]['target_freq'])
 
             # Use simplified column names
             cols = ['Time'] + [dataset_info_FRED[i]['name'] for i in data_list]
@@ -367,35 +233,15 @@ class show_chart():
                 ])
             description = f'{Description.index_1982} (CPIs), {Description.index_1999} (Chained CPIs), {Description.bn_seasonally_adj} (PCE)'
             data_name = f'{fig_name}-FRED-M'
-            line_frame(data_name, df, indent_config = {}, description = description, source = data_source).show(n_legend_cols = 5)
-
-
-
-    def get_df(self, data_name):
-
-        path_data = os.path.join(self.current_dir, 'data', 'parse_data', f"{data_name}.csv")
-        df = load_dataset(path_data)
-
-        # If to display percentage share of NGDP
-        if self.percent_share_GDP:
-            data_name = f"{data_name}_share-{get_frequency(data_name)}"
-            df = get_percentage_share_GDP(df, 'Gross domestic product')
-
-        if self.isRGDP:
-
-            df_GDPDeflator = load_dataset(
-                    os.path.join(self.current_dir, 'data', 'parse_data', f'GDPDeflator-BEA-{get_frequency(data_name)}.csv')
-                    )
-            data_name = f'RGDP-{get_frequency(data_name)}'
-            df = get_rgdp(df, df_GDPDeflator)
+            line_frame(data_name, df, indent_config = {}, description = description, source = data_source, aggregation = get_aggregation_by_column(df, data_list)).show(n_legend_cols = 5)
 
-        return df, data_name
 
 
-    def show_GDP(self, data_source, description, data_name):
+    def show_GDP(self, data_source, description, fig_name):
 
-        indent_config = self.indent_config[data_name[:-2]]
-        df, data_name = self.get_df(data_name)
+        info = figure_data[fig_name]
+        indent_config = self.indent_config[info['data_name'][:-2]]
+        df, data_name = load_BEA_table(info['data_name'], info.get('percent_share_GDP', False), info.get('isRGDP', False))
 
         line_frame(data_name, df, indent_config = indent_config, description = description, source = data_source).show()
 
@@ -426,8 +272,7 @@ hor_align, ver_align = 'center', 'center'
 # Load Config Files
 # ~~~~~~~~~~~~~~~~~~~~~~~
 ###------Chart config------###
-with open(os.path.join(current_dir, 'config', 'chart_config.json')) as f:
-    chart_config = json.load(f)
+chart_config = get_config('chart_config', current_dir)
 
 # Set the width and height of container used to present chart.
 chart_width = chart_config['chart']['chart_width']
@@ -437,8 +282,7 @@ iframe_height = chart_height + 30
 
 
 ###------indent config------###
-with open(os.path.join(current_dir, 'config', 'indent_config.json')) as f:
-    indent_config = json.load(f)
+indent_config = get_config('indent_config', current_dir)
 
 
 ##############################
@@ -449,42 +293,8 @@ with open(os.path.join(current_dir, 'config', 'indent_config.json')) as f:
 # Figure name
 # ~~~~~~~~~~~~~~~~~~~~~~~
 
-fig_list = [
-    ###------National Income------###
-    # nominal gdp
-    "Gross domestic product (quarterly)",
-    "Gross domestic product (annual)",
-    # % share of ngdp
-    "Percentage share of GDP (quarterly)",
-    "Percentage share of GDP (annual)",
-    # real gdp
-    "Real gross domestic product (quarterly)",
-    "Real gross domestic product (annual)",
-    # nominal vs. rgdp
-    'Nominal vs. real GDP',
-    # Gross domestic income (GDI)
-    "Gross domestic income (quarterly)",
-    "Gross domestic income (annual)",
-
-    ###------Unemployment------###
-    "Labor Market Level",
-    "Labor Market Rate",
-
-    ###------Price Index------###
-    "Measures of Price Level",
-
-
-    ###------AD/AS------###
-    "Business cycle and AD/AS model",
-    
-    
-    ###------Monetary Policy------###
-    "Monetary Policy and Interest Rate (monthly)",
-    "Monetary Policy and Interest Rate (daily)",
-        ]
-
-
-fig_name = st.selectbox('Choose a dataset to display:', fig_list)
+# Figures are declared in MyTools/figures.py.
+fig_name = st.selectbox('Choose a dataset to display:', fig_list, key = 'figure')
 st.divider()
 
 show_chart().show(fig_name, chart_config, indent_config)
@@ -0,0 +1,227 @@
+"""
+A local stand-in for the BEA and FRED APIs.
+
+It serves the payloads recorded in ./data/request_data using the same URL shapes as the live APIs:
+    BEA:    /api/data?TableName=T10105&Frequency=Q&...
+    FRED:   /fred/series?series_id=UNRATE&...
+            /fred/series/observations?series_id=UNRATE&...
+
+Point the clients in request_data.py at it through the base-url override, e.g.,
+    python replay_server.py --port 8765 --latency 0.2 --error-rate 0.05
+    BEA_BASE_URL=http://127.0.0.1:8765/api FRED_BASE_URL=http://127.0.0.1:8765/fred python main_data_update.py
+"""
+
+import json, os, time, random, threading, argparse
+from pathlib import Path
+from collections import deque
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def load_request_config(file_name):
+    with open(Path('config_data_request')/file_name) as f:
+        return json.load(f)
+
+
+def build_routes(path_data_request):
+    """
+    Map the request parameters of each recorded dataset to its json file.
+
+    Return two dicts:
+        BEA:    {(TABLENAME, FREQUENCY): data_name}
+        FRED:   {SERIES_ID: data_name}
+    Only datasets with a recorded payload in <path_data_request> are included.
+    """
+    routes_BEA, routes_FRED = {}, {}
+
+    for data_name, info in load_request_config('BEA.json').items():
+        if os.path.exists(os.path.join(path_data_request, f'{data_name}.json')):
+            params = info['params']
+            routes_BEA[(params['tablename'].upper(), params['frequency'].upper())] = data_name
+
+    for data_name, info in load_request_config('FRED.json').items():
+        if os.path.exists(os.path.join(path_data_request, f'{data_name}.json')):
+            routes_FRED[info['params']['series_id'].upper()] = data_name
+
+    return routes_BEA, routes_FRED
+
+
+
+class ReplayState:
+    """
+    Recorded payloads and the simulated network conditions shared by all request handlers.
+
+    latency:        base delay (seconds) added to every response.
+    jitter:         a random delay in [0, jitter] seconds added on top of latency.
+    rate_limit:     maximum number of requests accepted in any <rate_window> seconds. 0 disables it.
+    error_rate:     probability of answering a request with HTTP 500.
+    seed:           seed of the random generator, so a run can be replayed exactly.
+    """
+    def __init__(self, path_data_request, latency = 0.0, jitter = 0.0, rate_limit = 0, rate_window = 60.0, error_rate = 0.0, seed = 0):
+        self.path_data_request = path_data_request
+        self.routes_BEA, self.routes_FRED = build_routes(path_data_request)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_times = deque()
+        self.payloads = {}
+        self.stats = {"requests":0, "served":0, "rate_limited":0, "errors":0, "not_found":0}
+
+
+    def load_payload(self, data_name):
+        """
+        Read a recorded payload once and keep it in memory, so disk reads do not distort timings.
+        """
+        with self.lock:
+            if data_name not in self.payloads:
+                with open(os.path.join(self.path_data_request, f'{data_name}.json')) as f:
+                    self.payloads[data_name] = json.load(f)
+            return self.payloads[data_name]
+
+
+    def draw_delay_and_error(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            is_error = self.random.random() < self.error_rate
+        return delay, is_error
+
+
+    def is_rate_limited(self):
+        """
+        Sliding window limiter: reject a request if <rate_limit> requests were accepted within the
+        last <rate_window> seconds.
+        """
+        if not self.rate_limit:
+            return False
+
+        with self.lock:
+            now = time.monotonic()
+            while self.request_times and now - self.request_times[0] > self.rate_window:
+                self.request_times.popleft()
+            if len(self.request_times) >= self.rate_limit:
+                return True
+            self.request_times.append(now)
+            return False
+
+
+    def count(self, item):
+        with self.lock:
+            self.stats[item] += 1
+
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def do_GET(self):
+        state = self.server.state
+        state.count('requests')
+
+        url = urlparse(self.path)
+        # Parameter names are case-insensitive in the BEA API.
+        params = {k.lower():v[0] for k, v in parse_qs(url.query).items()}
+        route = url.path.rstrip('/')
+
+        ###------Simulate network conditions------###
+        if state.is_rate_limited():
+            state.count('rate_limited')
+            return self.send_json(429, {"error_code":429, "error_message":"Too Many Requests. Exceeded Rate Limit"})
+
+        delay, is_error = state.draw_delay_and_error()
+        time.sleep(delay)
+        if is_error:
+            state.count('errors')
+            return self.send_json(500, {"error_code":500, "error_message":"Simulated server error"})
+
+        ###------Serve recorded payloads------###
+        if route == '/api/data':
+            key = (params.get('tablename', '').upper(), params.get('frequency', '').upper())
+            data_name = state.routes_BEA.get(key)
+            if data_name:
+                state.count('served')
+                return self.send_json(200, state.load_payload(data_name))
+
+        elif route in ('/fred/series', '/fred/series/observations'):
+            data_name = state.routes_FRED.get(params.get('series_id', '').upper())
+            if data_name:
+                payload = state.load_payload(data_name)
+                state.count('served')
+                if route == '/fred/series':
+                    return self.send_json(200, {"seriess":[{"id":params['series_id'], "title":payload['title']}]})
+                # The recorded payload carries the series title added by request_data.py.
+                return self.send_json(200, {k:v for k, v in payload.items() if k != 'title'})
+
+        state.count('not_found')
+        self.send_json(404, {"error_code":404, "error_message":f"No recorded payload for {self.path}"})
+
+
+
+def create_server(path_data_request, host = '127.0.0.1', port = 8765, verbose = False, **conditions):
+    """
+    Return a ThreadingHTTPServer ready to serve. <conditions> are passed to ReplayState.
+    Use port = 0 to let the OS pick a free port (see server.server_address).
+    """
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.state = ReplayState(path_data_request, **conditions)
+    server.verbose = verbose
+    return server
+
+
+def start_server_in_thread(path_data_request, **kwargs):
+    """
+    Start a server in a daemon thread and return (server, base_url_BEA, base_url_FRED).
+    Call server.shutdown() to stop it.
+    """
+    server = create_server(path_data_request, **kwargs)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}/api', f'http://{host}:{port}/fred'
+
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Serve recorded BEA/FRED payloads from ./data/request_data.')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8765)
+    parser.add_argument('--data-dir', default = os.path.join('data', 'request_data'))
+    parser.add_argument('--latency', type = float, default = 0.0, help = 'Base delay per response in seconds.')
+    parser.add_argument('--jitter', type = float, default = 0.0, help = 'Extra random delay in [0, jitter] seconds.')
+    parser.add_argument('--rate-limit', type = int, default = 0, help = 'Max requests per window (0: no limit).')
+    parser.add_argument('--rate-window', type = float, default = 60.0, help = 'Length of the rate limit window in seconds.')
+    parser.add_argument('--error-rate', type = float, default = 0.0, help = 'Probability of answering with HTTP 500.')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--verbose', action = 'store_true')
+    args = parser.parse_args()
+
+    server = create_server(
+            args.data_dir, host = args.host, port = args.port, verbose = args.verbose,
+            latency = args.latency, jitter = args.jitter,
+            rate_limit = args.rate_limit, rate_window = args.rate_window,
+            error_rate = args.error_rate, seed = args.seed
+            )
+
+    print(f"Replay server on http://{args.host}:{args.port}")
+    print(f"    BEA_BASE_URL=http://{args.host}:{args.port}/api")
+    print(f"    FRED_BASE_URL=http://{args.host}:{args.port}/fred")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(server.state.stats)
@@ -1,11 +1,30 @@
 import requests, json, os, time
 from pathlib import Path
+from MyTools import store
+from MyTools.config_registry import get_config
 
-def request_break():
+# Root of each API. Override them with the env variables BEA_BASE_URL/FRED_BASE_URL (or the
+# base_url argument below) to run the pipeline against replay_server.py.
+BEA_BASE_URL = 'http://apps.bea.gov/api'
+FRED_BASE_URL = 'https://api.stlouisfed.org/fred'
+
+
+def get_base_url(platform:str, base_url:str = None) -> str:
+    """
+    platform: "BEA" or "FRED".
+    Return base_url if given, otherwise the env override or the live API root.
+    """
+    if base_url:
+        return base_url.rstrip('/')
+    default = BEA_BASE_URL if platform == 'BEA' else FRED_BASE_URL
+    return os.environ.get(f'{platform}_BASE_URL', default).rstrip('/')
+
+
+def request_break(seconds = 5):
     """
     Specify a time to sleep
     """
-    time.sleep(5)
+    time.sleep(seconds)
 
 def get_request_params(data_name:str, api_key:str) -> dict:
     """
@@ -20,15 +39,16 @@ def get_request_params(data_name:str, api_key:str) -> dict:
         "resultformat":"json"
 		}
     """
-    with open(os.path.join('config_data_request', 'BEA.json')) as f:
-        params = json.load(f)[data_name]['params']
+    # Copy, the registry returns a read-only view shared by every caller.
+    params = dict(get_config('BEA')[data_name]['params'])
     params['userid'] = api_key
 
     return params
 
 
-def form_BEA_url(params:dict) -> str:
+def form_BEA_url(params:dict, base_url:str = None) -> str:
     """
+    base_url: root of the BEA API, see get_base_url().
     """
 
     userid = params['userid']
@@ -39,7 +59,7 @@ def form_BEA_url(params:dict) -> str:
     year = params['year']
     resultformat = params['resultformat']
 
-    url = f"http://apps.bea.gov/api/data/?UserID={userid}&method={method}&datasetname={datasetname}&TableName={tablename}&Year={year}&Frequency={frequency}&ResultFormat={resultformat}"
+    url = f"{get_base_url('BEA', base_url)}/data/?UserID={userid}&method={method}&datasetname={datasetname}&TableName={tablename}&Year={year}&Frequency={frequency}&ResultFormat={resultformat}"
 
     return url
 
@@ -47,11 +67,15 @@ def save_json(data_path, content):
     """
     This function save downloaded data to a json file.
     """
-    with open(data_path, 'w') as f:
-        json.dump(content, f)
+    store.write_json(content, data_path)
 
 
 def get_api_key(file_name):
+    """
+    The replay server does not check keys, so set env variable API_KEY to run without ./api_key.
+    """
+    if os.environ.get('API_KEY'):
+        return os.environ['API_KEY']
 
     with open(Path('api_key') / f'{file_name}') as f:
         key = json.load(f)['xie']
@@ -60,7 +84,7 @@ def get_api_key(file_name):
 
 
 
-def request_BEA_data(data_name, data_path):
+def request_BEA_data(data_name, data_path, base_url = None):
     """
     This function is a template to request data from BEA
     """
@@ -70,31 +94,36 @@ def request_BEA_data(data_name, data_path):
 
     ###------Format url------###
     params = get_request_params(data_name, key)
-    url = form_BEA_url(params)
+    url = form_BEA_url(params, base_url)
 
     ###------Request and save data------###
     r = requests.get(url)
+    r.raise_for_status()
     data = r.json()
     save_json(data_path, data)
     
 
-def request_FRED_data(data_name, data_path):
+def request_FRED_data(data_name, data_path, base_url = None):
     ###------load api key------###
     key = get_api_key('FRED.json')
 
     ###------form url------###
-    with open(Path('config_data_request')/'FRED.json') as f:
-        params = json.load(f)[data_name]['params']
+    params = dict(get_config('FRED')[data_name]['params'])
     params['api_key'] = key
 
     ###------request------###
+    base_url = get_base_url('FRED', base_url)
     # Get series title
-    url = 'https://api.stlouisfed.org/fred/series'
-    title = requests.get(url, params).json()['seriess'][0]['title']
+    url = f'{base_url}/series'
+    r = requests.get(url, params)
+    r.raise_for_status()
+    title = r.json()['seriess'][0]['title']
     time.sleep(0.5)
 
-    url = 'https://api.stlouisfed.org/fred/series/observations'
-    data = requests.get(url, params).json()
+    url = f'{base_url}/series/observations'
+    r = requests.get(url, params)
+    r.raise_for_status()
+    data = r.json()
     data['title'] = title
     save_json(data_path, data)
 
@@ -107,31 +136,33 @@ def request_FRED_data(data_name, data_path):
 #               API calls
 #############################################
 
-def get_BEA_data(data_dir, data_name):
+def get_BEA_data(data_dir, data_name, base_url = None, pause = 5):
     """
     This function get data from BEA.
+    pause: seconds to sleep after the request. Use 0 against the replay server.
     """
 
     data_path = os.path.join(data_dir, f'{data_name}.json')
 
-    request_BEA_data(data_name, data_path)
+    request_BEA_data(data_name, data_path, base_url)
     print(f'Received new dataset: [{data_name}]')
     # sleep
-    request_break()
+    request_break(pause)
 
 
 
 
-def get_FRED_data(data_dir, data_name):
+def get_FRED_data(data_dir, data_name, base_url = None, pause = 5):
     """
     This function get data from FRED.
+    pause: seconds to sleep after the request. Use 0 against the replay server.
     """
     data_path = Path(data_dir)/f"{data_name}.json"
 
-    request_FRED_data(data_name, data_path)
+    request_FRED_data(data_name, data_path, base_url)
     print(f'Received new dataset: [{data_name}]')
     # sleep
-    request_break()
+    request_break(pause)
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
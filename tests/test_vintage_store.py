@@ -0,0 +1,43 @@
+"""
+Run from the project root:
+    python -m pytest tests
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+
+from MyTools import vintage_store
+
+
+def get_release(values):
+    return pd.DataFrame({"Time":['2025Q1', '2025Q2'], "GDI":values})
+
+
+def test_same_day_revision(tmp_path):
+    vintage_dir = str(tmp_path)
+    assert vintage_store.record_vintage(vintage_dir, 'GDI-BEA-Q', get_release([30000.0, 30335.845]), date(2026, 1, 29)) == 2
+
+    # The second release of the day revises 2025Q2: it replaces the record, so the number of
+    # records does not grow, but the file must be written.
+    assert vintage_store.record_vintage(vintage_dir, 'GDI-BEA-Q', get_release([30000.0, 30244.878]), date(2026, 1, 29)) == 1
+    vintages = vintage_store.Vintages.read(vintage_dir, 'GDI-BEA-Q')
+    assert len(vintages) == 2
+    assert vintages.latest()['GDI'].tolist() == [30000.0, 30244.878]
+
+    # Nothing changed: nothing recorded.
+    assert vintage_store.record_vintage(vintage_dir, 'GDI-BEA-Q', get_release([30000.0, 30244.878]), date(2026, 1, 29)) == 0
+
+
+def test_revision_keeps_previous_vintage(tmp_path):
+    vintage_dir = str(tmp_path)
+    vintage_store.record_vintage(vintage_dir, 'GDI-BEA-Q', get_release([30000.0, 30335.845]), date(2026, 1, 29))
+    vintage_store.record_vintage(vintage_dir, 'GDI-BEA-Q', get_release([30000.0, 30244.878]), date(2026, 2, 26))
+
+    vintages = vintage_store.Vintages.read(vintage_dir, 'GDI-BEA-Q')
+    assert vintages.as_of('2026-02-01')['GDI'].tolist() == [30000.0, 30335.845]
+    assert vintages.latest()['GDI'].tolist() == [30000.0, 30244.878]